@@ -1,4 +1,9 @@
 import os
+import sys
+
+from lexer import TokenBuffer
+from parser import Parser
+from fingerprint import profile_workload
 
 try:
     # Import the GUI entrypoint from the split module structure
@@ -16,19 +21,47 @@ def _fallback_run():
     path = os.path.join(os.path.dirname(__file__), "input.sql")
     if os.path.exists(path):
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
+            # Only the preview is read; 200 characters take at most 800 bytes
+            with open(path, "rb") as f:
+                head = f.read(800)
             print("Loaded input.sql successfully (GUI module missing).")
             print("Preview (first 200 chars):")
-            print(content[:200])
+            print(head.decode("utf-8", errors="ignore")[:200])
         except Exception as e:
             print(f"Error reading input.sql: {e}")
     else:
         print("input.sql not found and GUI module missing. Nothing to run.")
 
 
+def lint_file(path):
+    """Print every lexical and syntax error in a SQL file; return True if it is clean.
+
+    The file is memory-mapped and lexed in recovery mode, so large dumps are
+    checked in one pass without loading them into a string, and only
+    validated by the parser, which builds no tree.
+    """
+    tokens = TokenBuffer.from_file(path, recover=True)
+    for i in sorted(tokens.errors):
+        print(f"[Line {tokens.lines[i]}, Col {tokens.cols[i]}] {tokens.errors[i]}")
+    parser = Parser(tokens)
+    parser.validate()
+    for message in parser.error_messages:
+        print(message)
+    return not tokens.errors and not parser.had_error
+
+
+def top_statements(path, n=10):
+    """Print the n most frequent statement shapes of a SQL log."""
+    with open(path, encoding="utf-8") as f:
+        print(profile_workload(f).report(n))
+
+
 if __name__ == "__main__":
-    import os
+    if len(sys.argv) == 3 and sys.argv[1] == "--lint":
+        sys.exit(0 if lint_file(sys.argv[2]) else 1)
+    if len(sys.argv) == 3 and sys.argv[1] == "--top":
+        top_statements(sys.argv[2])
+        sys.exit(0)
     if main is not None:
         main()
     else:
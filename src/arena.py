@@ -0,0 +1,273 @@
+# Arena Parse Trees
+#
+# The parser's arena mode stores the tree in parallel arrays instead of node
+# objects: a node is an index, and its kind, parent, first child, next
+# sibling, token and literal slot are entries of the arrays below. A million
+# INSERT statements then cost a few dozen bytes per node, and walking the
+# tree reads the arrays front to back.
+
+from array import array
+
+from lexer import KEYWORD_LIST, TokenBuffer, INTEGER_KIND, FLOAT_KIND
+from nodes import (NODE_CLASSES, QUERY, KEYWORD, BOOL_OP, TABLE_REF, COLUMN_DEF, TYPE_NAME,
+                   COLUMN_REF, LITERAL, VALUE, OPERATOR, VALUE_ROWS, PARAMETER, SQL_TYPES, ValueRows)
+
+_RULE_PREFIXES = {
+    TABLE_REF: "Table: ", COLUMN_DEF: "Col: ", TYPE_NAME: "Type: ", COLUMN_REF: "Col: ",
+    LITERAL: "Val: ", VALUE: "Value: ", OPERATOR: "Op: ", PARAMETER: "Param: ",
+}
+
+
+class Arena:
+    """A parse tree held in parallel arrays, built by Parser(tokens, arena=True).
+
+    Node 0 is the Query root. For node n, kinds[n] is its node kind (see
+    nodes.py), parents[n] its parent, first_child[n] and next_sibling[n]
+    link its children in order (-1 when absent) and token_index[n] the
+    token it was made from (-1 for nodes without a position). slots[n] holds
+    the keyword kind of Keyword and BoolOp nodes, and for numeric literals
+    the index of their value in ints or floats (-1 if it does not fit).
+    The ValueRows of a multi-row INSERT is kept whole in rows, and its
+    node's slot is its index there.
+
+    A node's kind is enough to know what its children are, so the accessors
+    below, Cursor and walk() cover what analysis needs without creating node
+    objects.
+    """
+
+    def __init__(self, tokens, token_kinds):
+        self.tokens = tokens
+        self.token_kinds = token_kinds
+        self.kinds = array('B')
+        self.parents = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.token_index = array('i')
+        self.slots = array('i')
+        self.ints = array('q')
+        self.floats = array('d')
+        self.rows = []
+        self._last_child = array('i')
+        self.root = self.branch(QUERY)
+
+    # Builder interface used by the parser; node handles are indexes
+
+    def _new(self, kind, token, slot):
+        n = len(self.kinds)
+        self.kinds.append(kind)
+        self.parents.append(-1)
+        self.first_child.append(-1)
+        self.next_sibling.append(-1)
+        self.token_index.append(token)
+        self.slots.append(slot)
+        self._last_child.append(-1)
+        return n
+
+    def branch(self, kind):
+        return self._new(kind, -1, -1)
+
+    def token_node(self, kind, i):
+        slot = -1
+        if kind == LITERAL or kind == VALUE:
+            token_kind = self.token_kinds[i]
+            try:
+                if token_kind == INTEGER_KIND:
+                    self.ints.append(int(self._token_value(i)))
+                    slot = len(self.ints) - 1
+                elif token_kind == FLOAT_KIND:
+                    self.floats.append(float(self._token_value(i)))
+                    slot = len(self.floats) - 1
+            except (ValueError, OverflowError):
+                pass
+        return self._new(kind, i, slot)
+
+    def keyword(self, word, i):
+        return self._new(KEYWORD, i, word)
+
+    def bool_op(self, op):
+        return self._new(BOOL_OP, -1, op)
+
+    def new_rows(self):
+        return ValueRows()
+
+    def value_rows(self, rows):
+        self.rows.append(rows)
+        return self._new(VALUE_ROWS, -1, len(self.rows) - 1)
+
+    def add(self, parent, child):
+        self.parents[child] = parent
+        last = self._last_child[parent]
+        if last < 0:
+            self.first_child[parent] = child
+        else:
+            self.next_sibling[last] = child
+        self._last_child[parent] = child
+
+    def truncate(self, size):
+        """Drop the nodes from index size on, e.g. those of a statement that failed to parse."""
+        # Slots only grow, so the first dropped one of each side table marks its cut
+        cuts = {}
+        for n in range(size, len(self.kinds)):
+            kind, slot = self.kinds[n], self.slots[n]
+            if slot < 0 or kind == KEYWORD or kind == BOOL_OP:
+                continue
+            if kind == VALUE_ROWS:
+                table = self.rows
+            elif self.token_kinds[self.token_index[n]] == INTEGER_KIND:
+                table = self.ints
+            else:
+                table = self.floats
+            cuts.setdefault(id(table), (table, slot))
+        for table, slot in cuts.values():
+            del table[slot:]
+        for column in (self.kinds, self.parents, self.first_child, self.next_sibling,
+                       self.token_index, self.slots, self._last_child):
+            del column[size:]
+
+    def finish(self):
+        """Release the memory only needed while building."""
+        self._last_child = None
+        return self
+
+    # Accessors
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def children(self, n):
+        """Yield the child indexes of node n in order."""
+        c = self.first_child[n]
+        next_sibling = self.next_sibling
+        while c >= 0:
+            yield c
+            c = next_sibling[c]
+
+    def child(self, n, k):
+        """The k-th child of node n."""
+        c = self.first_child[n]
+        for _ in range(k):
+            c = self.next_sibling[c]
+        return c
+
+    def _token_value(self, i):
+        if isinstance(self.tokens, TokenBuffer):
+            return self.tokens.value(i)
+        return self.tokens[i][1]
+
+    def text(self, n):
+        i = self.token_index[n]
+        if i < 0:
+            return None
+        return self._token_value(i)
+
+    def line(self, n):
+        i = self.token_index[n]
+        if i < 0:
+            return None
+        if isinstance(self.tokens, TokenBuffer):
+            return self.tokens.lines[i]
+        return self.tokens[i][2]
+
+    def col(self, n):
+        i = self.token_index[n]
+        if i < 0:
+            return None
+        if isinstance(self.tokens, TokenBuffer):
+            return self.tokens.cols[i]
+        return self.tokens[i][3]
+
+    def rule(self, n):
+        """The node's label, as the rule of the equivalent node object."""
+        kind = self.kinds[n]
+        if kind == KEYWORD or kind == BOOL_OP:
+            return KEYWORD_LIST[self.slots[n]]
+        if kind == VALUE_ROWS:
+            return self.rows[self.slots[n]].rule
+        prefix = _RULE_PREFIXES.get(kind)
+        if prefix is not None:
+            return prefix + self.text(n)
+        return NODE_CLASSES[kind].rule
+
+    def sql_type(self, n):
+        """The SQL type of a literal node: "INT", "FLOAT" or "TEXT"; None for a parameter."""
+        return SQL_TYPES.get(self.token_kinds[self.token_index[n]])
+
+    def value(self, n):
+        """The int, float or unquoted str a literal node denotes."""
+        slot = self.slots[n]
+        sql_type = self.sql_type(n)
+        if slot >= 0:
+            return self.ints[slot] if sql_type == "INT" else self.floats[slot]
+        text = self.text(n)
+        return text[1:-1] if sql_type == "TEXT" else text
+
+    def walk(self, n=None):
+        """Yield (node, depth) for node n (default: the root) and its subtree, in preorder."""
+        first_child, next_sibling = self.first_child, self.next_sibling
+        root = self.root if n is None else n
+        yield root, 0
+        depth = 1
+        c = first_child[root]
+        while c >= 0 and depth > 0:
+            yield c, depth
+            if first_child[c] >= 0:
+                c = first_child[c]
+                depth += 1
+                continue
+            # Climb until a node with a next sibling, stopping at the root
+            while next_sibling[c] < 0 and depth > 0:
+                c = self.parents[c]
+                depth -= 1
+            if depth > 0:
+                c = next_sibling[c]
+
+    def cursor(self, n=None):
+        return Cursor(self, self.root if n is None else n)
+
+
+class Cursor:
+    """A movable position in an Arena.
+
+    The move methods return False and stay put when there is nowhere to go.
+    """
+
+    __slots__ = ("arena", "node")
+
+    def __init__(self, arena, node):
+        self.arena = arena
+        self.node = node
+
+    @property
+    def kind(self):
+        return self.arena.kinds[self.node]
+
+    @property
+    def rule(self):
+        return self.arena.rule(self.node)
+
+    @property
+    def text(self):
+        return self.arena.text(self.node)
+
+    @property
+    def line(self):
+        return self.arena.line(self.node)
+
+    @property
+    def col(self):
+        return self.arena.col(self.node)
+
+    def _move(self, target):
+        if target < 0:
+            return False
+        self.node = target
+        return True
+
+    def first_child(self):
+        return self._move(self.arena.first_child[self.node])
+
+    def next_sibling(self):
+        return self._move(self.arena.next_sibling[self.node])
+
+    def parent(self):
+        return self._move(self.arena.parents[self.node])
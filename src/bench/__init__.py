@@ -0,0 +1,10 @@
+# Benchmarks for the compiler phases
+#
+# Run from the src directory:
+#   python -m bench.runner --inserts 100000 --save baseline.json
+#   python -m bench.runner --inserts 100000 --compare baseline.json
+#
+# bench.runner is left out of the package imports so that running it with
+# -m does not import it twice.
+
+from bench.workload import generate_workload, write_workload
@@ -0,0 +1,181 @@
+# Benchmark runner
+#
+# Times the lexer, parser and semantic analyzer on a synthetic workload and
+# reports tokens/s, statements/s and the peak traced memory of each phase.
+# Results can be saved as a JSON baseline and later runs compared against it.
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from lexer import tokenize_sql
+from parser import Parser
+from semantic import SemanticAnalyzer
+from pipeline import compile_parallel
+from template import parse_dump
+from bench.workload import generate_workload
+
+PHASES = ("lex", "parse", "semantic", "template", "pipeline")
+
+
+def _measure(func, memory):
+    """Run func once and return (result, seconds, peak bytes or None)."""
+    gc.collect()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        # A second, traced run: tracemalloc slows allocation down too much
+        # to share a run with the timing
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_benchmark(code, engine="loop", repeat=1, memory=True, workers=None):
+    """Benchmark each phase on code and return the results as a dict.
+
+    Each phase is run repeat times and the fastest run is kept. When workers
+    is given, the whole parallel pipeline is timed as well; its peak memory
+    only covers the parent process. The template phase times parse_dump,
+    lexing and parsing in one go.
+    """
+    results = {"bytes": len(code.encode("utf-8")), "engine": engine, "workers": workers, "phases": {}}
+    tokens = tree = None
+    for phase in PHASES if workers else PHASES[:-1]:
+        if phase == "pipeline":
+            func = lambda: compile_parallel(code, workers=workers)
+        elif phase == "template":
+            func = lambda: parse_dump(code)
+        elif phase == "lex":
+            func = lambda: tokenize_sql(code, engine=engine)
+        elif phase == "parse":
+            func = lambda: Parser(tokens).parse_query()
+        else:
+            func = lambda: SemanticAnalyzer().analyze(tree)
+        best = None
+        for _ in range(repeat):
+            output, seconds, peak = _measure(func, memory and best is None)
+            best = seconds if best is None else min(best, seconds)
+            if peak is not None:
+                peak_bytes = peak
+        if phase == "lex":
+            tokens = output
+        elif phase == "parse":
+            tree = output
+        results["phases"][phase] = {"seconds": best, "peak_bytes": peak_bytes if memory else None}
+        output = None
+
+    results["tokens"] = len(tokens)
+    results["statements"] = len(tree.children)
+    for stats in results["phases"].values():
+        stats["tokens_per_s"] = results["tokens"] / stats["seconds"] if stats["seconds"] else 0.0
+        stats["statements_per_s"] = results["statements"] / stats["seconds"] if stats["seconds"] else 0.0
+    return results
+
+
+def compare_results(current, baseline, threshold=0.10):
+    """Compare two benchmark results phase by phase.
+
+    Returns a list of (phase, speedup, memory ratio, regressed) where speedup
+    is baseline seconds over current seconds and a phase counts as regressed
+    when it got more than threshold slower.
+    """
+    rows = []
+    for phase in PHASES:
+        cur = current["phases"].get(phase)
+        base = baseline["phases"].get(phase)
+        if not cur or not base:
+            continue
+        speedup = base["seconds"] / cur["seconds"] if cur["seconds"] else float("inf")
+        memory = None
+        if cur.get("peak_bytes") and base.get("peak_bytes"):
+            memory = cur["peak_bytes"] / base["peak_bytes"]
+        rows.append((phase, speedup, memory, speedup < 1 / (1 + threshold)))
+    return rows
+
+
+def format_results(results):
+    lines = [f"{results['bytes'] / 1e6:.1f} MB, {results['tokens']} tokens, "
+             f"{results['statements']} statements (engine={results['engine']})",
+             f"{'phase':<10}{'seconds':>10}{'tokens/s':>14}{'stmts/s':>12}{'peak MB':>10}"]
+    for phase, stats in results["phases"].items():
+        peak = stats["peak_bytes"]
+        lines.append(f"{phase:<10}{stats['seconds']:>10.3f}{stats['tokens_per_s']:>14,.0f}"
+                     f"{stats['statements_per_s']:>12,.0f}{peak / 1e6 if peak else float('nan'):>10.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the SQL compiler phases.")
+    ap.add_argument("--file", help="benchmark an existing script instead of a generated one")
+    ap.add_argument("--tables", type=int, default=10)
+    ap.add_argument("--columns", type=int, default=8)
+    ap.add_argument("--inserts", type=int, default=10000)
+    ap.add_argument("--rows-per-insert", type=int, default=1)
+    ap.add_argument("--selects", type=int, default=1000)
+    ap.add_argument("--updates", type=int, default=500)
+    ap.add_argument("--deletes", type=int, default=100)
+    ap.add_argument("--where-depth", type=int, default=3, help="nesting depth of WHERE conditions")
+    ap.add_argument("--where-terms", type=int, default=2, help="AND/OR-joined comparisons per nesting level")
+    ap.add_argument("--string-length", type=int, default=16)
+    ap.add_argument("--comment-every", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--engine", default="loop", help="lexer engine: loop or regex")
+    ap.add_argument("--workers", type=int, help="also time the parallel pipeline with this many processes")
+    ap.add_argument("--repeat", type=int, default=1, help="runs per phase, the fastest is kept")
+    ap.add_argument("--no-memory", action="store_true", help="skip the traced memory runs")
+    ap.add_argument("--save", metavar="JSON", help="save the results as a baseline")
+    ap.add_argument("--compare", metavar="JSON", help="compare against a saved baseline")
+    ap.add_argument("--threshold", type=float, default=0.10,
+                    help="slowdown that counts as a regression (default 0.10)")
+    args = ap.parse_args(argv)
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            code = f.read()
+        workload = {"file": args.file}
+    else:
+        workload = {
+            "tables": args.tables, "columns": args.columns, "inserts": args.inserts,
+            "rows_per_insert": args.rows_per_insert,
+            "selects": args.selects, "updates": args.updates, "deletes": args.deletes,
+            "where_depth": args.where_depth, "where_terms": args.where_terms,
+            "string_length": args.string_length,
+            "comment_every": args.comment_every, "seed": args.seed,
+        }
+        code = generate_workload(**workload)
+
+    results = run_benchmark(code, engine=args.engine, repeat=args.repeat, memory=not args.no_memory,
+                            workers=args.workers)
+    results["workload"] = workload
+    print(format_results(results))
+
+    regressed = False
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("workload") != workload:
+            print("warning: baseline was recorded on a different workload")
+        print(f"\nagainst {args.compare}:")
+        for phase, speedup, memory, slower in compare_results(results, baseline, args.threshold):
+            mem = f", memory x{memory:.2f}" if memory is not None else ""
+            print(f"{phase:<10} x{speedup:.2f} speed{mem}{'  REGRESSION' if slower else ''}")
+            regressed = regressed or slower
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
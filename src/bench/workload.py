@@ -0,0 +1,96 @@
+# Synthetic SQL workload generator
+
+import io
+import random
+
+TYPES = ("INT", "FLOAT", "TEXT")
+
+
+def _literal(rng, col_type, string_length):
+    if col_type == "INT":
+        return str(rng.randint(0, 10 ** 6))
+    if col_type == "FLOAT":
+        return f"{rng.uniform(0, 1000):.2f}"
+    return "'" + "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(string_length)) + "'"
+
+
+def _comparison(rng, columns):
+    name, col_type = rng.choice(columns)
+    return f"{name} {rng.choice(('=', '<>', '<', '>', '<=', '>='))} {_literal(rng, col_type, 8)}"
+
+
+def _chain(rng, columns, terms):
+    """terms comparisons joined by AND and OR."""
+    parts = [_comparison(rng, columns)]
+    for _ in range(terms - 1):
+        parts.append(rng.choice(("AND", "OR")))
+        parts.append(_comparison(rng, columns))
+    return " ".join(parts)
+
+
+def _condition(rng, columns, depth, terms):
+    """A WHERE condition of chains of terms comparisons, parenthesized depth levels deep.
+
+    Each level wraps the one inside it, optionally under NOT, and joins it
+    to a chain of its own with AND or OR, so the size grows linearly with
+    both depth and terms. It is built outward from the innermost chain
+    without recursion.
+    """
+    opening = []
+    closing = []
+    for _ in range(depth):
+        opening.append("NOT (" if rng.random() < 0.2 else "(")
+        closing.append(f" {rng.choice(('AND', 'OR'))} {_chain(rng, columns, terms)})")
+    opening.reverse()
+    return "".join(opening) + _chain(rng, columns, terms) + "".join(closing)
+
+
+def write_workload(out, tables=10, columns=8, inserts=10000, selects=1000, updates=500,
+                   deletes=100, where_depth=3, where_terms=2, string_length=16, comment_every=0,
+                   comment_length=80, rows_per_insert=1, seed=0):
+    """Write a synthetic script to the text file object out.
+
+    The script creates tables with columns columns each, then mixes inserts,
+    selects, updates and deletes over them. SELECT/UPDATE/DELETE carry WHERE
+    clauses nested where_depth levels deep, with where_terms comparisons
+    joined by AND/OR at each level, TEXT literals are string_length
+    characters long, and every comment_every-th statement is preceded by a
+    block comment of comment_length characters (0 disables comments). Each
+    INSERT adds rows_per_insert rows, as a multi-row VALUES list when more
+    than one.
+    Statements are written one at a time, so scripts of any size can be
+    streamed straight to disk.
+    """
+    rng = random.Random(seed)
+    schema = []
+    for t in range(tables):
+        cols = [(f"c{c}", rng.choice(TYPES)) for c in range(columns)]
+        schema.append((f"t{t}", cols))
+        out.write(f"CREATE TABLE t{t} (\n    " + ",\n    ".join(f"{n} {ty}" for n, ty in cols) + "\n);\n")
+
+    kinds = ["INSERT"] * inserts + ["SELECT"] * selects + ["UPDATE"] * updates + ["DELETE"] * deletes
+    rng.shuffle(kinds)
+    for n, kind in enumerate(kinds, 1):
+        if comment_every and n % comment_every == 0:
+            out.write("/* " + "x" * comment_length + " */\n")
+        table, cols = rng.choice(schema)
+        if kind == "INSERT":
+            rows = ",\n    ".join("(" + ", ".join(_literal(rng, ty, string_length) for _, ty in cols) + ")"
+                                  for _ in range(rows_per_insert))
+            out.write(f"INSERT INTO {table} VALUES {rows};\n")
+        elif kind == "SELECT":
+            picked = ", ".join(name for name, _ in rng.sample(cols, rng.randint(1, len(cols))))
+            out.write(f"SELECT {picked} FROM {table} WHERE {_condition(rng, cols, where_depth, where_terms)};\n")
+        elif kind == "UPDATE":
+            name, ty = rng.choice(cols)
+            out.write(f"UPDATE {table} SET {name} = {_literal(rng, ty, string_length)} "
+                      f"WHERE {_condition(rng, cols, where_depth, where_terms)};\n")
+        else:
+            out.write(f"DELETE FROM {table} WHERE {_condition(rng, cols, where_depth, where_terms)};\n")
+
+
+def generate_workload(**options):
+    """Return a synthetic script as a string; see write_workload for the options."""
+    out = io.StringIO()
+    write_workload(out, **options)
+    return out.getvalue()
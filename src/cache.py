@@ -0,0 +1,141 @@
+# Parse Cache
+#
+# Scripts and request streams repeat the same statements over and over. The
+# parse cache keeps the trees of recently parsed statements, keyed by their
+# tokens' types and values: the lexer already drops whitespace and comments
+# and upper-cases keywords, so statements that differ only in layout or
+# keyword case share an entry.
+#
+# A statement found again at the same position, as when an unchanged script
+# is checked again, gets the cached tree itself, so trees handed out by the
+# cache must not be modified. Elsewhere, fresh nodes are built from the
+# entry's flattened tree (see nodes.flatten) with the positions of the
+# statement at hand, and these become the entry's tree.
+
+import threading
+from array import array
+from collections import OrderedDict
+
+from nodes import VALUE_ROWS, flatten, unflatten
+from parser import Parser
+
+
+class ParseCache:
+    """A thread-safe LRU cache of statement parse trees.
+
+    At most max_entries statements are kept, holding at most max_tokens
+    tokens together; the least recently used are evicted first. Only
+    statements that parse without errors are cached. hits and misses count
+    lookups.
+    """
+
+    def __init__(self, max_entries=4096, max_tokens=1 << 20):
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.tokens = 0
+
+    def parse(self, tokens):
+        """Return (nodes, errors) as Parser(tokens).parse_query() gives them, from the cache if possible.
+
+        The nodes are shared with the cache when errors is empty.
+        """
+        key = tuple([(tok[0], tok[1]) for tok in tokens])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is not None:
+            placed = tuple(tokens)
+            current = entry.current
+            if placed != current[0]:
+                current = entry.current = (placed, _rebuild(entry, tokens))
+            return current[1], []
+
+        parser = Parser(tokens)
+        nodes = parser.parse_query().children
+        if not parser.error_messages:
+            self._store(key, _Entry(nodes, tokens))
+        return nodes, parser.error_messages
+
+    def _store(self, key, entry):
+        size = len(key)
+        if size > self.max_tokens:
+            return
+        entries = self._entries
+        with self._lock:
+            if key in entries:
+                return
+            entries[key] = entry
+            self.tokens += size
+            while len(entries) > self.max_entries or self.tokens > self.max_tokens:
+                old, _ = entries.popitem(last=False)
+                self.tokens -= len(old)
+
+    def stats(self):
+        """A one-line summary of the cache's use."""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (f"{len(self._entries)} statements, {self.tokens} tokens, "
+                f"{self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)")
+
+
+class _Entry:
+    """A cached statement: its tree flattened, with the token each node takes its position from.
+
+    In refs, a node without a position has -1, and a ValueRows an array of
+    the token index of each of its values; the arrays of a ValueRows are
+    copied, so the flattened tree shares nothing with nodes. current
+    holds the tokens and the tree the entry was last used with; the pair is
+    replaced as a whole, so other threads never see one without the other.
+    """
+
+    __slots__ = ("kinds", "args", "counts", "refs", "current")
+
+    def __init__(self, nodes, tokens):
+        at = {(tok[2], tok[3]): i for i, tok in enumerate(tokens) if tok[0] != "ERROR"}
+        kinds, args, counts = flatten(nodes)
+        refs = []
+        for k, node_args in enumerate(args):
+            if kinds[k] == VALUE_ROWS:
+                values, lines, cols, texts, row_ends = node_args
+                refs.append(array('i', [at[position] for position in zip(lines, cols)]))
+                args[k] = (array('B', values), None, None, list(texts), array('I', row_ends))
+            elif len(node_args) >= 3 and node_args[-3] is not None:
+                refs.append(at[(node_args[-3], node_args[-2])])
+            else:
+                refs.append(-1)
+        self.kinds, self.args, self.counts, self.refs = kinds, args, counts, refs
+        self.current = (tuple(tokens), nodes)
+
+
+def _rebuild(entry, tokens):
+    """Fresh nodes from entry, positioned at tokens."""
+    args = entry.args
+    placed = []
+    for k, ref in enumerate(entry.refs):
+        node_args = args[k]
+        if ref.__class__ is int:
+            if ref >= 0:
+                tok = tokens[ref]
+                node_args = node_args[:-3] + (tok[2], tok[3], node_args[-1])
+        else:
+            values, _, _, texts, row_ends = node_args
+            node_args = (array('B', values), array('i', [tokens[i][2] for i in ref]),
+                         array('i', [tokens[i][3] for i in ref]), list(texts), array('I', row_ends))
+        placed.append(node_args)
+    return unflatten((entry.kinds, placed, entry.counts))
@@ -0,0 +1,196 @@
+# Schema Catalog
+#
+# A catalog holds the tables of a schema between runs of the semantic
+# analyzer, so a migration is checked against it without analyzing every
+# CREATE TABLE that built the schema. It is saved in a compact binary file:
+#
+#     header   magic b"SQLCAT", format (u16), version (u64), table count (u32),
+#              size of the name block (u32)
+#     names    the table names, UTF-8, each followed by a NUL byte
+#     offsets  u64 offset of each table's record after the names, plus one
+#              past the last record
+#     records  per column a type code byte and the column name, UTF-8, each
+#              followed by a NUL byte
+#
+# Loading reads the header, names and offsets only; a table's record is
+# decoded the first time the table is looked up.
+
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import MutableMapping
+
+MAGIC = b"SQLCAT"
+FORMAT = 1
+_HEADER = struct.Struct("<6sHQII")
+_TYPE_CODES = {"INT": "I", "FLOAT": "F", "TEXT": "T", None: "?"}
+_CODE_TYPES = {code: sql_type for sql_type, code in _TYPE_CODES.items()}
+
+
+class Catalog(MutableMapping):
+    """The tables of a schema, as a mapping { table_name: { column_name: data_type } }.
+
+    It can stand in for SemanticAnalyzer's symbol table (see analyze()),
+    which then adds the tables the script creates. version counts the
+    saves that changed the catalog, including edits made in place to the
+    column dicts it hands out.
+    """
+
+    def __init__(self, tables=None):
+        self.version = 0
+        self._tables = {}
+        # Tables of the loaded file not decoded yet: { name: k }, where k
+        # indexes _offsets
+        self._unread = {}
+        self._offsets = array('Q')
+        self._records = b""
+        self._map = None
+        self._changed = False
+        # The record of each table in _tables as last loaded or saved, to
+        # tell whether its columns were edited in place since
+        self._saved = {}
+        if tables:
+            self.update(tables)
+
+    @classmethod
+    def load(cls, path):
+        """Open a catalog saved by save(); tables are decoded on demand.
+
+        The file stays mapped while tables are left to decode; save()
+        releases it before replacing the file.
+        """
+        catalog = cls()
+        names = catalog._map_file(path)
+        catalog._unread = dict(zip(names, range(len(names))))
+        return catalog
+
+    def _map_file(self, path):
+        """Map the file at path and read its header and offsets; returns the table names."""
+        with open(path, "rb") as f:
+            # mmap refuses empty files, so short ones are turned away first
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise ValueError(f"'{path}' is not a catalog file")
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, version, count, names_size = _HEADER.unpack_from(data)
+        if magic != MAGIC or fmt != FORMAT:
+            data.close()
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a catalog file")
+        if fmt != FORMAT:
+            raise ValueError(f"catalog format {fmt} of '{path}' is not supported")
+        self.version = version
+        pos = _HEADER.size
+        names = data[pos:pos + names_size].decode("utf-8").split("\0")[:count]
+        pos += names_size
+        self._offsets = array('Q')
+        self._offsets.frombytes(data[pos:pos + 8 * (count + 1)])
+        pos += 8 * (count + 1)
+        self._map = data
+        self._records = memoryview(data)[pos:]
+        return names
+
+    def _unmap(self):
+        if self._map is not None:
+            self._records.release()
+            self._records = b""
+            self._map.close()
+            self._map = None
+
+    def save(self, path):
+        """Write the catalog to path, replacing the file in one step.
+
+        The version goes up if tables were added or deleted since the last
+        load or save, or if a table's columns were edited in place.
+        """
+        names = []
+        records = []
+        offsets = array('Q', [0])
+        size = 0
+        for name, k in self._unread.items():
+            # Tables never decoded are copied as they are
+            names.append(name)
+            record = self._records[self._offsets[k]:self._offsets[k + 1]]
+            records.append(record)
+            size += len(record)
+            offsets.append(size)
+        saved = {}
+        for name, columns in self._tables.items():
+            names.append(name)
+            record = "".join(_TYPE_CODES[col_type] + col_name + "\0"
+                             for col_name, col_type in columns.items()).encode("utf-8")
+            if record != self._saved.get(name):
+                self._changed = True
+            saved[name] = record
+            records.append(record)
+            size += len(record)
+            offsets.append(size)
+        if self._changed:
+            self.version += 1
+            self._changed = False
+        self._saved = saved
+        name_block = "".join(name + "\0" for name in names).encode("utf-8")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT, self.version, len(names), len(name_block)))
+            f.write(name_block)
+            f.write(offsets.tobytes())
+            for record in records:
+                f.write(record)
+        # A mapped file cannot be replaced on Windows, so the mapping is
+        # released first; the tables still undecoded come first in the new
+        # file, in the same order, and are mapped from there
+        records = record = None
+        self._unmap()
+        os.replace(tmp, path)
+        if self._unread:
+            self._map_file(path)
+            self._unread = dict(zip(self._unread, range(len(self._unread))))
+
+    def _read(self, name):
+        k = self._unread.pop(name)
+        record = bytes(self._records[self._offsets[k]:self._offsets[k + 1]])
+        self._saved[name] = record
+        record = record.decode("utf-8")
+        columns = {}
+        for part in record.split("\0")[:-1]:
+            columns[part[1:]] = _CODE_TYPES[part[0]]
+        self._tables[name] = columns
+        return columns
+
+    def __getitem__(self, name):
+        columns = self._tables.get(name)
+        if columns is None:
+            if name not in self._unread:
+                raise KeyError(name)
+            columns = self._read(name)
+        return columns
+
+    def __contains__(self, name):
+        return name in self._tables or name in self._unread
+
+    def __setitem__(self, name, columns):
+        self._unread.pop(name, None)
+        self._tables[name] = columns
+        self._changed = True
+
+    def __delitem__(self, name):
+        if name in self._unread:
+            del self._unread[name]
+        else:
+            del self._tables[name]
+        self._changed = True
+
+    def __iter__(self):
+        yield from list(self._unread)
+        yield from list(self._tables)
+
+    def __len__(self):
+        return len(self._tables) + len(self._unread)
+
+    def loaded(self):
+        """The tables decoded or added so far, as a dict."""
+        return self._tables
+
+    def __repr__(self):
+        return f"Catalog({len(self)} tables, version {self.version})"
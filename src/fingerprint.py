@@ -0,0 +1,124 @@
+# Query Fingerprints
+#
+# A statement's shape is its token stream with every literal and parameter
+# replaced by ?, and the rows of a multi-row VALUES list folded into one.
+# Keywords are already upper-cased by the lexer, and whitespace and comments
+# never become tokens, so statements differing only in their values, layout
+# or keyword case have the same shape. The fingerprint is a 64-bit BLAKE2b
+# hash of the shape, stable across runs and machines.
+#
+# profile_workload() counts the shapes of a SQL log straight from the
+# lexer's token stream, without parsing, to find which shapes dominate.
+
+import re
+from hashlib import blake2b
+
+from lexer import iter_tokens
+
+_PLACEHOLDER_TYPES = frozenset(("INTEGER_LITERAL", "FLOAT_LITERAL", "STRING_LITERAL", "PARAMETER"))
+# Runs of identical rows, as shapes spell them
+_REPEATED_ROWS = re.compile(r"(\( \?(?: , \?)* \))(?: , \1)+")
+
+
+def _shape(pieces):
+    text = " ".join(pieces)
+    if ") , (" in text:
+        text = _REPEATED_ROWS.sub(r"\1", text)
+    return text
+
+
+def normalize(tokens):
+    """The shape of a statement's tokens, e.g. "INSERT INTO t VALUES ( ? , ? ) ;"."""
+    return _shape(["?" if ttype in _PLACEHOLDER_TYPES else value
+                   for ttype, value, _, _ in tokens if ttype != "ERROR"])
+
+
+def shape_id(shape):
+    """The 64-bit fingerprint of a shape."""
+    return int.from_bytes(blake2b(shape.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def fingerprint(tokens):
+    """The 64-bit fingerprint of a statement's tokens."""
+    return shape_id(normalize(tokens))
+
+
+class WorkloadStats:
+    """Statement counts per fingerprint, kept in bounded memory.
+
+    At most capacity fingerprints are tracked. When more turn up, the less
+    frequent half is dropped and floor is raised to the largest count
+    dropped; a fingerprint seen after that starts from floor, so a count
+    may be too high by at most its error, and never too low. With floor 0
+    all counts are exact.
+    """
+
+    def __init__(self, capacity=10000):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, not {capacity}")
+        self.capacity = capacity
+        self.statements = 0
+        self.errors = 0
+        self.floor = 0
+        # { fingerprint: [count, error, shape, example] }
+        self.counts = {}
+
+    def add(self, tokens):
+        """Count one statement given as tokens."""
+        self.statements += 1
+        pieces = ["?" if ttype in _PLACEHOLDER_TYPES else value
+                  for ttype, value, _, _ in tokens if ttype != "ERROR"]
+        if len(pieces) != len(tokens):
+            self.errors += len(tokens) - len(pieces)
+        shape = _shape(pieces)
+        fp = shape_id(shape)
+        entry = self.counts.get(fp)
+        if entry is not None:
+            entry[0] += 1
+            return
+        example = " ".join([value for ttype, value, _, _ in tokens if ttype != "ERROR"])
+        self.counts[fp] = [self.floor + 1, self.floor, shape, example]
+        if len(self.counts) > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        ranked = sorted(self.counts.items(), key=lambda item: item[1][0], reverse=True)
+        # The most frequent fingerprint always stays, even with capacity 1
+        keep = max(1, self.capacity // 2)
+        self.floor = max(self.floor, ranked[keep][1][0])
+        self.counts = dict(ranked[:keep])
+
+    def top(self, n=10):
+        """The n most frequent fingerprints as (fingerprint, count, error, shape, example), most frequent first."""
+        ranked = sorted(self.counts.items(), key=lambda item: item[1][0], reverse=True)[:n]
+        return [(fp, count, error, shape, example) for fp, (count, error, shape, example) in ranked]
+
+    def report(self, n=10):
+        """The top n fingerprints as printable lines."""
+        lines = [f"{self.statements} statements, {len(self.counts)} shapes tracked"]
+        for fp, count, error, shape, example in self.top(n):
+            share = count / self.statements if self.statements else 0.0
+            bound = f" (up to {error} high)" if error else ""
+            lines.append(f"{fp:016x} {count:>10}{bound} {share:7.2%}  {shape}")
+            lines.append(f"{'':>36}e.g. {example}")
+        return "\n".join(lines)
+
+
+def profile_workload(fileobj, capacity=10000, chunk_size=1 << 16):
+    """Count the statement shapes of a SQL log read from the text file object fileobj.
+
+    Tokens are streamed with iter_tokens in recovery mode, so memory stays
+    bounded by capacity and the longest statement, and no parse trees are
+    built. Returns the WorkloadStats.
+    """
+    stats = WorkloadStats(capacity)
+    statement = []
+    append = statement.append
+    for token in iter_tokens(fileobj, chunk_size, recover=True):
+        append(token)
+        if token[1] == ";" and token[0] == "DELIMITER":
+            stats.add(statement)
+            statement.clear()
+    if statement:
+        stats.add(statement)
+    return stats
@@ -8,9 +8,10 @@ from tkinter import filedialog
 from tkinter import messagebox
 
 # Import compiler phases
-from lexer import tokenize_sql
-from parser import Parser
-from semantic import SemanticAnalyzer
+from incremental import compile_sql, recompile, edit_between
+from cache import ParseCache
+from nodes import Query, Stmt, Keyword, TableRef, ColumnDef, ColumnRef, TypeName, Literal, Comparison, BoolOp
+from splitter import split_statements, statement_at
 
 # Tree visualization
 try:
@@ -40,45 +41,40 @@ class GraphvizTreeGenerator:
     def _count_nodes(self, root):
         if not root:
             return 0
-        count = 1
-        for child in root.children:
-            count += self._count_nodes(child)
+        count = 0
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
         return count
 
-    def _get_tree_stats(self, root):
+    def _get_tree_stats(self, root, max_level=50):
         if not root:
             return 0, 0, 0, 0
 
-        def get_max_width_at_level(node, level=0, max_level=50):
-            if level > max_level or not node:
-                return 0
-            if not node.children:
-                return 1
-            return max(len(node.children), max(get_max_width_at_level(child, level+1, max_level) for child in node.children))
-
-        def get_max_depth(node, depth=0, max_depth=50):
-            if depth > max_depth or not node:
-                return depth
-            if not node.children:
-                return depth
-            return max(get_max_depth(child, depth+1, max_depth) for child in node.children)
-
-        def get_avg_children_per_node(node):
-            if not node:
-                return 0
-            total = len(node.children)
-            count = 1 if node.children else 0
-            for child in node.children:
-                t, c = get_avg_children_per_node(child)
-                total += t
-                count += c
-            return total, count
-
-        total_nodes = self._count_nodes(root)
-        max_depth = get_max_depth(root)
-        max_width = get_max_width_at_level(root)
-        t, c = get_avg_children_per_node(root)
-        avg_children = t / max(1, c)
+        # One pass with an explicit stack; width and depth only look at the
+        # top max_level levels, as before
+        total_nodes = 0
+        max_depth = 0
+        max_width = 0
+        total_children = 0
+        parents = 0
+        stack = [(root, 0)]
+        while stack:
+            node, level = stack.pop()
+            total_nodes += 1
+            children = node.children
+            if level <= max_level:
+                max_width = max(max_width, len(children) or 1)
+            if children:
+                total_children += len(children)
+                parents += 1
+                for child in children:
+                    stack.append((child, level + 1))
+            else:
+                max_depth = max(max_depth, min(level, max_level + 1))
+        avg_children = total_children / max(1, parents)
         return total_nodes, max_depth, max_width, avg_children
 
     def generate_tree_image(self, root, filename="parse_tree"):
@@ -116,7 +112,16 @@ class GraphvizTreeGenerator:
             print(f"Error rendering tree: {e}")
             return None, {}
 
-    def _add_node(self, node, parent_id=None):
+    def _add_node(self, root, parent_id=None):
+        # Preorder with an explicit stack, so node ids are numbered as before
+        stack = [(root, parent_id)]
+        while stack:
+            node, parent_id = stack.pop()
+            self._add_one(node, parent_id)
+            for child in reversed(node.children):
+                stack.append((child, node.node_id))
+
+    def _add_one(self, node, parent_id):
         node_id = f"node{self.counter}"
         self.counter += 1
         node.node_id = node_id
@@ -127,39 +132,39 @@ class GraphvizTreeGenerator:
         fontcolor = "#1565C0"
         border_color = "#1976D2"
         
-        if label.endswith("Stmt"):
+        if isinstance(node, Stmt):
             fillcolor = "#BBDEFB"
             fontcolor = "#0D47A1"
             border_color = "#1565C0"
-        elif label in ["CREATE", "TABLE", "SELECT", "FROM", "WHERE", "INSERT", "INTO", "VALUES", "UPDATE", "SET", "DELETE"]:
+        elif isinstance(node, Keyword):
             fillcolor = "#C8E6C9"
             fontcolor = "#1B5E20"
             border_color = "#2E7D32"
-        elif label.startswith("Table:"):
+        elif isinstance(node, TableRef):
             fillcolor = "#FFCDD2"
             fontcolor = "#B71C1C"
             border_color = "#C62828"
-        elif label.startswith("Col:"):
+        elif isinstance(node, (ColumnDef, ColumnRef)):
             fillcolor = "#FFF9C4"
             fontcolor = "#F57F17"
             border_color = "#F9A825"
-        elif label.startswith("Type:"):
+        elif isinstance(node, TypeName):
             fillcolor = "#E1BEE7"
             fontcolor = "#4A148C"
             border_color = "#6A1B9A"
-        elif label.startswith("Value:") or label.startswith("Val:"):
+        elif isinstance(node, Literal):
             fillcolor = "#C5E1A5"
             fontcolor = "#33691E"
             border_color = "#558B2F"
-        elif label == "Comparison":
+        elif isinstance(node, Comparison):
             fillcolor = "#FFE0B2"
             fontcolor = "#E65100"
             border_color = "#F57C00"
-        elif label in ["AND", "OR", "NOT"]:
+        elif isinstance(node, BoolOp):
             fillcolor = "#FFCCBC"
             fontcolor = "#BF360C"
             border_color = "#D84315"
-        elif label == "Query":
+        elif isinstance(node, Query):
             fillcolor = "#263238"
             fontcolor = "#FFFFFF"
             border_color = "#37474F"
@@ -167,8 +172,6 @@ class GraphvizTreeGenerator:
         self.graph.node(node_id, label, fillcolor=fillcolor, fontcolor=fontcolor, color=border_color, penwidth='2')
         if parent_id:
             self.graph.edge(parent_id, node_id)
-        for child in node.children:
-            self._add_node(child, node_id)
 
 
 # SCROLLBAR WIDGET
@@ -263,6 +266,7 @@ PALETTE_DARK = {
         "FLOAT_LITERAL": (220, 170, 110),
         "OPERATOR": (100, 200, 240),
         "DELIMITER": (180, 190, 210),
+        "PARAMETER": (240, 150, 120),
     },
     "TOKEN_LIST": {"ERROR": (255, 100, 100)},
     "SUCCESS": (100, 220, 140),
@@ -294,6 +298,7 @@ PALETTE_LIGHT = {
         "FLOAT_LITERAL": (180, 100, 30),  # Softer orange
         "OPERATOR": (100, 50, 100),  # Softer purple
         "DELIMITER": (110, 115, 125),  # Softer gray
+        "PARAMETER": (190, 70, 50),  # Softer red
     },
     "TOKEN_LIST": {"ERROR": (200, 30, 30)},  # Softer red
     "SUCCESS": (40, 150, 60),  # Softer green
@@ -416,28 +421,15 @@ def create_code_token_mapping(tokens, code_lines):
     return mapping, valid_tokens, token_type_map
 
 
-def find_statement_tokens(line_num, word_start_col, word_end_col, code_lines, valid_tokens):
-    statement_tokens = set()
+def find_statement_tokens(line_num, word_start_col, word_end_col, statements, valid_tokens):
+    statement = statement_at(statements, line_num, word_start_col)
+    if statement is None:
+        return set()
 
-    # Find statement start (look backwards for SQL keywords)
-    statement_start_line = line_num
-    for i in range(line_num - 1, max(0, line_num - 10), -1):
-        line = code_lines[i] if i < len(code_lines) else ""
-        if any(keyword in line.upper() for keyword in ["CREATE", "SELECT", "INSERT", "UPDATE", "DELETE"]):
-            statement_start_line = i + 1
-            break
-
-    # Find statement end (look forwards for semicolon)
-    statement_end_line = line_num
-    for i in range(line_num - 1, min(len(code_lines), line_num + 10)):
-        line = code_lines[i] if i < len(code_lines) else ""
-        if ';' in line:
-            statement_end_line = i + 1
-            break
-
-    # Get all tokens in this statement range
+    # Get all tokens in this statement
+    statement_tokens = set()
     for token_idx, (ttype, tval, tline, tcol) in enumerate(valid_tokens):
-        if tline and statement_start_line <= tline <= statement_end_line:
+        if tline and statement.contains(tline, tcol):
             statement_tokens.add(token_idx)
 
     return statement_tokens
@@ -446,15 +438,13 @@ def find_statement_tokens(line_num, word_start_col, word_end_col, code_lines, va
 def find_node_by_position(root, line, text):
     if not root:
         return None
-    def search(node):
+    stack = [root]
+    while stack:
+        node = stack.pop()
         if node.line == line and node.text and text == node.text:
             return node
-        for child in node.children:
-            result = search(child)
-            if result:
-                return result
-        return None
-    return search(root)
+        stack.extend(reversed(node.children))
+    return None
 
 
 def draw_card(surface, rect, palette, title="", content_lines=None, icon="", border_color=None):
@@ -511,21 +501,26 @@ def main():
     drag_drop_active = False
     drag_drop_file = None
 
+    last_result = None
+    parse_cache = ParseCache()
+
     def run_compiler(code):
-        tokens = tokenize_sql(code)
-        lex_errors = [t for t in tokens if t[0] == 'ERROR']
-        parser = Parser(tokens)
-        parse_tree = parser.parse_query()
-        parse_errors = parser.error_messages
-        analyzer = SemanticAnalyzer()
-        semantic_result = analyzer.analyze(parse_tree)
-        return tokens, parse_tree, lex_errors, parse_errors, semantic_result
+        # Reloads only recompile the statements that changed since last time,
+        # and statements seen before are not parsed again
+        nonlocal last_result
+        if last_result is None:
+            last_result = compile_sql(code, cache=parse_cache, render=True)
+        else:
+            last_result = recompile(last_result, *edit_between(last_result.code, code), cache=parse_cache,
+                                    render=True)
+        return last_result.as_tuple()
 
     tokens, parse_tree, lex_errors, parse_errors, semantic_result = run_compiler(sql_code)
     code_lines = sql_code.splitlines()
 
     # mapping from SQL code positions to tokens 
     code_token_mapping, valid_tokens, token_type_map = create_code_token_mapping(tokens, code_lines)
+    statements = split_statements(sql_code)
 
     # hovered word/statement 
     hovered_word_info = None  # (line, word, word_start_col, word_end_col)
@@ -713,6 +708,7 @@ def main():
                         code_lines = sql_code.splitlines()
                         # Recreate token mappings for new file
                         code_token_mapping, valid_tokens, token_type_map = create_code_token_mapping(tokens, code_lines)
+                        statements = split_statements(sql_code)
                         generate_tree(parse_tree)
                         tree_auto_fit = True
                         # Reset scroll positions
@@ -744,6 +740,7 @@ def main():
                                 code_lines = sql_code.splitlines()
                                 # Recreate token mappings for new file
                                 code_token_mapping, valid_tokens, token_type_map = create_code_token_mapping(tokens, code_lines)
+                                statements = split_statements(sql_code)
                                 generate_tree(parse_tree)
                                 tree_auto_fit = True
                                 # Reset scroll positions
@@ -971,7 +968,7 @@ def main():
                                                 highlighted_token_indices.add(token_idx)
                                     
                                     # Find all tokens in the same statement
-                                    statement_tokens = find_statement_tokens(line_num, col_pos, col_pos + len(part) - 1, code_lines, valid_tokens)
+                                    statement_tokens = find_statement_tokens(line_num, col_pos, col_pos + len(part) - 1, statements, valid_tokens)
                                     highlighted_token_indices.update(statement_tokens)
                                 
                                 # Determine color based on actual token type from TOKEN_LIST
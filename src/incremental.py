@@ -0,0 +1,257 @@
+# Incremental Compilation
+#
+# A script is kept as a list of segments, one per ';'-terminated statement.
+# After an edit only the segments from the one containing the edit up to the
+# first statement boundary past it are lexed and parsed again; the segments
+# after that boundary are reused with their positions shifted.
+
+from array import array
+from bisect import bisect_right
+
+from lexer import _ScanState, _scan_regex, _finish_scan
+from parser import Parser
+from nodes import Query, VALUE_ROWS, copy_trees, picklable
+from semantic import SemanticAnalyzer
+
+CHUNK_SIZE = 1 << 14
+
+
+class Segment:
+    """One statement of the script and the lexer state at its start."""
+
+    def __init__(self, start, line, base, parens=()):
+        self.start = start
+        self.end = start
+        self.line = line
+        self.base = base
+        self.parens = parens
+        self.tokens = []
+        self.nodes = []
+        self.errors = []
+        # Whether nodes belong to a ParseCache, which may hand them out again
+        self.shared = False
+
+    def closed(self):
+        """Whether the segment ends in a ';' delimiter."""
+        return bool(self.tokens) and self.tokens[-1][:2] == ("DELIMITER", ";")
+
+    def parse(self, cache=None):
+        if cache is not None:
+            self.nodes, self.errors = cache.parse(self.tokens)
+            self.shared = not self.errors
+            return
+        self.shared = False
+        parser = Parser(self.tokens)
+        self.nodes = parser.parse_query().children
+        self.errors = parser.error_messages
+
+    def __getstate__(self):
+        # Statements pickle as node objects, which load fastest, except those
+        # nested too deeply for the pickler's recursion, such as long chains
+        # of ANDs and ORs
+        state = self.__dict__.copy()
+        state["nodes"] = [picklable(node) for node in self.nodes]
+        return state
+
+
+class CompileResult:
+    """Tokens, parse tree and diagnostics of one compiled script.
+
+    With render set, the semantic result's dumps are rendered right away
+    (see SemanticAnalyzer.analyze); otherwise only when read, which must be
+    before the result is passed to recompile().
+    """
+
+    def __init__(self, code, segments, render=False):
+        self.code = code
+        self.segments = segments
+        self.tokens = []
+        self.parse_tree = Query()
+        self.parse_errors = []
+        for seg in segments:
+            self.tokens.extend(seg.tokens)
+            self.parse_tree.children.extend(seg.nodes)
+            self.parse_errors.extend(seg.errors)
+        self.lex_errors = [t for t in self.tokens if t[0] == 'ERROR']
+        analyzer = SemanticAnalyzer()
+        self.semantic_result = analyzer.analyze(self.parse_tree, render=render)
+
+    def as_tuple(self):
+        """The (tokens, parse_tree, lex_errors, parse_errors, semantic_result) of run_compiler."""
+        return self.tokens, self.parse_tree, self.lex_errors, self.parse_errors, self.semantic_result
+
+
+def _lex_segments(code, pos, state, resync=None, chunk_size=CHUNK_SIZE, offsets=None):
+    """Lex code from pos into segments.
+
+    resync(end, line, col) is asked at every ';' with an empty paren stack;
+    when it returns True lexing stops and the segments so far are returned
+    together with the position of that ';'. Code is lexed in chunks running
+    to the first newline chunk_size characters on; with 0 each chunk is a
+    line, so stopping early wastes at most the rest of a line. When offsets
+    is given, the start and end offset of every token are appended to it
+    (0, 0 for the unmatched '(' reported at the end).
+    """
+    segments = []
+    seg = Segment(pos, state.line, state.base, tuple(state.paren_stack))
+    parens = list(state.paren_stack)
+    pending = []
+    spans = array('q')
+    length = len(code)
+    finished = False
+    while not finished:
+        if pos < length:
+            endpos = code.find('\n', pos + chunk_size) + 1 or length
+            pos = _scan_regex(code, pos, endpos, state, pending.append, True, spans)
+        finished = pos >= length or state.failed
+        if finished:
+            _finish_scan(state, pending.append)
+        for k, tok in enumerate(pending):
+            seg.tokens.append(tok)
+            if tok[0] != "DELIMITER":
+                continue
+            if tok[1] == "(":
+                parens.append((tok[2], tok[3]))
+            elif tok[1] == ")":
+                parens.pop()
+            elif tok[1] == ";":
+                seg.end = spans[2 * k + 1]
+                segments.append(seg)
+                if not parens and resync and resync(seg.end, tok[2], tok[3]):
+                    return segments, (seg.end, tok[2], tok[3])
+                seg = Segment(seg.end, tok[2], spans[2 * k] - tok[3], tuple(parens))
+        if offsets is not None:
+            offsets.extend(spans)
+            offsets.extend([0, 0] * (len(pending) - len(spans) // 2))
+        pending.clear()
+        del spans[:]
+    seg.end = length
+    if seg.tokens or seg.start < length or not segments:
+        segments.append(seg)
+    return segments, None
+
+
+def compile_sql(code, cache=None, render=False):
+    """Lex, parse and analyze a whole script, keeping it ready for recompile().
+
+    With a ParseCache (see cache.py), statements parsed before are rebuilt
+    from it instead of being parsed again. render is passed on to
+    CompileResult.
+    """
+    segments, _ = _lex_segments(code, 0, _ScanState())
+    for seg in segments:
+        seg.parse(cache)
+    return CompileResult(code, segments, render)
+
+
+def recompile(prev, offset, removed, inserted, cache=None, render=False):
+    """Apply an edit to a compiled script and compile only what it touched.
+
+    The edit replaces removed characters at offset with the inserted text.
+    Parse trees of the statements after the edit are taken over from prev
+    and their positions shifted in place, so prev must not be used again.
+    Semantic analysis runs over the whole new tree. The statements that are
+    lexed again are looked up in cache first, if one is given, and render
+    is passed on to CompileResult.
+    """
+    code = prev.code[:offset] + inserted + prev.code[offset + removed:]
+    old = prev.segments
+    delta = len(inserted) - removed
+    edit_end = offset + len(inserted)
+
+    first = max(bisect_right([seg.start for seg in old], offset) - 1, 0)
+    start = old[first]
+    state = _ScanState()
+    state.line, state.base, state.paren_stack = start.line, start.base, list(start.parens)
+
+    boundaries = {seg.end: i for i, seg in enumerate(old) if seg.closed()}
+
+    def resync(end, line, col):
+        if end < edit_end or end - delta not in boundaries:
+            return False
+        following = boundaries[end - delta] + 1
+        return following == len(old) or not old[following].parens
+
+    relexed, stop = _lex_segments(code, start.start, state, resync)
+    for seg in relexed:
+        seg.parse(cache)
+    if stop is None:
+        return CompileResult(code, old[:first] + relexed, render)
+
+    end, line, col = stop
+    last = boundaries[end - delta]
+    old_semicolon = old[last].tokens[-1]
+    old_line = old_semicolon[2]
+    dline = line - old_line
+    dcol = col - old_semicolon[3]
+    reused = old[last + 1:]
+    for seg in reused:
+        _shift_segment(seg, delta, old_line, dline, dcol)
+    return CompileResult(code, old[:first] + relexed + reused, render)
+
+
+def _shift_segment(seg, delta, old_line, dline, dcol):
+    """Move a reused segment by delta characters.
+
+    Lines after old_line only move by dline; positions on old_line itself,
+    which ends in the resynchronizing ';', also move by dcol columns.
+    """
+    on_boundary_line = seg.line == old_line
+    seg.start += delta
+    seg.end += delta
+    seg.base += delta - (dcol if on_boundary_line else 0)
+    seg.line += dline
+    if dline == 0 and dcol == 0:
+        return
+    if dcol:
+        seg.parens = tuple((l + dline, c + dcol if l == old_line else c) for l, c in seg.parens)
+    else:
+        seg.parens = tuple((l + dline, c) for l, c in seg.parens)
+    seg.tokens = [
+        (ttype, value, tline + dline, tcol + dcol if tline == old_line else tcol)
+        for ttype, value, tline, tcol in seg.tokens
+    ]
+    if seg.errors:
+        seg.parse()
+        return
+    if seg.shared:
+        seg.nodes = copy_trees(seg.nodes)
+        seg.shared = False
+    stack = list(seg.nodes)
+    while stack:
+        node = stack.pop()
+        if node.line is not None:
+            if node.line == old_line:
+                node.col += dcol
+            node.line += dline
+        elif node.kind == VALUE_ROWS:
+            lines, cols = node.lines, node.cols
+            for i, line in enumerate(lines):
+                if line == old_line:
+                    cols[i] += dcol
+                lines[i] = line + dline
+        stack.extend(node.children)
+
+
+def edit_between(old_code, new_code):
+    """Return the (offset, removed, inserted) edit that turns old_code into new_code."""
+    old_len, new_len = len(old_code), len(new_code)
+    limit = min(old_len, new_len)
+    # Binary searches over slice comparisons keep both scans in C
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old_code.startswith(new_code[lo:mid], lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    prefix = lo
+    lo, hi = 0, limit - prefix
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if old_code.startswith(new_code[new_len - mid:new_len - lo], old_len - mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    suffix = lo
+    return prefix, old_len - prefix - suffix, new_code[prefix:new_len - suffix]
@@ -1,10 +1,17 @@
 # Lexical Analyzer
 
-KEYWORDS = {
+import mmap
+import re
+from array import array
+
+# A keyword's symbol ID is its position in this list
+KEYWORD_LIST = (
     "SELECT", "FROM", "WHERE", "INSERT", "INTO", "VALUES",
     "UPDATE", "SET", "DELETE", "CREATE", "TABLE",
     "INT", "FLOAT", "TEXT", "AND", "OR", "NOT"
-}
+)
+KEYWORDS = set(KEYWORD_LIST)
+KEYWORD_IDS = {kw: sid for sid, kw in enumerate(KEYWORD_LIST)}
 
 OPERATORS = {"=", "<>", "!=", "<=", ">=", "<", ">", "+", "-", "*", "/"}
 DELIMITERS = {"(", ")", ",", ";", "."}
@@ -22,8 +29,61 @@ def is_whitespace(ch):
     return ch in " \t\r\n"
 
 
-def tokenize_sql(code):
-    """Tokenize SQL code"""
+class SymbolTable:
+    """Interns keyword and identifier spellings to integer symbol IDs.
+
+    Keywords always get the IDs given by KEYWORD_IDS, so later phases can
+    recognise them with an int comparison. Every distinct identifier is
+    stored once, however many times it occurs.
+    """
+
+    def __init__(self):
+        self.names = list(KEYWORD_LIST)
+        self.ids = dict(KEYWORD_IDS)
+
+    def intern(self, name):
+        sid = self.ids.get(name)
+        if sid is None:
+            sid = len(self.names)
+            self.names.append(name)
+            self.ids[name] = sid
+        return sid
+
+    def name(self, sid):
+        return self.names[sid]
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _intern_tokens(tokens, symbols):
+    """Replace keyword and identifier values with the symbol table's copies."""
+    names, intern = symbols.names, symbols.intern
+    for i, (ttype, value, line, col) in enumerate(tokens):
+        if ttype == "KEYWORD" or ttype == "IDENTIFIER":
+            tokens[i] = (ttype, names[intern(value)], line, col)
+    return tokens
+
+
+def tokenize_sql(code, engine="loop", recover=False, symbols=None):
+    """Tokenize SQL code.
+
+    engine selects the scanner: "loop" walks the source one character at a
+    time, "regex" runs the compiled master pattern. Both produce the same
+    (type, value, line, col) tokens and stop at the same first error.
+
+    With recover set, lexing carries on past errors and every one of them is
+    reported (see _scan_regex); this always runs the regex engine.
+
+    When a SymbolTable is passed, every keyword and identifier is interned
+    in it and the tokens share its value strings.
+    """
+    if symbols is not None:
+        return _intern_tokens(tokenize_sql(code, engine, recover), symbols)
+    if engine == "regex" or recover:
+        return _tokenize_regex(code, recover)
+    if engine != "loop":
+        raise ValueError(f"unknown lexer engine '{engine}'")
     tokens = []
     paren_stack = []
     i = 0
@@ -126,6 +186,26 @@ def tokenize_sql(code):
             tokens.append((token_type, value, line, start_col))
             continue
 
+        if ch == '?':
+            tokens.append(("PARAMETER", ch, line, column))
+            i += 1
+            column += 1
+            continue
+
+        if ch == ':' and i + 1 < length and is_letter(code[i + 1]):
+            start = i
+            start_col = column
+            i += 1
+            column += 1
+            while i < length and (is_letter(code[i]) or is_digit(code[i])):
+                i += 1
+                column += 1
+            if i - start > 64:
+                tokens.append(("ERROR", f"identifier too long", line, start_col))
+                return tokens
+            tokens.append(("PARAMETER", code[start:i], line, start_col))
+            continue
+
         two_char = code[i:i+2]
         if two_char in OPERATORS:
             tokens.append(("OPERATOR", two_char, line, column))
@@ -160,3 +240,486 @@ def tokenize_sql(code):
         return tokens
 
     return tokens
+
+
+# Regex engine: one master pattern, dispatched on the index of the matched group.
+# Leading blanks are folded into every match and alternatives are ordered by
+# how often they occur. Words and numbers touching a non-ASCII character fall
+# through to group 11 and are finished with the same predicates as the loop.
+
+_MASTER_PATTERN = re.compile(r"""
+    [ \t\r]*
+    (?:
+        ([A-Za-z_][A-Za-z0-9_]*(?![A-Za-z0-9_]|[^\x00-\x7f]))              # 1 word
+      | ([(),;.])                                                       # 2 delimiter
+      | ('[^'\n]*')                                                     # 3 string
+      | ([0-9]+(?:\.[0-9]*(?![0-9])|(?![.0-9]))(?![^\x00-\x7f]))         # 4 number
+      | (\n)                                                            # 5 newline
+      | (--[^\n]*)                                                      # 6 line comment
+      | (/\*)                                                           # 7 block comment
+      | (<>|!=|<=|>=|[=<>+\-*/])                                        # 8 operator
+      | (')                                                             # 9 unclosed string
+      | (\?|:[A-Za-z_][A-Za-z0-9_]*(?![A-Za-z0-9_]|[^\x00-\x7f]))         # 10 parameter
+      | ([^ \t\r])                                                      # 11 anything else
+    )
+""", re.VERBOSE)
+
+(_WORD, _DELIMITER, _STRING, _NUMBER, _NEWLINE, _LINE_COMMENT, _BLOCK_COMMENT, _OPERATOR, _OPEN_STRING,
+ _PARAMETER) = range(1, 11)
+
+
+def _scan_word_tail(code, i, length):
+    """Continue an identifier past non-ASCII letters and digits."""
+    while i < length and (is_letter(code[i]) or is_digit(code[i])):
+        i += 1
+    return i
+
+
+def _scan_number_tail(code, i, length, has_dot):
+    """Continue a number past non-ASCII digits."""
+    while i < length and (is_digit(code[i]) or (code[i] == '.' and not has_dot)):
+        if code[i] == '.':
+            has_dot = True
+        i += 1
+    return i, has_dot
+
+
+def _comment_position(code, start, pos, line, column):
+    """Line and column of pos inside the block comment opened at start.
+
+    Mirrors the loop engine, which does not count the opening '/*' towards
+    the column.
+    """
+    newlines = code.count('\n', start, pos)
+    if newlines:
+        return line + newlines, pos - code.rfind('\n', start, pos)
+    return line, column + (pos - (start + 2))
+
+
+class _ScanState:
+    """Lexer position carried between calls to _scan_regex."""
+
+    def __init__(self):
+        self.line = 1
+        # Column of offset i is i - base. base moves on every newline, and is
+        # also pushed forward past block comments because the loop engine does
+        # not count their '/*' and '*/' towards the column.
+        self.base = -1
+        self.paren_stack = []
+        self.failed = False
+        self.recover = False
+
+
+def _scan_regex(code, pos, endpos, state, append, final=True, spans=None):
+    """Tokenize code[pos:endpos] and return the offset where scanning stopped.
+
+    Unless final is set, endpos must sit just after a newline so that only a
+    block comment can run past it; such a comment is left unscanned and its
+    start offset returned. Scanning stops for good on the first error.
+    When spans is given, the start and end offset of every token are
+    appended to it as well.
+
+    If state.recover is set, an error token is emitted and scanning resumes:
+    an unclosed string runs to the end of its line, an unclosed comment to
+    the end of the input, a nested '/*' is read as part of the comment, and
+    an invalid character, unmatched ')' or overlong identifier is skipped.
+    """
+    finditer = _MASTER_PATTERN.finditer
+    keywords = KEYWORDS
+    paren_stack = state.paren_stack
+    line = state.line
+    base = state.base
+    length = len(code)
+
+    while True:
+        for m in finditer(code, pos, endpos):
+            kind = m.lastindex
+            i = m.start(kind)
+
+            if kind == _WORD:
+                word = m.group(1)
+                upper = word.upper()
+                if upper in keywords:
+                    tok = ("KEYWORD", upper, line, i - base)
+                elif len(word) > 63:
+                    if _error(state, append, spans, ("ERROR", f"identifier too long", line, i - base), i):
+                        return endpos
+                    continue
+                else:
+                    tok = ("IDENTIFIER", word, line, i - base)
+
+            elif kind == _DELIMITER:
+                ch = m.group(2)
+                if ch == '(':
+                    paren_stack.append((line, i - base))
+                elif ch == ')':
+                    if not paren_stack:
+                        if _error(state, append, spans, ("ERROR", f"unmatched ')'", line, i - base), i):
+                            return endpos
+                        continue
+                    paren_stack.pop()
+                tok = ("DELIMITER", ch, line, i - base)
+
+            elif kind == _STRING:
+                tok = ("STRING_LITERAL", m.group(3), line, i - base)
+
+            elif kind == _NUMBER:
+                value = m.group(4)
+                tok = ("FLOAT_LITERAL" if '.' in value else "INTEGER_LITERAL", value, line, i - base)
+
+            elif kind == _NEWLINE:
+                line += 1
+                base = i
+                continue
+
+            elif kind == _OPERATOR:
+                tok = ("OPERATOR", m.group(8), line, i - base)
+
+            elif kind == _LINE_COMMENT:
+                continue
+
+            elif kind == _BLOCK_COMMENT:
+                column = i - base
+                close = code.find("*/", i + 2)
+                nested = code.find("/*", i + 2)
+                if close == -1 and not final and (state.recover or nested == -1):
+                    state.line, state.base = line, base
+                    return i
+                while nested != -1 and (close == -1 or nested < close):
+                    l, c = _comment_position(code, i, nested, line, column)
+                    if _error(state, append, spans, ("ERROR", f"nested comment detected", l, c), nested):
+                        return endpos
+                    nested = code.find("/*", nested + 2)
+                if close == -1:
+                    stop = max(i + 2, length - 1)
+                    l, c = _comment_position(code, i, stop, line, column)
+                    if _error(state, append, spans, ("ERROR", f"unclosed comment", l, c), stop):
+                        return endpos
+                    state.line, state.base = line, base
+                    return length
+                newlines = code.count('\n', i, close)
+                if newlines:
+                    line += newlines
+                    base = code.rfind('\n', i, close) + 2
+                else:
+                    base += 4
+                pos = close + 2
+                break
+
+            elif kind == _OPEN_STRING:
+                if _error(state, append, spans, ("ERROR", f"unclosed string", line, i - base), i):
+                    return endpos
+                pos = code.find('\n', i, endpos)
+                if pos == -1:
+                    pos = endpos
+                break
+
+            elif kind == _PARAMETER:
+                value = m.group(10)
+                if len(value) > 64:
+                    if _error(state, append, spans, ("ERROR", f"identifier too long", line, i - base), i):
+                        return endpos
+                    continue
+                tok = ("PARAMETER", value, line, i - base)
+
+            else:
+                ch = m.group(11)
+                if ch == ':' and i + 1 < endpos and is_letter(code[i + 1]):
+                    # A parameter name with non-ASCII letters
+                    pos = _scan_word_tail(code, i + 1, endpos)
+                    if pos - i > 64:
+                        if _error(state, append, spans, ("ERROR", f"identifier too long", line, i - base), i):
+                            return endpos
+                        break
+                    tok = ("PARAMETER", code[i:pos], line, i - base)
+                elif is_letter(ch):
+                    pos = _scan_word_tail(code, i + 1, endpos)
+                    word = code[i:pos]
+                    if word.upper() in keywords:
+                        tok = ("KEYWORD", word.upper(), line, i - base)
+                    elif len(word) > 63:
+                        if _error(state, append, spans, ("ERROR", f"identifier too long", line, i - base), i):
+                            return endpos
+                        break
+                    else:
+                        tok = ("IDENTIFIER", word, line, i - base)
+                elif is_digit(ch):
+                    pos, has_dot = _scan_number_tail(code, i + 1, endpos, False)
+                    tok = ("FLOAT_LITERAL" if has_dot else "INTEGER_LITERAL", code[i:pos], line, i - base)
+                else:
+                    if _error(state, append, spans, ("ERROR", f"invalid character '{ch}'", line, i - base), i):
+                        return endpos
+                    continue
+                append(tok)
+                if spans is not None:
+                    spans.append(i)
+                    spans.append(pos)
+                break
+
+            append(tok)
+            if spans is not None:
+                spans.append(i)
+                spans.append(m.end())
+        else:
+            break
+
+    state.line, state.base = line, base
+    return max(pos, endpos)
+
+
+def _error(state, append, spans, tok, offset):
+    """Emit an error token at offset; return True if scanning must stop."""
+    append(tok)
+    if spans is not None:
+        spans.append(offset)
+        spans.append(offset)
+    if state.recover:
+        return False
+    state.failed = True
+    return True
+
+
+def _finish_scan(state, append):
+    """Report unmatched '(' once the input is exhausted.
+
+    Only the innermost one is reported, or all of them, innermost first, in
+    recovery mode.
+    """
+    if state.paren_stack and not state.failed:
+        for l, c in reversed(state.paren_stack if state.recover else state.paren_stack[-1:]):
+            append(("ERROR", f"unmatched '('", l, c))
+        state.failed = True
+
+
+def _tokenize_regex(code, recover=False):
+    tokens = []
+    state = _ScanState()
+    state.recover = recover
+    _scan_regex(code, 0, len(code), state, tokens.append)
+    _finish_scan(state, tokens.append)
+    return tokens
+
+
+def iter_tokens(fileobj, chunk_size=1 << 16, recover=False):
+    """Lazily tokenize a text file object, reading chunk_size characters at a time.
+
+    Yields the same tokens as tokenize_sql. Only the unscanned tail of the
+    input is kept in memory: complete lines are scanned as soon as they
+    arrive, and a block comment is held back until its closing '*/' is read.
+    """
+    state = _ScanState()
+    state.recover = recover
+    pending = []
+    buffer = ""
+    pos = 0
+    while not state.failed:
+        chunk = fileobj.read(chunk_size)
+        final = not chunk
+        buffer = buffer[pos:] + chunk
+        state.base -= pos
+        pos = 0
+        endpos = len(buffer) if final else buffer.rfind('\n') + 1
+        if endpos > 0:
+            pos = _scan_regex(buffer, 0, endpos, state, pending.append, final)
+        if final:
+            _finish_scan(state, pending.append)
+        yield from pending
+        pending.clear()
+        if final:
+            return
+
+
+# Token buffer: struct-of-arrays storage for large scripts
+
+TOKEN_TYPES = (
+    "ERROR", "KEYWORD", "IDENTIFIER", "INTEGER_LITERAL",
+    "FLOAT_LITERAL", "STRING_LITERAL", "OPERATOR", "DELIMITER", "PARAMETER",
+)
+TYPE_CODES = {name: code for code, name in enumerate(TOKEN_TYPES)}
+
+# Token kinds let the parser test a token with one int comparison. A
+# keyword's kind is its symbol ID, every delimiter and operator has a kind
+# of its own, and the remaining tokens get one kind per type.
+PUNCTUATION = ("(", ")", ",", ";", ".", "=", "<>", "!=", "<=", ">=", "<", ">", "+", "-", "*", "/")
+KIND_IDS = dict(KEYWORD_IDS)
+KIND_IDS.update((p, len(KEYWORD_LIST) + k) for k, p in enumerate(PUNCTUATION))
+(IDENTIFIER_KIND, INTEGER_KIND, FLOAT_KIND, STRING_KIND, PARAMETER_KIND, ERROR_KIND,
+ END_KIND) = range(len(KIND_IDS), len(KIND_IDS) + 7)
+_CLASS_KINDS = {
+    "IDENTIFIER": IDENTIFIER_KIND, "INTEGER_LITERAL": INTEGER_KIND,
+    "FLOAT_LITERAL": FLOAT_KIND, "STRING_LITERAL": STRING_KIND, "PARAMETER": PARAMETER_KIND,
+    "ERROR": ERROR_KIND,
+}
+
+
+def token_kinds(tokens):
+    """Return the kind of every (type, value, line, col) token as an array."""
+    kind_ids, class_kinds = KIND_IDS, _CLASS_KINDS
+    return array('B', [class_kinds[t[0]] if t[0] in class_kinds else kind_ids[t[1]] for t in tokens])
+
+
+def _char_to_byte_offsets(text, offsets, base):
+    """Turn character offsets into text into byte offsets of its UTF-8 form plus base."""
+    last_char, last_byte = 0, 0
+    for k, offset in enumerate(offsets):
+        if offset < last_char:
+            last_char, last_byte = 0, 0
+        last_byte += len(text[last_char:offset].encode("utf-8"))
+        last_char = offset
+        offsets[k] = base + last_byte
+
+
+class TokenBuffer:
+    """Compact token list holding type codes and offsets into the source.
+
+    A token costs 30 bytes of array storage instead of a tuple plus a copied
+    value string. Keywords and identifiers are interned into symbols and
+    carry their symbol ID in syms (-1 for other tokens), and kinds holds
+    each token's kind for the parser (see KIND_IDS); other values are
+    sliced out of the source only when asked for. Indexing and iteration
+    still produce (type, value, line, col) tuples, so a TokenBuffer can be
+    passed wherever a token list is expected.
+
+    The source may be a str, or UTF-8 bytes such as an mmap of the file (see
+    from_file); offsets are then byte offsets into it and values are decoded
+    when requested.
+    """
+
+    def __init__(self, source, symbols=None):
+        self.source = source
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.syms = array('i')
+        self.types = array('B')
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.lines = array('i')
+        self.cols = array('i')
+        self.errors = {}  # {token_index: message}
+
+    @classmethod
+    def from_source(cls, source, chunk_size=1 << 16, recover=False, symbols=None):
+        """Tokenize source into a new buffer, chunk_size characters at a time."""
+        buf = cls(source, symbols)
+        state = _ScanState()
+        state.recover = recover
+        pending = []
+        spans = array('q')
+        if not isinstance(source, str):
+            buf._fill_from_bytes(state, pending, spans, chunk_size)
+            return buf
+        length = len(source)
+        pos = 0
+        while pos < length and not state.failed:
+            endpos = source.find('\n', pos + chunk_size) + 1 or length
+            pos = _scan_regex(source, pos, endpos, state, pending.append, True, spans)
+            buf._extend(pending, spans)
+        _finish_scan(state, pending.append)
+        if pending:
+            spans.extend([0, 0] * len(pending))
+            buf._extend(pending, spans)
+        return buf
+
+    @classmethod
+    def from_file(cls, path, chunk_size=1 << 16, recover=False, symbols=None):
+        """Tokenize a UTF-8 file through a read-only memory map of it."""
+        with open(path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                data = b""
+        return cls.from_source(data, chunk_size, recover, symbols)
+
+    def _fill_from_bytes(self, state, pending, spans, chunk_size):
+        """Tokenize a bytes-like source one block of whole lines at a time.
+
+        Each block is decoded only while it is scanned. Spans come back as
+        character offsets into the block and are turned into byte offsets.
+        """
+        data = self.source
+        length = len(data)
+        pos = 0
+        while not state.failed:
+            endpos = data.find(b'\n', pos + chunk_size) + 1 or length
+            final = endpos == length
+            block = data[pos:endpos]
+            ascii_only = block.isascii()
+            text = block.decode("ascii" if ascii_only else "utf-8")
+            stop = _scan_regex(text, 0, len(text), state, pending.append, final, spans)
+            if ascii_only:
+                for k in range(len(spans)):
+                    spans[k] += pos
+            else:
+                _char_to_byte_offsets(text, spans, pos)
+            self._extend(pending, spans)
+            if final:
+                break
+            if stop < len(text):
+                # A block comment is still open: rescan it with more input
+                chunk_size *= 2
+                stop_bytes = len(text[:stop].encode("utf-8"))
+            else:
+                stop_bytes = endpos - pos
+            state.base -= stop
+            pos += stop_bytes
+        _finish_scan(state, pending.append)
+        if pending:
+            spans.extend([0, 0] * len(pending))
+            self._extend(pending, spans)
+
+    def _extend(self, pending, spans):
+        codes, kind_ids, class_kinds = TYPE_CODES, KIND_IDS, _CLASS_KINDS
+        types, kinds, lines, cols, syms = self.types, self.kinds, self.lines, self.cols, self.syms
+        intern = self.symbols.intern
+        index = len(types)
+        for ttype, value, line, col in pending:
+            if ttype == "KEYWORD" or ttype == "IDENTIFIER":
+                syms.append(intern(value))
+            else:
+                syms.append(-1)
+                if ttype == "ERROR":
+                    self.errors[index] = value
+            types.append(codes[ttype])
+            kinds.append(class_kinds[ttype] if ttype in class_kinds else kind_ids[value])
+            lines.append(line)
+            cols.append(col)
+            index += 1
+        self.starts.extend(spans[0::2])
+        self.ends.extend(spans[1::2])
+        pending.clear()
+        del spans[:]
+
+    def __len__(self):
+        return len(self.types)
+
+    def type(self, i):
+        return TOKEN_TYPES[self.types[i]]
+
+    def value(self, i):
+        sid = self.syms[i]
+        if sid >= 0:
+            return self.symbols.names[sid]
+        if i in self.errors:
+            return self.errors[i]
+        text = self.source[self.starts[i]:self.ends[i]]
+        if isinstance(text, str):
+            return text
+        return text.decode("utf-8")
+
+    def raw(self, i):
+        """The token's text without copying: a str slice or a memoryview."""
+        if isinstance(self.source, str):
+            return self.source[self.starts[i]:self.ends[i]]
+        return memoryview(self.source)[self.starts[i]:self.ends[i]]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return (TOKEN_TYPES[self.types[i]], self.value(i), self.lines[i], self.cols[i])
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self[i]
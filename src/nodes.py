@@ -0,0 +1,494 @@
+# Parse Tree Nodes
+#
+# One class per kind of node, each with __slots__. Names, keywords and
+# literals keep their source text in text, and literals also carry their
+# converted value and SQL type. The rule property gives the label the
+# original string-based tree used ("Col: name", "Table: t", "Val: 3.5", ...),
+# which the GUI and the annotated tree dump still show.
+#
+# Every class also has a kind number, which arena trees (see arena.py)
+# store instead of node objects.
+
+from array import array
+
+from lexer import INTEGER_KIND, FLOAT_KIND, STRING_KIND
+
+(QUERY, CREATE_STMT, INSERT_STMT, SELECT_STMT, UPDATE_STMT, DELETE_STMT, KEYWORD, TABLE_REF,
+ COLUMN_LIST, COLUMN_DEF, TYPE_NAME, COLUMN_REF, STAR, SELECT_LIST, VALUE_LIST, LITERAL, VALUE,
+ WHERE_CLAUSE, BOOL_OP, COMPARISON, OPERATOR, ASSIGNMENT_LIST, ASSIGNMENT, GENERIC,
+ VALUE_ROWS, INSERT_BATCH, PARAMETER) = range(27)
+
+SQL_TYPES = {INTEGER_KIND: "INT", FLOAT_KIND: "FLOAT", STRING_KIND: "TEXT"}
+
+
+class Node:
+    """Base of all parse tree nodes.
+
+    Leaf classes share an empty children tuple; only Branch subclasses hold
+    a children list and accept add_child().
+    """
+
+    __slots__ = ("node_id", "line", "col", "text")
+    children = ()
+
+    def __init__(self, line=None, col=None, text=None):
+        self.node_id = None
+        self.line = line
+        self.col = col
+        self.text = text
+
+    def __repr__(self):
+        return self.rule
+
+    def _args(self):
+        return (self.line, self.col, self.text)
+
+    def __reduce__(self):
+        # Constructor arguments pickle about a third smaller than the slot
+        # values and load a little faster; trees are sent back from worker
+        # processes this way
+        return self.__class__, self._args(), self.children or None
+
+
+class Branch(Node):
+    """A node with children."""
+
+    __slots__ = ("children",)
+
+    def __init__(self, line=None, col=None, text=None):
+        Node.__init__(self, line, col, text)
+        self.children = []
+
+    def add_child(self, node):
+        self.children.append(node)
+
+    def __setstate__(self, children):
+        self.children = children
+
+
+class ParseTreeNode(Branch):
+    """A node labelled by an arbitrary rule string."""
+
+    __slots__ = ("rule",)
+    kind = GENERIC
+
+    def __init__(self, value, line=None, col=None, text=None):
+        Branch.__init__(self, line, col, text)
+        self.rule = value
+
+    def _args(self):
+        return (self.rule, self.line, self.col, self.text)
+
+
+class Query(Branch):
+    __slots__ = ()
+    kind = QUERY
+    rule = "Query"
+
+    def add_child(self, node):
+        # Statements parsed lazily (see Parser.parse_query) are all parsed
+        # into a list first
+        if not isinstance(self.children, list):
+            self.children = list(self.children)
+        self.children.append(node)
+
+
+class Stmt(Branch):
+    """Base of the statement nodes."""
+    __slots__ = ()
+
+
+class CreateStmt(Stmt):
+    __slots__ = ()
+    kind = CREATE_STMT
+    rule = "CreateStmt"
+
+
+class InsertStmt(Stmt):
+    __slots__ = ()
+    kind = INSERT_STMT
+    rule = "InsertStmt"
+
+
+class SelectStmt(Stmt):
+    __slots__ = ()
+    kind = SELECT_STMT
+    rule = "SelectStmt"
+
+
+class UpdateStmt(Stmt):
+    __slots__ = ()
+    kind = UPDATE_STMT
+    rule = "UpdateStmt"
+
+
+class DeleteStmt(Stmt):
+    __slots__ = ()
+    kind = DELETE_STMT
+    rule = "DeleteStmt"
+
+
+class Keyword(Node):
+    """A keyword of the statement, e.g. SELECT or FROM.
+
+    As in the original tree, its position and text are those of the token
+    that follows the keyword.
+    """
+
+    __slots__ = ("word",)
+    kind = KEYWORD
+
+    def __init__(self, word, line=None, col=None, text=None):
+        Node.__init__(self, line, col, text)
+        self.word = word
+
+    @property
+    def rule(self):
+        return self.word
+
+    def _args(self):
+        return (self.word, self.line, self.col, self.text)
+
+
+class TableRef(Node):
+    __slots__ = ()
+    kind = TABLE_REF
+
+    @property
+    def rule(self):
+        return f"Table: {self.text}"
+
+
+class ColumnList(Branch):
+    __slots__ = ()
+    kind = COLUMN_LIST
+    rule = "ColumnList"
+
+
+class ColumnDef(Branch):
+    """A column of CREATE TABLE; its child is the TypeName."""
+
+    __slots__ = ()
+    kind = COLUMN_DEF
+
+    @property
+    def rule(self):
+        return f"Col: {self.text}"
+
+
+class TypeName(Node):
+    __slots__ = ()
+    kind = TYPE_NAME
+
+    @property
+    def rule(self):
+        return f"Type: {self.text}"
+
+
+class ColumnRef(Node):
+    __slots__ = ()
+    kind = COLUMN_REF
+
+    @property
+    def rule(self):
+        return f"Col: {self.text}"
+
+
+class Star(Node):
+    __slots__ = ()
+    kind = STAR
+    rule = "*"
+
+
+class SelectList(Branch):
+    __slots__ = ()
+    kind = SELECT_LIST
+    rule = "SelectList"
+
+
+class ValueList(Branch):
+    __slots__ = ()
+    kind = VALUE_LIST
+    rule = "ValueList"
+
+
+class Literal(Node):
+    """A literal; value is the int, float or unquoted str it denotes.
+
+    sql_type is "INT", "FLOAT" or "TEXT". A number the int() and float()
+    conversions cannot read (such as one made of non-ASCII digits) keeps its
+    text as value.
+    """
+
+    __slots__ = ("value", "sql_type")
+    kind = LITERAL
+
+    def __init__(self, line=None, col=None, text=None):
+        Node.__init__(self, line, col, text)
+        if text.startswith("'"):
+            self.sql_type = "TEXT"
+            self.value = text[1:-1]
+            return
+        self.sql_type = "FLOAT" if "." in text else "INT"
+        try:
+            self.value = float(text) if "." in text else int(text)
+        except ValueError:
+            self.value = text
+
+    @property
+    def rule(self):
+        return f"Val: {self.text}"
+
+
+class Value(Literal):
+    """A literal of an INSERT value list."""
+
+    __slots__ = ()
+    kind = VALUE
+
+    @property
+    def rule(self):
+        return f"Value: {self.text}"
+
+
+class Parameter(Node):
+    """A ? or :name placeholder standing where a literal may.
+
+    Its value is supplied when a prepared statement is bound (see
+    prepared.py), so it has no SQL type of its own.
+    """
+
+    __slots__ = ()
+    kind = PARAMETER
+    sql_type = None
+
+    @property
+    def rule(self):
+        return f"Param: {self.text}"
+
+
+class ValueRows(Node):
+    """The rows of a multi-row INSERT ... VALUES (...), (...), stored column-wise.
+
+    Instead of a Value node per literal, the literals of all rows sit in
+    parallel arrays in row order: kinds (the lexer's INTEGER_KIND,
+    FLOAT_KIND, STRING_KIND or PARAMETER_KIND), lines, cols and texts. row_ends[r] is the
+    index just past the last value of row r. When all rows have n values,
+    kinds[j::n] is column j, which analyze_insert checks in one go.
+    """
+
+    __slots__ = ("kinds", "lines", "cols", "texts", "row_ends")
+    kind = VALUE_ROWS
+
+    def __init__(self, kinds=None, lines=None, cols=None, texts=None, row_ends=None):
+        Node.__init__(self)
+        self.kinds = kinds if kinds is not None else array('B')
+        self.lines = lines if lines is not None else array('i')
+        self.cols = cols if cols is not None else array('i')
+        self.texts = texts if texts is not None else []
+        self.row_ends = row_ends if row_ends is not None else array('I')
+
+    @property
+    def rule(self):
+        return f"ValueRows: {len(self.row_ends)} rows"
+
+    def _args(self):
+        return (self.kinds, self.lines, self.cols, self.texts, self.row_ends)
+
+    def __len__(self):
+        return len(self.row_ends)
+
+    def add_value(self, kind, line, col, text):
+        self.kinds.append(kind)
+        self.lines.append(line)
+        self.cols.append(col)
+        self.texts.append(text)
+
+    def end_row(self):
+        self.row_ends.append(len(self.kinds))
+
+    def row(self, r):
+        """The range of value indexes in row r."""
+        return range(self.row_ends[r - 1] if r else 0, self.row_ends[r])
+
+    def sql_type(self, i):
+        """The SQL type of value i: "INT", "FLOAT", "TEXT", or None for a parameter."""
+        return SQL_TYPES.get(self.kinds[i])
+
+
+class InsertBatch(Node):
+    """A run of single-row INSERTs into one table, all of the same shape.
+
+    Built by the template fast path (see template.py) instead of an
+    InsertStmt per statement: table_lines and table_cols give where each
+    statement names the table, and rows holds one row per statement.
+    """
+
+    __slots__ = ("table", "table_lines", "table_cols", "rows")
+    kind = INSERT_BATCH
+
+    def __init__(self, table, table_lines=None, table_cols=None, rows=None):
+        Node.__init__(self)
+        self.table = table
+        self.table_lines = table_lines if table_lines is not None else array('i')
+        self.table_cols = table_cols if table_cols is not None else array('i')
+        self.rows = rows if rows is not None else ValueRows()
+
+    @property
+    def rule(self):
+        return f"InsertBatch: {len(self.table_lines)} x {self.table}"
+
+    def _args(self):
+        return (self.table, self.table_lines, self.table_cols, self.rows)
+
+
+class WhereClause(Branch):
+    __slots__ = ()
+    kind = WHERE_CLAUSE
+    rule = "WhereClause"
+
+
+class BoolOp(Branch):
+    """AND or OR over two conditions, or NOT over one."""
+
+    __slots__ = ("op",)
+    kind = BOOL_OP
+
+    def __init__(self, op):
+        Branch.__init__(self)
+        self.op = op
+
+    @property
+    def rule(self):
+        return self.op
+
+    def _args(self):
+        return (self.op,)
+
+
+class Comparison(Branch):
+    """A column, an Operator and a Literal."""
+    __slots__ = ()
+    kind = COMPARISON
+    rule = "Comparison"
+
+
+class Operator(Node):
+    __slots__ = ()
+    kind = OPERATOR
+
+    @property
+    def rule(self):
+        return f"Op: {self.text}"
+
+
+class AssignmentList(Branch):
+    __slots__ = ()
+    kind = ASSIGNMENT_LIST
+    rule = "AssignmentList"
+
+
+class Assignment(Branch):
+    """A column and the Literal assigned to it."""
+    __slots__ = ()
+    kind = ASSIGNMENT
+    rule = "Assignment"
+
+
+# Node classes indexed by kind
+NODE_CLASSES = (
+    Query, CreateStmt, InsertStmt, SelectStmt, UpdateStmt, DeleteStmt, Keyword, TableRef,
+    ColumnList, ColumnDef, TypeName, ColumnRef, Star, SelectList, ValueList, Literal, Value,
+    WhereClause, BoolOp, Comparison, Operator, AssignmentList, Assignment, ParseTreeNode,
+    ValueRows, InsertBatch, Parameter,
+)
+
+# Trees deeper than this are pickled flat (see picklable)
+PICKLE_DEPTH = 100
+
+
+def depth_exceeds(node, limit):
+    """Whether the tree rooted at node has more than limit levels below it."""
+    stack = [(node, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if node.children:
+            if depth == limit:
+                return True
+            stack.extend((child, depth + 1) for child in node.children)
+    return False
+
+
+def flatten(nodes):
+    """The trees rooted at nodes as (kinds, args, counts) in preorder.
+
+    kinds and counts are arrays holding each node's kind and number of
+    children, args its constructor arguments. Pickling nodes directly
+    recurses once per tree level; these pickle at any depth.
+    """
+    kinds = array('B')
+    counts = array('I')
+    args = []
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        children = node.children
+        kinds.append(node.kind)
+        counts.append(len(children))
+        args.append(node._args())
+        if children:
+            stack.extend(reversed(children))
+    return kinds, args, counts
+
+
+def unflatten(flat):
+    """Rebuild the list of trees that flatten() was given."""
+    kinds, args, counts = flat
+    classes = NODE_CLASSES
+    # Going backwards, the subtrees of a node's children are complete and
+    # on top of the stack, its first child topmost
+    stack = []
+    for k in range(len(kinds) - 1, -1, -1):
+        node = classes[kinds[k]](*args[k])
+        count = counts[k]
+        if count:
+            children = stack[-count:]
+            del stack[-count:]
+            children.reverse()
+            node.children = children
+        stack.append(node)
+    stack.reverse()
+    return stack
+
+
+def copy_trees(nodes):
+    """Copies of the trees rooted at nodes that share nothing with them."""
+    kinds, args, counts = flatten(nodes)
+    for k, kind in enumerate(kinds):
+        if kind == VALUE_ROWS:
+            args[k] = tuple(column[:] for column in args[k])
+    return unflatten((kinds, args, counts))
+
+
+def _unflatten_tree(flat):
+    return unflatten(flat)[0]
+
+
+class FlatTree:
+    """Wraps a tree to pickle it through flatten(); it unpickles as the tree itself."""
+
+    __slots__ = ("root",)
+
+    def __init__(self, root):
+        self.root = root
+
+    def __reduce__(self):
+        return _unflatten_tree, (flatten([self.root]),)
+
+
+def picklable(node):
+    """node, or a FlatTree of it if it is nested too deeply for the pickler's recursion.
+
+    Shallow trees pickle as node objects, which load fastest.
+    """
+    return FlatTree(node) if depth_exceeds(node, PICKLE_DEPTH) else node
@@ -1,37 +1,188 @@
 # Syntax Parser
 
-class ParseTreeNode:
-    def __init__(self, value, line=None, col=None, text=None):
-        self.children = []
-        self.rule = value
-        self.node_id = None
-        self.line = line
-        self.col = col
-        self.text = text
+from array import array
+from collections.abc import Sequence
 
-    def add_child(self, node):
-        self.children.append(node)
+from nodes import (NODE_CLASSES, ParseTreeNode, Query, Keyword, BoolOp, ValueRows, QUERY, CREATE_STMT,
+                   INSERT_STMT, SELECT_STMT, UPDATE_STMT, DELETE_STMT, TABLE_REF, COLUMN_LIST, COLUMN_DEF,
+                   TYPE_NAME, COLUMN_REF, STAR, SELECT_LIST, VALUE_LIST, LITERAL, VALUE,
+                   WHERE_CLAUSE, COMPARISON, OPERATOR, ASSIGNMENT_LIST, ASSIGNMENT, PARAMETER)
+from arena import Arena
+from lexer import (TokenBuffer, KEYWORD_LIST, KIND_IDS, PUNCTUATION, token_kinds,
+                   IDENTIFIER_KIND, INTEGER_KIND, FLOAT_KIND, STRING_KIND, PARAMETER_KIND, ERROR_KIND,
+                   END_KIND)
 
-    def __repr__(self):
-        return self.rule
+(_SELECT, _FROM, _WHERE, _INSERT, _INTO, _VALUES, _UPDATE, _SET, _DELETE, _CREATE, _TABLE,
+ _INT, _FLOAT, _TEXT, _AND, _OR, _NOT) = (KIND_IDS[kw] for kw in (
+    "SELECT", "FROM", "WHERE", "INSERT", "INTO", "VALUES", "UPDATE", "SET", "DELETE", "CREATE", "TABLE",
+    "INT", "FLOAT", "TEXT", "AND", "OR", "NOT"))
+_LPAREN, _RPAREN, _COMMA, _SEMICOLON, _STAR, _EQUALS = (KIND_IDS[p] for p in ("(", ")", ",", ";", "*", "="))
+_STATEMENT_STARTS = frozenset((_CREATE, _SELECT, _INSERT, _UPDATE, _DELETE))
+_TYPE_NAMES = frozenset((_INT, _FLOAT, _TEXT))
+# Literals, and the ? or :name parameters accepted wherever a literal is
+_VALUE_KINDS = frozenset((INTEGER_KIND, FLOAT_KIND, STRING_KIND, PARAMETER_KIND))
+_OPERATORS = frozenset(KIND_IDS[p] for p in PUNCTUATION if p not in "(),;.")
 
 
-class Parser:
+class _NodeBuilder:
+    """Builds the tree from node objects; Arena offers the same methods for arena trees."""
+
     def __init__(self, tokens):
-        self.tokens = [t for t in tokens if t[0] != 'ERROR']
+        self.tokens = tokens
+
+    def branch(self, kind):
+        return NODE_CLASSES[kind]()
+
+    def token_node(self, kind, i):
+        token = self.tokens[i]
+        return NODE_CLASSES[kind](token[2], token[3], token[1])
+
+    def keyword(self, word, i):
+        if i < 0:
+            return Keyword(KEYWORD_LIST[word])
+        token = self.tokens[i]
+        return Keyword(KEYWORD_LIST[word], token[2], token[3], token[1])
+
+    def bool_op(self, op):
+        return BoolOp(KEYWORD_LIST[op])
+
+    def new_rows(self):
+        return ValueRows()
+
+    def value_rows(self, rows):
+        return rows
+
+    def add(self, parent, child):
+        parent.children.append(child)
+
+
+class _NullRows:
+    """Stands in for ValueRows while validating."""
+
+    __slots__ = ()
+
+    def add_value(self, kind, line, col, text):
+        pass
+
+    def end_row(self):
+        pass
+
+
+class _NullBuilder:
+    """Builds nothing: Parser.validate() checks the grammar with it.
+
+    Every node is True, which the parser only tests against None.
+    """
+
+    def branch(self, kind):
+        return True
+
+    def token_node(self, kind, i):
+        return True
+
+    def keyword(self, word, i):
+        return True
+
+    def bool_op(self, op):
+        return True
+
+    def new_rows(self):
+        return _NULL_ROWS
+
+    def value_rows(self, rows):
+        return True
+
+    def add(self, parent, child):
+        pass
+
+
+_NULL_ROWS = _NullRows()
+_NULL_BUILDER = _NullBuilder()
+
+
+class LazyStatements(Sequence):
+    """The statements of a lazily parsed Query, each parsed on first access.
+
+    The script was validated up front, so the parse errors are known and
+    only the token index where each statement starts is kept; a statement
+    is parsed into node objects when first read, and kept.
+    """
+
+    def __init__(self, parser, starts):
+        self.parser = parser
+        self.starts = starts
+        self.nodes = [None] * len(starts)
+        self._builder = _NodeBuilder(parser.tokens)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[j] for j in range(*k.indices(len(self)))]
+        node = self.nodes[k]
+        if node is None:
+            node = self.nodes[k] = self.parser._statement_at(self.starts[k], self._builder)
+        return node
+
+    def parsed(self):
+        """How many statements have been parsed so far."""
+        return sum(1 for node in self.nodes if node is not None)
+
+    def __reduce__(self):
+        # Pickles as the plain list of statements
+        return list, (list(self),)
+
+
+class Parser:
+    def __init__(self, tokens, arena=False):
+        # Tokens are read in place, so other iterables are copied into a
+        # list first; kinds holds one int per token, ERROR tokens included,
+        # which the cursor steps over, plus an END sentinel
+        if isinstance(tokens, TokenBuffer):
+            self.kinds = array('B', tokens.kinds)
+        else:
+            if not isinstance(tokens, Sequence):
+                tokens = list(tokens)
+            self.kinds = token_kinds(tokens)
+        self.tokens = tokens
+        self.length = len(self.kinds)
+        self.kinds.append(END_KIND)
         self.current = 0
+        self.previous = -1
+        if self.kinds[0] == ERROR_KIND:
+            self._skip_errors()
         self.had_error = False
         self.error_messages = []
+        # With arena=True, parse_query() returns an Arena instead of a Query
+        self.arena = Arena(tokens, self.kinds) if arena else None
+        self.build = self.arena if arena else _NodeBuilder(tokens)
+
+    def _skip_errors(self):
+        kinds = self.kinds
+        while kinds[self.current] == ERROR_KIND:
+            self.current += 1
 
     def peek(self):
-        if self.current >= len(self.tokens):
+        if self.current >= self.length:
             return None
         return self.tokens[self.current]
 
+    def peek_kind(self):
+        """Kind of the current token, END_KIND past the last one."""
+        return self.kinds[self.current]
+
+    def _step(self):
+        self.previous = self.current
+        self.current += 1
+        if self.kinds[self.current] == ERROR_KIND:
+            self._skip_errors()
+
     def advance(self):
-        if self.current < len(self.tokens):
-            self.current += 1
-            return self.tokens[self.current - 1]
+        if self.current < self.length:
+            token = self.tokens[self.current]
+            self._step()
+            return token
         return None
 
     def error(self, message):
@@ -46,341 +197,458 @@ class Parser:
 
     def synchronize(self):
         self.advance()
-        while self.peek():
-            if self.tokens[self.current - 1][1] == ";":
+        kinds = self.kinds
+        while self.current < self.length:
+            if kinds[self.previous] == _SEMICOLON:
                 return
-            if self.peek()[1].upper() in ["CREATE", "SELECT", "INSERT", "UPDATE", "DELETE"]:
+            if kinds[self.current] in _STATEMENT_STARTS:
                 return
-            self.advance()
+            self._step()
 
-    def match(self, expected_type, expected_lexeme=None):
-        cur = self.peek()
-        if cur is None:
-            return False
-        if cur[0] != expected_type:
+    def match(self, kind):
+        if self.kinds[self.current] != kind:
             return False
-        if expected_lexeme is not None and cur[1] != expected_lexeme:
-            return False
-        self.advance()
+        self._step()
         return True
 
-    def create_node(self, value):
-        token = self.peek()
-        if token:
-            return ParseTreeNode(value, token[2], token[3], token[1])
-        return ParseTreeNode(value)
+    def create_node(self, word):
+        return self.build.keyword(word, self.current if self.current < self.length else -1)
+
+    def parse_query(self, lazy=False):
+        """Parse all statements and return the Query root, or the Arena in arena mode.
 
-    def parse_query(self):
-        root = ParseTreeNode('Query')
-        while self.peek():
+        With lazy set, the statements are only validated here (see
+        validate()), errors included, and the Query's children are a
+        LazyStatements that parses each statement as node objects when it
+        is first accessed.
+        """
+        if lazy:
+            root = Query()
+            root.children = LazyStatements(self, self._validate())
+            return root
+        arena = self.arena
+        if arena is None:
+            root = self.build.branch(QUERY)
+        else:
+            root = arena.root
+        while self.current < self.length:
+            if arena is not None:
+                mark = len(arena)
             stmt_node = self.parse_statement()
-            if stmt_node:
-                root.add_child(stmt_node)
+            if stmt_node is not None:
+                self.build.add(root, stmt_node)
             else:
+                if arena is not None:
+                    # Drop the nodes of the failed statement
+                    arena.truncate(mark)
                 self.synchronize()
+        if arena is not None:
+            return arena.finish()
         return root
 
+    def validate(self):
+        """Check the grammar of every statement without building any nodes.
+
+        Errors are reported in error_messages as by parse_query(); returns
+        True when there were none.
+        """
+        self._validate()
+        return not self.had_error
+
+    def _validate(self):
+        """Run the statement loop of parse_query() with _NullBuilder.
+
+        Returns the token index of the start of each statement that
+        parse_query() would have added to the tree.
+        """
+        build, self.build = self.build, _NULL_BUILDER
+        starts = array('I')
+        try:
+            while self.current < self.length:
+                start = self.current
+                if self.parse_statement() is not None:
+                    starts.append(start)
+                else:
+                    self.synchronize()
+        finally:
+            self.build = build
+        return starts
+
+    def _statement_at(self, start, builder):
+        """Parse again the statement that validation found at token start, building with builder."""
+        saved = (self.current, self.previous, self.build, self.error_messages, self.had_error)
+        self.current, self.previous, self.build, self.error_messages = start, start - 1, builder, []
+        try:
+            return self.parse_statement()
+        finally:
+            self.current, self.previous, self.build, self.error_messages, self.had_error = saved
+
     def parse_statement(self):
-        token = self.peek()
-        if not token:
+        if self.current >= self.length:
             return None
-        lexeme = token[1].upper()
-        if lexeme == "CREATE":
-            return self.parse_CreateStmt()
-        elif lexeme == "SELECT":
-            return self.parse_SelectStmt()
-        elif lexeme == "INSERT":
-            return self.parse_InsertStmt()
-        elif lexeme == "UPDATE":
-            return self.parse_UpdateStmt()
-        elif lexeme == "DELETE":
-            return self.parse_DeleteStmt()
-        else:
-            self.error(f"Unexpected token '{lexeme}'")
+        production = _PRODUCTIONS[self.kinds[self.current]]
+        if production is None:
+            self.error(f"Unexpected token '{self.tokens[self.current][1].upper()}'")
             return None
+        return production(self)
 
     def parse_CreateStmt(self):
-        node = ParseTreeNode("CreateStmt")
-        if not self.match("KEYWORD", "CREATE"):
+        node = self.build.branch(CREATE_STMT)
+        if not self.match(_CREATE):
             return None
-        node.add_child(self.create_node("CREATE"))
-        if not self.match("KEYWORD", "TABLE"):
+        self.build.add(node, self.create_node(_CREATE))
+        if not self.match(_TABLE):
             self.error("Expected 'TABLE'")
             return None
-        node.add_child(self.create_node("TABLE"))
-        table_token = self.peek()
-        if not self.match("IDENTIFIER"):
+        self.build.add(node, self.create_node(_TABLE))
+        table_at = self.current
+        if not self.match(IDENTIFIER_KIND):
             self.error("Expected table name")
             return None
-        node.add_child(ParseTreeNode(f"Table: {table_token[1]}", table_token[2], table_token[3], table_token[1]))
-        if not self.match("DELIMITER", "("):
+        self.build.add(node, self.build.token_node(TABLE_REF, table_at))
+        if not self.match(_LPAREN):
             self.error("Expected '('")
             return None
         col_list = self.parse_ColumnList()
-        if not col_list:
+        if col_list is None:
             return None
-        node.add_child(col_list)
-        if not self.match("DELIMITER", ")"):
+        self.build.add(node, col_list)
+        if not self.match(_RPAREN):
             self.error("Expected ')'")
             return None
-        if not self.match("DELIMITER", ";"):
+        if not self.match(_SEMICOLON):
             self.error("Expected ';'")
             return None
         return node
 
     def parse_ColumnList(self):
-        node = ParseTreeNode("ColumnList")
+        node = self.build.branch(COLUMN_LIST)
         while True:
-            col_token = self.peek()
-            if not self.match("IDENTIFIER"):
+            col_at = self.current
+            if not self.match(IDENTIFIER_KIND):
                 self.error("Expected column name")
                 return None
-            col_node = ParseTreeNode(f"Col: {col_token[1]}", col_token[2], col_token[3], col_token[1])
-            type_token = self.peek()
-            if type_token and type_token[1] in ["INT", "FLOAT", "TEXT"]:
+            col_node = self.build.token_node(COLUMN_DEF, col_at)
+            type_at = self.current
+            if self.kinds[self.current] in _TYPE_NAMES:
                 self.advance()
-                col_node.add_child(ParseTreeNode(f"Type: {type_token[1]}", type_token[2], type_token[3], type_token[1]))
+                self.build.add(col_node, self.build.token_node(TYPE_NAME, type_at))
             else:
                 self.error("Expected data type")
                 return None
-            node.add_child(col_node)
-            if not self.match("DELIMITER", ","):
+            self.build.add(node, col_node)
+            if not self.match(_COMMA):
                 break
         return node
 
     def parse_InsertStmt(self):
-        node = ParseTreeNode("InsertStmt")
-        if not self.match("KEYWORD", "INSERT"):
+        node = self.build.branch(INSERT_STMT)
+        if not self.match(_INSERT):
             return None
-        node.add_child(self.create_node("INSERT"))
-        if not self.match("KEYWORD", "INTO"):
+        self.build.add(node, self.create_node(_INSERT))
+        if not self.match(_INTO):
             self.error("Expected 'INTO'")
             return None
-        node.add_child(self.create_node("INTO"))
-        tbl_token = self.peek()
-        if not self.match("IDENTIFIER"):
+        self.build.add(node, self.create_node(_INTO))
+        table_at = self.current
+        if not self.match(IDENTIFIER_KIND):
             self.error("Expected table name")
             return None
-        node.add_child(ParseTreeNode(f"Table: {tbl_token[1]}", tbl_token[2], tbl_token[3], tbl_token[1]))
-        if not self.match("KEYWORD", "VALUES"):
+        self.build.add(node, self.build.token_node(TABLE_REF, table_at))
+        if not self.match(_VALUES):
             self.error("Expected 'VALUES'")
             return None
-        node.add_child(self.create_node("VALUES"))
-        if not self.match("DELIMITER", "("):
+        self.build.add(node, self.create_node(_VALUES))
+        if not self.match(_LPAREN):
             self.error("Expected '('")
             return None
-        val_list = self.parse_ValueList()
-        if not val_list:
-            return None
-        node.add_child(val_list)
-        if not self.match("DELIMITER", ")"):
-            self.error("Expected ')'")
-            return None
-        if not self.match("DELIMITER", ";"):
+        if self._multi_row():
+            rows = self.parse_ValueRows()
+            if rows is None:
+                return None
+            self.build.add(node, self.build.value_rows(rows))
+        else:
+            val_list = self.parse_ValueList()
+            if val_list is None:
+                return None
+            self.build.add(node, val_list)
+            if not self.match(_RPAREN):
+                self.error("Expected ')'")
+                return None
+        if not self.match(_SEMICOLON):
             self.error("Expected ';'")
             return None
         return node
 
     def parse_ValueList(self):
-        node = ParseTreeNode("ValueList")
+        node = self.build.branch(VALUE_LIST)
         while True:
-            token = self.peek()
-            if not token:
+            kind = self.kinds[self.current]
+            if kind == END_KIND:
                 break
-            if token[0] in ["INTEGER_LITERAL", "FLOAT_LITERAL", "STRING_LITERAL"]:
-                self.advance()
-                node.add_child(ParseTreeNode(f"Value: {token[1]}", token[2], token[3], token[1]))
+            if kind in _VALUE_KINDS:
+                self.build.add(node, self.build.token_node(VALUE if kind != PARAMETER_KIND else PARAMETER, self.current))
+                self._step()
             else:
                 self.error("Expected value")
                 return None
-            if not self.match("DELIMITER", ","):
+            if not self.match(_COMMA):
                 break
         return node
 
+    def _multi_row(self):
+        """Whether the VALUES tuple just opened is followed by ',' and another one."""
+        kinds = self.kinds
+        j = self.current
+        while kinds[j] in _VALUE_KINDS or kinds[j] == _COMMA or kinds[j] == ERROR_KIND:
+            j += 1
+        if kinds[j] != _RPAREN:
+            return False
+        j += 1
+        while kinds[j] == ERROR_KIND:
+            j += 1
+        return kinds[j] == _COMMA
+
+    def parse_ValueRows(self):
+        """Parse the rows of a multi-row VALUES list, its first '(' matched, through the last ')'."""
+        rows = self.build.new_rows()
+        kinds, tokens = self.kinds, self.tokens
+        add_value = rows.add_value
+        while True:
+            while True:
+                kind = kinds[self.current]
+                if kind == END_KIND:
+                    break
+                if kind in _VALUE_KINDS:
+                    token = tokens[self.current]
+                    add_value(kind, token[2], token[3], token[1])
+                    self._step()
+                else:
+                    self.error("Expected value")
+                    return None
+                if not self.match(_COMMA):
+                    break
+            rows.end_row()
+            if not self.match(_RPAREN):
+                self.error("Expected ')'")
+                return None
+            if not self.match(_COMMA):
+                return rows
+            if not self.match(_LPAREN):
+                self.error("Expected '('")
+                return None
+
     def parse_SelectStmt(self):
-        node = ParseTreeNode("SelectStmt")
-        if not self.match("KEYWORD", "SELECT"):
+        node = self.build.branch(SELECT_STMT)
+        if not self.match(_SELECT):
             return None
-        node.add_child(self.create_node("SELECT"))
+        self.build.add(node, self.create_node(_SELECT))
         sl_node = self.parse_SelectList()
-        if not sl_node:
+        if sl_node is None:
             return None
-        node.add_child(sl_node)
-        if not self.match("KEYWORD", "FROM"):
+        self.build.add(node, sl_node)
+        if not self.match(_FROM):
             self.error("Expected 'FROM'")
             return None
-        node.add_child(self.create_node("FROM"))
-        tbl = self.peek()
-        if not self.match("IDENTIFIER"):
+        self.build.add(node, self.create_node(_FROM))
+        table_at = self.current
+        if not self.match(IDENTIFIER_KIND):
             self.error("Expected table name")
             return None
-        node.add_child(ParseTreeNode(f"Table: {tbl[1]}", tbl[2], tbl[3], tbl[1]))
-        next_tok = self.peek()
-        if next_tok and next_tok[1].upper() == "WHERE":
+        self.build.add(node, self.build.token_node(TABLE_REF, table_at))
+        if self.kinds[self.current] == _WHERE:
             where_node = self.parse_WhereClause()
-            if where_node:
-                node.add_child(where_node)
-        if not self.match("DELIMITER", ";"):
+            if where_node is not None:
+                self.build.add(node, where_node)
+        if not self.match(_SEMICOLON):
             self.error("Expected ';'")
             return None
         return node
 
     def parse_SelectList(self):
-        node = ParseTreeNode("SelectList")
-        if self.match("OPERATOR", "*"):
-            node.add_child(ParseTreeNode("*"))
+        node = self.build.branch(SELECT_LIST)
+        if self.match(_STAR):
+            self.build.add(node, self.build.branch(STAR))
             return node
         while True:
-            token = self.peek()
-            if not self.match("IDENTIFIER"):
+            at = self.current
+            if not self.match(IDENTIFIER_KIND):
                 self.error("Expected column")
                 return None
-            node.add_child(ParseTreeNode(f"Col: {token[1]}", token[2], token[3], token[1]))
-            if not self.match("DELIMITER", ","):
+            self.build.add(node, self.build.token_node(COLUMN_REF, at))
+            if not self.match(_COMMA):
                 break
         return node
 
     def parse_WhereClause(self):
-        if not self.match("KEYWORD", "WHERE"):
+        if not self.match(_WHERE):
             return None
-        node = ParseTreeNode("WhereClause")
-        node.add_child(self.create_node("WHERE"))
+        node = self.build.branch(WHERE_CLAUSE)
+        self.build.add(node, self.create_node(_WHERE))
         cond_node = self.parse_Condition()
-        if cond_node:
-            node.add_child(cond_node)
+        if cond_node is not None:
+            self.build.add(node, cond_node)
         return node
 
     def parse_Condition(self):
-        left = self.parse_AndTerm()
-        if not left:
-            return None
-        while self.match("KEYWORD", "OR"):
-            parent = ParseTreeNode("OR")
-            parent.add_child(left)
-            right = self.parse_AndTerm()
-            if not right:
-                return None
-            parent.add_child(right)
-            left = parent
-        return left
+        """Parse OR/AND/NOT conditions by precedence climbing over an explicit stack.
 
-    def parse_AndTerm(self):
-        left = self.parse_BaseCondition()
-        if not left:
-            return None
-        while self.match("KEYWORD", "AND"):
-            parent = ParseTreeNode("AND")
-            parent.add_child(left)
-            right = self.parse_BaseCondition()
-            if not right:
-                return None
-            parent.add_child(right)
-            left = parent
-        return left
-
-    def parse_BaseCondition(self):
-        if self.match("KEYWORD", "NOT"):
-            node = ParseTreeNode("NOT")
-            child = self.parse_BaseCondition()
-            if child:
-                node.add_child(child)
-            return node
-        if self.match("DELIMITER", "("):
-            node = self.parse_Condition()
-            if not node:
-                return None
-            if not self.match("DELIMITER", ")"):
-                self.error("Expected ')'")
-            return node
-        id_tok = self.peek()
-        if not self.match("IDENTIFIER"):
+        The grammar is that of the original recursive descent:
+
+            Condition := AndTerm (OR AndTerm)*
+            AndTerm   := Base (AND Base)*
+            Base      := NOT Base | '(' Condition ')' | Comparison
+
+        with AND and OR associating to the left. Each pending rule is a frame
+        on the stack: [_OR, left] and [_AND, left] collect their operands,
+        [_NOT, node] waits for its operand and [_LPAREN, None] for its ')'.
+        Nesting depth and chain length are therefore only bounded by memory.
+        """
+        build = self.build
+        stack = [[_OR, None], [_AND, None]]
+        while True:
+            # Descend through the prefixes of the next Base
+            while True:
+                if self.match(_NOT):
+                    stack.append([_NOT, build.bool_op(_NOT)])
+                elif self.match(_LPAREN):
+                    stack.extend(([_LPAREN, None], [_OR, None], [_AND, None]))
+                else:
+                    break
+            result = self.parse_Comparison()
+
+            # Hand the result up until a frame needs another operand
+            while True:
+                frame = stack[-1]
+                kind = frame[0]
+                if kind == _NOT:
+                    # As before, NOT keeps its node when the operand failed
+                    stack.pop()
+                    if result is not None:
+                        build.add(frame[1], result)
+                    result = frame[1]
+                elif kind == _LPAREN:
+                    stack.pop()
+                    if result is not None and not self.match(_RPAREN):
+                        self.error("Expected ')'")
+                else:
+                    # An AND frame receives a Base, an OR frame an AndTerm
+                    if result is not None:
+                        if frame[1] is not None:
+                            parent = build.bool_op(kind)
+                            build.add(parent, frame[1])
+                            build.add(parent, result)
+                            result = parent
+                        if self.match(kind):
+                            frame[1] = result
+                            if kind == _OR:
+                                stack.append([_AND, None])
+                            break
+                    stack.pop()
+                    if not stack:
+                        return result
+
+    def parse_Comparison(self):
+        col_at = self.current
+        if not self.match(IDENTIFIER_KIND):
             self.error("Expected identifier")
             return None
-        comp_node = ParseTreeNode("Comparison")
-        comp_node.add_child(ParseTreeNode(f"Col: {id_tok[1]}", id_tok[2], id_tok[3], id_tok[1]))
-        op_tok = self.peek()
-        if op_tok and op_tok[0] == "OPERATOR":
+        comp_node = self.build.branch(COMPARISON)
+        self.build.add(comp_node, self.build.token_node(COLUMN_REF, col_at))
+        op_at = self.current
+        if self.kinds[self.current] in _OPERATORS:
             self.advance()
-            comp_node.add_child(ParseTreeNode(f"Op: {op_tok[1]}", op_tok[2], op_tok[3], op_tok[1]))
+            self.build.add(comp_node, self.build.token_node(OPERATOR, op_at))
         else:
             self.error("Expected operator")
             return None
-        val_tok = self.peek()
-        if val_tok and val_tok[0] in ["INTEGER_LITERAL", "FLOAT_LITERAL", "STRING_LITERAL"]:
+        val_at = self.current
+        kind = self.kinds[self.current]
+        if kind in _VALUE_KINDS:
             self.advance()
-            comp_node.add_child(ParseTreeNode(f"Val: {val_tok[1]}", val_tok[2], val_tok[3], val_tok[1]))
+            self.build.add(comp_node, self.build.token_node(LITERAL if kind != PARAMETER_KIND else PARAMETER, val_at))
         else:
             self.error("Expected value")
             return None
         return comp_node
 
     def parse_UpdateStmt(self):
-        node = ParseTreeNode("UpdateStmt")
-        if not self.match("KEYWORD", "UPDATE"):
+        node = self.build.branch(UPDATE_STMT)
+        if not self.match(_UPDATE):
             return None
-        node.add_child(self.create_node("UPDATE"))
-        tbl = self.peek()
-        if not self.match("IDENTIFIER"):
+        self.build.add(node, self.create_node(_UPDATE))
+        table_at = self.current
+        if not self.match(IDENTIFIER_KIND):
             self.error("Expected table")
             return None
-        node.add_child(ParseTreeNode(f"Table: {tbl[1]}", tbl[2], tbl[3], tbl[1]))
-        if not self.match("KEYWORD", "SET"):
+        self.build.add(node, self.build.token_node(TABLE_REF, table_at))
+        if not self.match(_SET):
             self.error("Expected 'SET'")
             return None
-        node.add_child(self.create_node("SET"))
+        self.build.add(node, self.create_node(_SET))
         assign_node = self.parse_AssignmentList()
-        if assign_node:
-            node.add_child(assign_node)
-        if self.peek() and self.peek()[1].upper() == "WHERE":
+        if assign_node is not None:
+            self.build.add(node, assign_node)
+        if self.kinds[self.current] == _WHERE:
             where_node = self.parse_WhereClause()
-            if where_node:
-                node.add_child(where_node)
-        if not self.match("DELIMITER", ";"):
+            if where_node is not None:
+                self.build.add(node, where_node)
+        if not self.match(_SEMICOLON):
             self.error("Expected ';'")
         return node
 
     def parse_AssignmentList(self):
-        node = ParseTreeNode("AssignmentList")
+        node = self.build.branch(ASSIGNMENT_LIST)
         while True:
-            col = self.peek()
-            if not self.match("IDENTIFIER"):
+            col_at = self.current
+            if not self.match(IDENTIFIER_KIND):
                 self.error("Expected column")
                 return None
-            assign = ParseTreeNode("Assignment")
-            assign.add_child(ParseTreeNode(f"Col: {col[1]}", col[2], col[3], col[1]))
-            if not self.match("OPERATOR", "="):
+            assign = self.build.branch(ASSIGNMENT)
+            self.build.add(assign, self.build.token_node(COLUMN_REF, col_at))
+            if not self.match(_EQUALS):
                 self.error("Expected '='")
                 return None
-            val = self.peek()
-            if val and val[0] in ["INTEGER_LITERAL", "FLOAT_LITERAL", "STRING_LITERAL"]:
+            val_at = self.current
+            kind = self.kinds[self.current]
+            if kind in _VALUE_KINDS:
                 self.advance()
-                assign.add_child(ParseTreeNode(f"Val: {val[1]}", val[2], val[3], val[1]))
+                self.build.add(assign, self.build.token_node(LITERAL if kind != PARAMETER_KIND else PARAMETER, val_at))
             else:
                 self.error("Expected value")
                 return None
-            node.add_child(assign)
-            if not self.match("DELIMITER", ","):
+            self.build.add(node, assign)
+            if not self.match(_COMMA):
                 break
         return node
 
     def parse_DeleteStmt(self):
-        node = ParseTreeNode("DeleteStmt")
-        if not self.match("KEYWORD", "DELETE"):
+        node = self.build.branch(DELETE_STMT)
+        if not self.match(_DELETE):
             return None
-        node.add_child(self.create_node("DELETE"))
-        if not self.match("KEYWORD", "FROM"):
+        self.build.add(node, self.create_node(_DELETE))
+        if not self.match(_FROM):
             self.error("Expected 'FROM'")
             return None
-        node.add_child(self.create_node("FROM"))
-        tbl = self.peek()
-        if not self.match("IDENTIFIER"):
+        self.build.add(node, self.create_node(_FROM))
+        table_at = self.current
+        if not self.match(IDENTIFIER_KIND):
             self.error("Expected table")
             return None
-        node.add_child(ParseTreeNode(f"Table: {tbl[1]}", tbl[2], tbl[3], tbl[1]))
-        if self.peek() and self.peek()[1].upper() == "WHERE":
+        self.build.add(node, self.build.token_node(TABLE_REF, table_at))
+        if self.kinds[self.current] == _WHERE:
             where_node = self.parse_WhereClause()
-            if where_node:
-                node.add_child(where_node)
-        if not self.match("DELIMITER", ";"):
+            if where_node is not None:
+                self.build.add(node, where_node)
+        if not self.match(_SEMICOLON):
             self.error("Expected ';'")
         return node
+
+
+# Statement productions indexed by the kind of their first token
+_PRODUCTIONS = [None] * (END_KIND + 1)
+_PRODUCTIONS[_CREATE] = Parser.parse_CreateStmt
+_PRODUCTIONS[_SELECT] = Parser.parse_SelectStmt
+_PRODUCTIONS[_INSERT] = Parser.parse_InsertStmt
+_PRODUCTIONS[_UPDATE] = Parser.parse_UpdateStmt
+_PRODUCTIONS[_DELETE] = Parser.parse_DeleteStmt
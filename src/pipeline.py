@@ -0,0 +1,364 @@
+# Parallel Compilation
+#
+# Large scripts are cut into batches of whole statements at the boundaries
+# found by the splitter. Worker processes lex and parse the batches, each
+# starting from the line and column where its batch begins, so the merged
+# tokens and tree carry the same positions as a serial run.
+#
+# Workers send their batches back packed: token types and positions in
+# arrays, values as offsets into the script, and the parse trees flattened
+# and pickled once more (see nodes.flatten), so the parent only unpickles a
+# few arrays and one bytes object per batch. Tokens and trees are unpacked
+# when first read. The CREATE TABLE statements, which the parent needs for
+# semantic analysis, come back as nodes; the other statements are checked
+# by the workers against the tables created before them.
+
+import os
+import pickle
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+from lexer import _ScanState, TOKEN_TYPES, TYPE_CODES
+from nodes import Query, CreateStmt, flatten, unflatten
+from incremental import CompileResult, Segment, compile_sql, _lex_segments
+from semantic import SemanticAnalyzer, _CHECKED_IN_WORKERS, _check_batch, _snapshot_analyzer
+from splitter import split_statements
+
+BATCH_SIZE = 2000
+
+_ERROR = TYPE_CODES["ERROR"]
+_KEYWORD = TYPE_CODES["KEYWORD"]
+_DELIMITER = TYPE_CODES["DELIMITER"]
+
+
+class _Batch:
+    """The segments of one batch as a worker packs them.
+
+    Token i has type code types[i], position lines[i], cols[i], and its
+    value is the text from starts[i] to ends[i] past offset in code
+    (upper-cased for keywords), except for errors, whose messages are in
+    errors. Segment k holds tokens token_counts[k] to token_counts[k + 1],
+    statements statement_counts[k] to statement_counts[k + 1] and flat
+    nodes node_counts[k] to node_counts[k + 1].
+    """
+
+    __slots__ = ("code", "offset", "types", "lines", "cols", "starts", "ends", "errors",
+                 "token_counts", "statement_counts", "node_counts",
+                 "seg_starts", "seg_ends", "seg_lines", "seg_bases", "seg_parens", "seg_errors",
+                 "flat", "creates", "checked", "_flat")
+
+    def __len__(self):
+        return len(self.seg_starts)
+
+    def tokens(self, k):
+        code, offset = self.code, self.offset
+        types, lines, cols, starts, ends = self.types, self.lines, self.cols, self.starts, self.ends
+        tokens = []
+        for i in range(self.token_counts[k], self.token_counts[k + 1]):
+            tcode = types[i]
+            if tcode == _ERROR:
+                value = self.errors[i]
+            elif tcode == _KEYWORD:
+                value = code[offset + starts[i]:offset + ends[i]].upper()
+            else:
+                value = code[offset + starts[i]:offset + ends[i]]
+            tokens.append((TOKEN_TYPES[tcode], value, lines[i], cols[i]))
+        return tokens
+
+    def nodes(self, k):
+        if self._flat is None:
+            self._flat = pickle.loads(self.flat)
+        kinds, args, counts = self._flat
+        lo, hi = self.node_counts[k], self.node_counts[k + 1]
+        return unflatten((kinds[lo:hi], args[lo:hi], counts[lo:hi]))
+
+    def lex_errors(self):
+        return [("ERROR", self.errors[i], self.lines[i], self.cols[i]) for i in sorted(self.errors)]
+
+
+class _PackedSegment(Segment):
+    """A segment of a packed batch; its tokens and nodes are unpacked on first use."""
+
+    def __init__(self, batch, k):
+        self.batch = batch
+        self.k = k
+        self.start = batch.seg_starts[k]
+        self.end = batch.seg_ends[k]
+        self.line = batch.seg_lines[k]
+        self.base = batch.seg_bases[k]
+        self.parens = batch.seg_parens.get(k, ())
+        self.errors = batch.seg_errors.get(k, [])
+        self.shared = False
+        self._tokens = None
+        self._nodes = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = self.batch.tokens(self.k)
+        return self._tokens
+
+    @tokens.setter
+    def tokens(self, tokens):
+        self._tokens = tokens
+
+    @property
+    def nodes(self):
+        if self._nodes is None:
+            self._nodes = self.batch.nodes(self.k)
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes):
+        self._nodes = nodes
+
+    def closed(self):
+        if self._tokens is not None:
+            return Segment.closed(self)
+        batch = self.batch
+        i = batch.token_counts[self.k + 1] - 1
+        return (i >= batch.token_counts[self.k] and batch.types[i] == _DELIMITER
+                and batch.ends[i] - batch.starts[i] == 1 and batch.code[batch.offset + batch.starts[i]] == ";")
+
+    def __reduce_ex__(self, protocol):
+        # Pickles as a plain Segment
+        seg = Segment(self.start, self.line, self.base, self.parens)
+        seg.end, seg.tokens, seg.nodes, seg.errors = self.end, self.tokens, self.nodes, self.errors
+        return seg.__reduce_ex__(protocol)
+
+
+class _Chained(Sequence):
+    """The tokens or statements of a list of segments, read one segment at a time.
+
+    counts[k] is the number of items in the segments before segment k.
+    """
+
+    def __init__(self, segments, counts, attr):
+        self._segments = segments
+        self._counts = counts
+        self._attr = attr
+
+    def __len__(self):
+        return self._counts[-1]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("index out of range")
+        k = bisect_right(self._counts, i) - 1
+        return getattr(self._segments[k], self._attr)[i - self._counts[k]]
+
+    def __iter__(self):
+        attr = self._attr
+        for seg in self._segments:
+            yield from getattr(seg, attr)
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
+class _PackedResult(CompileResult):
+    """A CompileResult over segments of packed batches, with tokens and tree read lazily."""
+
+    def __init__(self, code, segments, units):
+        self.code = code
+        self.segments = segments
+        token_counts = array('q', [0])
+        statement_counts = array('q', [0])
+        self.parse_errors = []
+        self.lex_errors = []
+        for unit in units:
+            if isinstance(unit, _Batch):
+                for k in range(len(unit)):
+                    token_counts.append(token_counts[-1] + unit.token_counts[k + 1] - unit.token_counts[k])
+                    statement_counts.append(statement_counts[-1] + unit.statement_counts[k + 1]
+                                            - unit.statement_counts[k])
+                    self.parse_errors.extend(unit.seg_errors.get(k, ()))
+                self.lex_errors.extend(unit.lex_errors())
+                continue
+            for seg in unit:
+                token_counts.append(token_counts[-1] + len(seg.tokens))
+                statement_counts.append(statement_counts[-1] + len(seg.nodes))
+                self.parse_errors.extend(seg.errors)
+                self.lex_errors.extend(t for t in seg.tokens if t[0] == 'ERROR')
+        self.tokens = _Chained(segments, token_counts, "tokens")
+        self.parse_tree = Query()
+        self.parse_tree.children = _Chained(segments, statement_counts, "nodes")
+        self.semantic_result = None
+
+
+def _compile_batch(text, offset, line, base, final):
+    """Lex and parse one batch of statements starting at offset in the script.
+
+    Returns the batch packed as a _Batch positioned in the whole script, or
+    None when the batch does not end cleanly on a ';' (an error, or an
+    unclosed parenthesis or comment); the caller then compiles from here
+    serially.
+    """
+    state = _ScanState()
+    state.line, state.base = line, base - offset
+    offsets = array('q')
+    segments, _ = _lex_segments(text, 0, state, offsets=offsets)
+    if not final and (state.failed or state.paren_stack or not segments[-1].closed()
+                      or any(tok[0] == 'ERROR' for seg in segments for tok in seg.tokens)):
+        return None
+
+    batch = _Batch()
+    batch.code = batch._flat = None
+    batch.offset = offset
+    batch.types, batch.lines, batch.cols = array('B'), array('i'), array('i')
+    batch.errors = {}
+    batch.token_counts, batch.statement_counts, batch.node_counts = (array('q', [0]) for _ in range(3))
+    batch.seg_starts, batch.seg_ends, batch.seg_bases = array('q'), array('q'), array('q')
+    batch.seg_lines = array('i')
+    batch.seg_parens, batch.seg_errors = {}, {}
+    statements = []
+    i = 0
+    for k, seg in enumerate(segments):
+        seg.parse()
+        for ttype, value, tline, tcol in seg.tokens:
+            batch.types.append(TYPE_CODES[ttype])
+            batch.lines.append(tline)
+            batch.cols.append(tcol)
+            if ttype == 'ERROR':
+                batch.errors[i] = value
+            i += 1
+        statements.extend(seg.nodes)
+        batch.token_counts.append(i)
+        batch.statement_counts.append(len(statements))
+        batch.seg_starts.append(seg.start + offset)
+        batch.seg_ends.append(seg.end + offset)
+        batch.seg_lines.append(seg.line)
+        batch.seg_bases.append(seg.base + offset)
+        if seg.parens:
+            batch.seg_parens[k] = seg.parens
+        if seg.errors:
+            batch.seg_errors[k] = seg.errors
+    batch.starts, batch.ends = array('I', offsets[0::2]), array('I', offsets[1::2])
+
+    kinds, args, counts = flatten(statements)
+    # Node counts per segment follow from the counts of children: a tree
+    # ends where the children still owed drop to zero
+    node_counts = batch.node_counts
+    j = 0
+    for k in range(len(segments)):
+        for _ in range(batch.statement_counts[k + 1] - batch.statement_counts[k]):
+            owed = 1
+            while owed:
+                owed += counts[j] - 1
+                j += 1
+        node_counts.append(j)
+    batch.flat = pickle.dumps((kinds, args, counts), pickle.HIGHEST_PROTOCOL)
+    batch.creates = [(j, stmt) for j, stmt in enumerate(statements) if stmt.__class__ is CreateStmt]
+    batch.checked = [j for j, stmt in enumerate(statements) if stmt.__class__ in _CHECKED_IN_WORKERS]
+    return batch
+
+
+def _check_statements(flat, first, indexes, tables, created):
+    """Check the statements at indexes of a packed batch whose first statement has index first."""
+    statements = dict(enumerate(unflatten(pickle.loads(flat)), first))
+    return _check_batch(indexes, statements, _snapshot_analyzer(tables, created))
+
+
+def _batches(code, statements, batch_size):
+    """Yield (start, end, line, base) for consecutive runs of batch_size statements.
+
+    The batches cover the script without gaps, so blanks and comments between
+    statements are lexed as well; the last one runs to the end of the script.
+    """
+    start, line, base = 0, 1, -1
+    for k in range(batch_size - 1, len(statements) - 1, batch_size):
+        last = statements[k]
+        yield start, last.end, line, base
+        start, line, base = last.end, last.end_line, last.end - 1 - last.end_col
+    yield start, len(code), line, base
+
+
+def _analyze(units, root, pool, render):
+    """Analyze the statements of units like SemanticAnalyzer.analyze_parallel.
+
+    The CREATE TABLE statements are applied here in order; the others are
+    checked by the pool, each packed batch unpacking its own statements,
+    and those of serially compiled segments in this process.
+    """
+    analyzer = SemanticAnalyzer()
+    analyzer._reset(root, None)
+    errors = {}
+    created = {}
+    checks = []
+    serial = {}
+    k = 0
+    for unit in units:
+        if isinstance(unit, _Batch):
+            for j, stmt in unit.creates:
+                analyzer._create_at(stmt, k + j, errors, created)
+            if unit.checked:
+                checks.append((unit.flat, k, [k + j for j in unit.checked]))
+            k += unit.statement_counts[-1]
+            continue
+        for seg in unit:
+            for stmt in seg.nodes:
+                if stmt.__class__ is CreateStmt:
+                    analyzer._create_at(stmt, k, errors, created)
+                elif stmt.__class__ in _CHECKED_IN_WORKERS:
+                    serial[k] = stmt
+                k += 1
+
+    tables = analyzer.symbol_table
+    jobs = [pool.submit(_check_statements, flat, first, indexes, tables, created)
+            for flat, first, indexes in checks]
+    results = [_check_batch(list(serial), serial, _snapshot_analyzer(tables, created))] if serial else []
+    results.extend(job.result() for job in jobs)
+    analyzer._merge_checks(errors, results)
+    return analyzer._result(root, render)
+
+
+def compile_parallel(code, workers=None, batch_size=BATCH_SIZE, render=False):
+    """Compile a script with lexing, parsing and most checks spread over worker processes.
+
+    The script is split into batches of batch_size statements, which up to
+    workers processes (default: one per CPU) lex and parse. The result
+    matches the CompileResult that compile_sql returns, and can be passed
+    to recompile(); its tokens and parse tree are unpacked as they are read.
+    Scripts of a single batch, or runs with one worker, are compiled in this
+    process. render is passed on to the semantic analysis.
+    """
+    workers = workers or os.cpu_count() or 1
+    statements = split_statements(code)
+    if workers == 1 or len(statements) <= batch_size:
+        return compile_sql(code, render=render)
+
+    batches = list(_batches(code, statements, batch_size))
+    del statements
+    segments = []
+    # Packed batches, and lists of segments compiled in this process
+    units = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(_compile_batch, code[start:end], start, line, base, k == len(batches) - 1)
+                for k, (start, end, line, base) in enumerate(batches)]
+        for k, job in enumerate(jobs):
+            batch = job.result()
+            if batch is None:
+                # Lex the rest serially, as one run stops at the first error
+                for later in jobs[k + 1:]:
+                    later.cancel()
+                start, _, line, base = batches[k]
+                state = _ScanState()
+                state.line, state.base = line, base
+                rest, _ = _lex_segments(code, start, state)
+                for seg in rest:
+                    seg.parse()
+                segments.extend(rest)
+                units.append(rest)
+                break
+            batch.code = code
+            segments.extend(_PackedSegment(batch, s) for s in range(len(batch)))
+            units.append(batch)
+        result = _PackedResult(code, segments, units)
+        result.semantic_result = _analyze(units, result.parse_tree, pool, render)
+    return result
@@ -0,0 +1,144 @@
+# Prepared Statements
+#
+# A statement run many times with different values is written once with ?
+# or :name parameters in place of its literals. prepare() lexes, parses and
+# checks it a single time, and each parameter takes the type of the column
+# it stands for. bind() then only checks the values given against those
+# types; nothing is lexed, parsed or analyzed again.
+
+from lexer import tokenize_sql
+from parser import Parser
+from semantic import SemanticAnalyzer
+
+# Python types a bound value may have, by the SQL type of its column. As
+# with literals, INT and FLOAT columns take either kind of number
+_ACCEPTED = {
+    "INT": frozenset((int, float)), "FLOAT": frozenset((int, float)), "TEXT": frozenset((str,)),
+    None: frozenset((int, float, str)),
+}
+
+
+class PrepareError(ValueError):
+    """The statement has lexical, syntax or semantic errors, listed in errors."""
+
+    def __init__(self, errors):
+        ValueError.__init__(self, "\n".join(errors))
+        self.errors = errors
+
+
+class BindError(ValueError):
+    """The values do not fit the parameters; errors lists every problem."""
+
+    def __init__(self, errors):
+        ValueError.__init__(self, "\n".join(errors))
+        self.errors = errors
+
+
+class PreparedStatement:
+    """A parsed and checked statement whose parameters are bound per call.
+
+    parameters lists (name, sql_type, line, col) for each parameter in
+    source order: name is None for a ? and the name without its ':' for
+    :name, and sql_type is the type of the column the parameter stands for
+    ("INT", "FLOAT", "TEXT", or None if unknown).
+    """
+
+    def __init__(self, sql, tokens, parse_tree, parameters):
+        self.sql = sql
+        self.tokens = tokens
+        self.parse_tree = parse_tree
+        self.parameters = parameters
+        self.positional = sum(1 for name, _, _, _ in parameters if name is None)
+        self.names = frozenset(name for name, _, _, _ in parameters if name is not None)
+        # Where bind() finds each value: the index of a ? among args, or the
+        # name of a :name among kwargs
+        keys = []
+        k = 0
+        for name, _, _, _ in parameters:
+            if name is None:
+                keys.append((False, k))
+                k += 1
+            else:
+                keys.append((True, name))
+        self._keys = tuple(keys)
+        self._accepted = tuple(_ACCEPTED[sql_type] for _, sql_type, _, _ in parameters)
+
+    def bind(self, *args, **kwargs):
+        """Return the values of the parameters in source order, checked against their types.
+
+        ? parameters take args in order and :name parameters the keyword
+        argument name. Raises BindError if a value is missing, left over or
+        of the wrong type; the type is matched exactly, so True is not an
+        INT.
+        """
+        if len(args) == self.positional and len(kwargs) == len(self.names):
+            try:
+                values = [kwargs[key] if named else args[key] for named, key in self._keys]
+            except KeyError:
+                pass
+            else:
+                for value, accepted in zip(values, self._accepted):
+                    if value.__class__ not in accepted:
+                        break
+                else:
+                    return tuple(values)
+        raise BindError(self._bind_errors(args, kwargs))
+
+    def _bind_errors(self, args, kwargs):
+        errors = []
+        if len(args) != self.positional:
+            errors.append(f"[Bind Error] Statement expects {self.positional} positional values, but {len(args)} were given.")
+        for name in sorted(kwargs.keys() - self.names):
+            errors.append(f"[Bind Error] Statement has no parameter ':{name}'.")
+        k = 0
+        for (name, sql_type, line, col), accepted in zip(self.parameters, self._accepted):
+            if name is None:
+                label = f"{k + 1} (?)"
+                if k >= len(args):
+                    k += 1
+                    continue
+                value = args[k]
+                k += 1
+            else:
+                label = f"':{name}'"
+                if name not in kwargs:
+                    errors.append(f"[Bind Error at Line {line}, Col {col}] No value for parameter {label}.")
+                    continue
+                value = kwargs[name]
+            if value.__class__ not in accepted:
+                expected = sql_type or "INT, FLOAT or TEXT"
+                errors.append(f"[Bind Error at Line {line}, Col {col}] Parameter {label} expects {expected}, but got {value.__class__.__name__}.")
+        return errors
+
+    def __repr__(self):
+        return f"PreparedStatement({self.sql!r})"
+
+
+def prepare(sql, symbol_table=None):
+    """Lex, parse and check sql once, for binding values to its parameters.
+
+    symbol_table ({table: {column: type}}, as SemanticAnalyzer builds it)
+    gives the tables the statement may use besides those it creates itself.
+    Returns a PreparedStatement, or raises PrepareError listing the errors.
+    """
+    tokens = tokenize_sql(sql, "regex")
+    errors = [f"[Line {line}, Col {col}] {message}"
+              for ttype, message, line, col in tokens if ttype == "ERROR"]
+    if errors:
+        raise PrepareError(errors)
+    parser = Parser(tokens)
+    parse_tree = parser.parse_query()
+    if parser.error_messages:
+        raise PrepareError(parser.error_messages)
+    analyzer = SemanticAnalyzer()
+    result = analyzer.analyze(parse_tree, symbol_table)
+    if not result["success"]:
+        raise PrepareError(result["errors"])
+
+    parameter_types = analyzer.parameter_types
+    parameters = []
+    for ttype, value, line, col in tokens:
+        if ttype == "PARAMETER":
+            name = None if value == "?" else value[1:]
+            parameters.append((name, parameter_types.get((line, col)), line, col))
+    return PreparedStatement(sql, tokens, parse_tree, parameters)
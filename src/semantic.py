@@ -1,11 +1,147 @@
 # Semantic Analyzer (Phase 3)
 
+import copy
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from nodes import (CreateStmt, InsertStmt, SelectStmt, UpdateStmt, DeleteStmt, TableRef,
+                   ColumnList, ColumnDef, ColumnRef, TypeName, Literal, ValueList, SelectList, Star,
+                   WhereClause, BoolOp, Comparison, AssignmentList, CREATE_STMT, INSERT_STMT,
+                   SELECT_STMT, UPDATE_STMT, DELETE_STMT, TABLE_REF, COLUMN_LIST, COLUMN_DEF,
+                   TYPE_NAME, COLUMN_REF, LITERAL, VALUE, VALUE_LIST, SELECT_LIST, STAR,
+                   WHERE_CLAUSE, COMPARISON, ASSIGNMENT_LIST, ValueRows, VALUE_ROWS, SQL_TYPES,
+                   InsertBatch, Parameter, PARAMETER, picklable)
+from arena import Arena
+from catalog import Catalog
+from lexer import PARAMETER_KIND
+
+# Statements per batch of analyze_parallel()
+PARALLEL_BATCH_SIZE = 2000
+
+
+class TableSchema:
+    """A table's columns, compiled once for checking statements against it.
+
+    types holds the column types in order and index maps each column name
+    to its position; accepts[j] is the set of literal types column j takes,
+    and rejected_kinds[j] the lexer kinds of the literals it does not.
+    """
+
+    __slots__ = ("name", "types", "index", "accepts", "rejected_kinds")
+
+    def __init__(self, name, columns, is_compatible):
+        self.name = name
+        self.types = tuple(columns.values())
+        self.index = {col_name: j for j, col_name in enumerate(columns)}
+        self.accepts = tuple(frozenset(sql_type for sql_type in SQL_TYPES.values() if is_compatible(col_type, sql_type))
+                             for col_type in self.types)
+        self.rejected_kinds = tuple(tuple(kind for kind, sql_type in SQL_TYPES.items() if sql_type not in accepts)
+                                    for accepts in self.accepts)
+
+
+class ColumnIndex:
+    """Which tables have a column of each name, for columns met without a table.
+
+    owners maps a column name to the names of its tables in the order the
+    tables were indexed; more than one means the name is ambiguous, and the
+    first is the one a column without a table resolves to.
+    """
+
+    __slots__ = ("owners", "size")
+
+    def __init__(self):
+        self.owners = {}
+        # How many tables of the dict passed to update() are indexed
+        self.size = 0
+
+    def update(self, tables):
+        """Index the tables added to the dict tables since the last call.
+
+        Tables must only ever be added to it, so the new ones are its last.
+        """
+        if len(tables) <= self.size:
+            return
+        owners = self.owners
+        for table_name, columns in list(tables.items())[self.size:]:
+            for col_name in columns:
+                if col_name in owners:
+                    owners[col_name].append(table_name)
+                else:
+                    owners[col_name] = [table_name]
+        self.size = len(tables)
+
+
+class SemanticResult(dict):
+    """The result of SemanticAnalyzer.analyze, a dict with keys success, errors and message.
+
+    Its "symbol_table" and "annotated_tree" dumps are rendered the first
+    time they are read, unless analyze() was asked to render them; until
+    then they are not among its keys. write_symbol_table() and
+    write_annotated_tree() stream them to a file instead, a line at a time.
+    The tree must not be changed before the dumps are rendered, and with a
+    Catalog the symbol table dump shows the tables it holds at that time.
+    """
+
+    def __init__(self, analyzer, root, **items):
+        dict.__init__(self, items)
+        self._analyzer = analyzer
+        self._root = root
+
+    def __missing__(self, key):
+        if key == "symbol_table":
+            value = self._analyzer.get_symbol_table_dump()
+        elif key == "annotated_tree":
+            value = "\n".join(self._tree_lines())
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def render(self):
+        """Render both dumps now."""
+        self["symbol_table"]
+        self["annotated_tree"]
+
+    def _tree_lines(self):
+        if isinstance(self._root, Arena):
+            return self._analyzer.iter_arena_tree(self._root)
+        return self._analyzer.iter_annotated_tree(self._root)
+
+    def write_symbol_table(self, fileobj):
+        """Write the symbol table dump to the text file object fileobj, each line ending in a newline."""
+        _write_lines(fileobj, self._analyzer.iter_symbol_table())
+
+    def write_annotated_tree(self, fileobj):
+        """Write the annotated tree dump to the text file object fileobj, each line ending in a newline."""
+        _write_lines(fileobj, self._tree_lines())
+
+
+def _write_lines(fileobj, lines):
+    write = fileobj.write
+    for line in lines:
+        write(line)
+        write("\n")
+
+
 class SemanticAnalyzer:
     def __init__(self):
         # Symbol Table: { table_name: { column_name: data_type } }
         self.symbol_table = {}
         self.errors = []
         self.annotated_tree = None
+        # { (line, col): column type } of every ? or :name parameter whose
+        # column is known; prepared.py checks bound values against these
+        self.parameter_types = {}
+        # { table_name: TableSchema }, compiled on first use
+        self._schemas = {}
+        self._column_index = ColumnIndex()
 
     def error(self, message, line=None, col=None):
         error_msg = f"[Semantic Error"
@@ -18,52 +154,93 @@ class SemanticAnalyzer:
         """Format symbol table as a readable string."""
         if not self.symbol_table:
             return "Symbol Table: (empty)\n"
+        return "\n".join(self.iter_symbol_table())
+
+    def iter_symbol_table(self):
+        """The lines of the symbol table dump."""
+        if not self.symbol_table:
+            yield "Symbol Table: (empty)"
+            return
+
+        yield "=" * 60
+        yield "SYMBOL TABLE"
+        yield "=" * 60
+
+        tables = self._searched_tables()
+        if tables is not self.symbol_table:
+            yield f"({len(tables)} of the {len(self.symbol_table)} tables in the catalog)"
         
-        lines = ["=" * 60]
-        lines.append("SYMBOL TABLE")
-        lines.append("=" * 60)
-        
-        for table_name, columns in self.symbol_table.items():
-            lines.append(f"\nTable: {table_name}")
-            lines.append("-" * 40)
-            lines.append(f"{'Column Name':<20} {'Data Type':<15}")
-            lines.append("-" * 40)
+        for table_name, columns in tables.items():
+            yield f"\nTable: {table_name}"
+            yield "-" * 40
+            yield f"{'Column Name':<20} {'Data Type':<15}"
+            yield "-" * 40
             for col_name, col_type in columns.items():
-                lines.append(f"{col_name:<20} {col_type:<15}")
+                yield f"{col_name:<20} {col_type:<15}"
         
-        lines.append("=" * 60)
-        return "\n".join(lines)
+        yield "=" * 60
+
+    def schema(self, table_name):
+        """The TableSchema of a table, or None if there is no such table.
+
+        Tables are only ever added during an analysis, so a schema is
+        compiled once and kept until the next analyze().
+        """
+        schema = self._schemas.get(table_name)
+        if schema is None and table_name in self.symbol_table:
+            schema = self._schemas[table_name] = TableSchema(table_name, self.symbol_table[table_name],
+                                                              self.is_compatible)
+        return schema
+
+    def _searched_tables(self):
+        """The tables to list or search by column: for a Catalog, only those read or added so far."""
+        if isinstance(self.symbol_table, Catalog):
+            return self.symbol_table.loaded()
+        return self.symbol_table
+
+    def column_tables(self, col_name):
+        """The searched tables with a column col_name, in the order they were added.
+
+        A column without a table resolves to the first; more than one makes
+        the name ambiguous.
+        """
+        index = self._column_index
+        index.update(self._searched_tables())
+        return tuple(index.owners.get(col_name, ()))
 
     def annotate_node(self, node, table_context=None):
         """Annotate a single node with semantic information (non-destructive)."""
         annotations = {}
         
         # Annotate based on node type
-        if node.rule.startswith("Type: "):
-            type_val = node.rule.split(": ")[1]
+        if isinstance(node, TypeName):
+            type_val = node.text
             annotations['semantic_type'] = type_val
         
-        elif node.rule.startswith("Col: "):
-            col_name = node.rule.split(": ")[1]
+        elif isinstance(node, (ColumnDef, ColumnRef)):
+            col_name = node.text
             # Try to find column type in symbol table
             if table_context and table_context in self.symbol_table:
                 if col_name in self.symbol_table[table_context]:
                     annotations['semantic_type'] = self.symbol_table[table_context][col_name]
                     annotations['symbol_ref'] = f"{table_context}.{col_name}"
             else:
-                # Search all tables if no context
-                for tbl_name, columns in self.symbol_table.items():
-                    if col_name in columns:
-                        annotations['semantic_type'] = columns[col_name]
-                        annotations['symbol_ref'] = f"{tbl_name}.{col_name}"
-                        break
+                # Resolve through the column index if no context
+                owners = self.column_tables(col_name)
+                if owners:
+                    tbl_name = owners[0]
+                    annotations['semantic_type'] = self._searched_tables()[tbl_name][col_name]
+                    annotations['symbol_ref'] = f"{tbl_name}.{col_name}"
         
-        elif node.rule.startswith("Value: ") or node.rule.startswith("Val: "):
-            val_text = node.rule.split(": ")[1]
-            annotations['semantic_type'] = self.get_literal_type(val_text)
+        elif isinstance(node, Literal):
+            annotations['semantic_type'] = node.sql_type
+
+        elif isinstance(node, Parameter):
+            if (node.line, node.col) in self.parameter_types:
+                annotations['semantic_type'] = self.parameter_types[(node.line, node.col)]
         
-        elif node.rule.startswith("Table: "):
-            table_name = node.rule.split(": ")[1]
+        elif isinstance(node, TableRef):
+            table_name = node.text
             if table_name in self.symbol_table:
                 annotations['symbol_ref'] = table_name
         
@@ -71,81 +248,188 @@ class SemanticAnalyzer:
 
     def get_annotated_tree_string(self, node, indent=0, prefix="", table_context=None):
         """Generate a text representation of parse tree with semantic annotations."""
+        return "\n".join(self.iter_annotated_tree(node, indent, prefix, table_context))
+
+    def iter_annotated_tree(self, node, indent=0, prefix="", table_context=None):
+        """The lines of get_annotated_tree_string, one node each, in source order."""
         if not node:
-            return ""
-        
-        lines = []
-        
-        # Extract table context from current node if it's a table reference
-        if node.rule.startswith("Table: "):
-            table_context = node.rule.split(": ")[1]
+            return
         
-        # Get annotations for this node
-        annotations = self.annotate_node(node, table_context)
-        
-        # Build node information
-        node_info = prefix + node.rule
-        ann_parts = []
-        
-        if 'semantic_type' in annotations:
-            ann_parts.append(f"Type: {annotations['semantic_type']}")
-        if 'symbol_ref' in annotations:
-            ann_parts.append(f"Ref: {annotations['symbol_ref']}")
-        
-        if ann_parts:
-            node_info += f"  [{', '.join(ann_parts)}]"
-        
-        lines.append("  " * indent + node_info)
-        
-        # Recursively print children
-        for i, child in enumerate(node.children):
-            is_last = (i == len(node.children) - 1)
-            child_prefix = "└─ " if is_last else "├─ "
-            lines.append(self.get_annotated_tree_string(child, indent + 1, child_prefix, table_context))
-        
-        return "\n".join(lines)
+        # Explicit stack of (node, indent, prefix, table context), so deep
+        # condition trees do not hit the recursion limit
+        stack = [(node, indent, prefix, table_context)]
+        while stack:
+            node, indent, prefix, table_context = stack.pop()
+
+            # Extract table context from current node if it's a table reference
+            if isinstance(node, TableRef):
+                table_context = node.text
+
+            # Get annotations for this node
+            annotations = self.annotate_node(node, table_context)
+
+            # Build node information
+            node_info = prefix + node.rule
+            ann_parts = []
 
-    def analyze(self, root):
-        """Perform semantic analysis and return structured results."""
+            if 'semantic_type' in annotations:
+                ann_parts.append(f"Type: {annotations['semantic_type']}")
+            if 'symbol_ref' in annotations:
+                ann_parts.append(f"Ref: {annotations['symbol_ref']}")
+
+            if ann_parts:
+                node_info += f"  [{', '.join(ann_parts)}]"
+
+            yield "  " * indent + node_info
+
+            # Children go on the stack last first, to come off in order
+            children = node.children
+            last = len(children) - 1
+            for i in range(last, -1, -1):
+                child_prefix = "└─ " if i == last else "├─ "
+                stack.append((children[i], indent + 1, child_prefix, table_context))
+
+    def _reset(self, root, symbol_table):
         self.errors = []
-        self.symbol_table = {}  # Reset for each analysis
+        if isinstance(symbol_table, Catalog):
+            self.symbol_table = symbol_table
+        elif symbol_table:
+            self.symbol_table = {name: dict(columns) for name, columns in symbol_table.items()}
+        else:
+            self.symbol_table = {}
+        self.parameter_types = {}
+        self._schemas = {}
+        self._column_index = ColumnIndex()
         self.annotated_tree = root
+
+    def _handlers(self):
+        """The check of each statement class."""
+        return {
+            CreateStmt: self.analyze_create,
+            InsertStmt: self.analyze_insert,
+            SelectStmt: self.analyze_select,
+            UpdateStmt: self.analyze_update,
+            DeleteStmt: self.analyze_delete,
+            InsertBatch: self.analyze_batch,
+        }
+
+    def analyze(self, root, symbol_table=None, render=False):
+        """Perform semantic analysis and return structured results.
+
+        Tables in symbol_table, if given, are known from the start, as if
+        created before the script. A Catalog (see catalog.py) is used in
+        place, and the tables the script creates are added to it, so that
+        only new statements need checking against a saved schema.
+
+        Returns a SemanticResult. Its symbol table and annotated tree dumps
+        are rendered only when read, or right away with render set.
+        """
+        # Reset for each analysis
+        self._reset(root, symbol_table)
         
         if not root:
-            return {
-                "success": False,
-                "errors": ["No parse tree provided"],
-                "symbol_table": "",
-                "annotated_tree": "",
-                "message": "✖ Semantic Analysis Failed. No parse tree."
-            }
+            return SemanticResult(self, root,
+                success=False,
+                errors=["No parse tree provided"],
+                symbol_table="",
+                annotated_tree="",
+                message="✖ Semantic Analysis Failed. No parse tree."
+            )
+
+        if isinstance(root, Arena):
+            self._analyze_arena(root)
+            return self._result(root, render)
 
         # Phase 1: Build symbol table and check semantics
+        handlers = self._handlers()
         for stmt in root.children:
-            if stmt.rule == "CreateStmt":
-                self.analyze_create(stmt)
-            elif stmt.rule == "InsertStmt":
-                self.analyze_insert(stmt)
-            elif stmt.rule == "SelectStmt":
-                self.analyze_select(stmt)
-            elif stmt.rule == "UpdateStmt":
-                self.analyze_update(stmt)
-            elif stmt.rule == "DeleteStmt":
-                self.analyze_delete(stmt)
+            handler = handlers.get(stmt.__class__)
+            if handler:
+                handler(stmt)
         
         # Phase 2: Generate outputs
+        return self._result(root, render)
+
+    def analyze_parallel(self, root, symbol_table=None, render=False, workers=None,
+                         batch_size=PARALLEL_BATCH_SIZE):
+        """Analyze like analyze(), checking all but CREATE TABLE statements in worker processes.
+
+        The CREATE TABLE statements are applied first, in order, noting
+        which statement created each table. The other statements are then
+        checked in batches of batch_size by up to workers processes
+        (default: one per CPU), against a read-only snapshot of the tables
+        they use; each statement sees only the tables created before it. The
+        errors are merged back in statement order, so the result is the one
+        analyze() gives. Arena trees, scripts of a single batch and runs
+        with one worker are analyzed in this process.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or not root or isinstance(root, Arena) or len(root.children) <= batch_size:
+            return self.analyze(root, symbol_table, render)
+        self._reset(root, symbol_table)
+        tables = self.symbol_table
+        # Errors by statement index, the index of the statement that created
+        # each table, and the tables the other statements are checked against
+        errors = {}
+        created = {}
+        snapshot = {}
+        statements = []
+        for k, stmt in enumerate(root.children):
+            cls = stmt.__class__
+            if cls is CreateStmt:
+                self._create_at(stmt, k, errors, created)
+            elif cls in _CHECKED_IN_WORKERS:
+                statements.append(k)
+                # Tables are read now, in the order analyze() reads them, so
+                # a Catalog decodes the same ones; a DELETE without WHERE
+                # only needs to know the table exists
+                table_name = _statement_table(stmt)
+                if table_name in tables and snapshot.get(table_name) is None:
+                    if cls is DeleteStmt and not any(isinstance(child, WhereClause) for child in stmt.children):
+                        snapshot[table_name] = None
+                    else:
+                        snapshot[table_name] = tables[table_name]
+
+        if len(statements) <= batch_size:
+            results = [_check_batch(statements, root.children, _snapshot_analyzer(snapshot, created))]
+        else:
+            # Workers get the statements once, when they start, and then
+            # only the indexes of those to check
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(_Statements(root.children), snapshot, created)) as pool:
+                results = list(pool.map(_check_batch, [statements[i:i + batch_size]
+                                                       for i in range(0, len(statements), batch_size)]))
+        self._merge_checks(errors, results)
+        return self._result(root, render)
+
+    def _create_at(self, stmt, k, errors, created):
+        """Apply the CREATE TABLE statement at index k, noting its errors and the table it created."""
+        count = len(self.symbol_table)
+        self.analyze_create(stmt)
+        if len(self.symbol_table) > count:
+            created[_statement_table(stmt)] = k
+        if self.errors:
+            errors[k] = self.errors
+            self.errors = []
+
+    def _merge_checks(self, errors, results):
+        """Merge the (errors, parameter types) of checked batches with errors by statement index."""
+        for batch_errors, parameter_types in results:
+            errors.update(batch_errors)
+            self.parameter_types.update(parameter_types)
+        self.errors = [error for k in sorted(errors) for error in errors[k]]
+
+    def _result(self, root, render):
         success = len(self.errors) == 0
-        symbol_table_dump = self.get_symbol_table_dump()
-        annotated_tree_str = self.get_annotated_tree_string(root)
-        
-        result = {
-            "success": success,
-            "errors": self.errors,
-            "symbol_table": symbol_table_dump,
-            "annotated_tree": annotated_tree_str,
-            "message": "✓ Semantic Analysis Successful. Query is valid." if success else "✖ Semantic Analysis Failed. Errors detected."
-        }
-        
+        # The dumps are rendered from a copy of the analyzer, which keeps this
+        # analysis' tables and parameter types if another one is run
+        result = SemanticResult(copy.copy(self), root,
+            success=success,
+            errors=self.errors,
+            message="✓ Semantic Analysis Successful. Query is valid." if success else "✖ Semantic Analysis Failed. Errors detected."
+        )
+        if render:
+            result.render()
         return result
 
     def analyze_create(self, node):
@@ -153,17 +437,17 @@ class SemanticAnalyzer:
         columns = {}
 
         for child in node.children:
-            if child.rule.startswith("Table: "):
-                table_name = child.rule.split(": ")[1]
+            if isinstance(child, TableRef):
+                table_name = child.text
                 if table_name in self.symbol_table:
                     self.error(f"Table '{table_name}' already exists.", child.line, child.col)
-            elif child.rule == "ColumnList":
+            elif isinstance(child, ColumnList):
                 for col_node in child.children:
-                    col_name = col_node.rule.split(": ")[1]
+                    col_name = col_node.text
                     col_type = None
                     for type_node in col_node.children:
-                        if type_node.rule.startswith("Type: "):
-                            col_type = type_node.rule.split(": ")[1]
+                        if isinstance(type_node, TypeName):
+                            col_type = type_node.text
 
                     if col_name in columns:
                         self.error(f"Column '{col_name}' is redeclared in table '{table_name}'.", col_node.line, col_node.col)
@@ -178,120 +462,183 @@ class SemanticAnalyzer:
 
     def analyze_insert(self, node):
         table_name = None
-        values = []
+        values = ()
 
         for child in node.children:
-            if child.rule.startswith("Table: "):
-                table_name = child.rule.split(": ")[1]
+            if isinstance(child, TableRef):
+                table_name = child.text
                 if table_name not in self.symbol_table:
                     self.error(f"Table '{table_name}' does not exist.", child.line, child.col)
                     return
-            elif child.rule == "ValueList":
-                for val_node in child.children:
-                    val_text = val_node.rule.split(": ")[1]
-                    # Determine type of literal
-                    if val_text.startswith("'"):
-                        val_type = "TEXT"
-                    elif "." in val_text:
-                        val_type = "FLOAT"
+            elif isinstance(child, ValueList):
+                values = child.children
+            elif isinstance(child, ValueRows):
+                self.analyze_rows(table_name, child)
+                return
+
+        schema = self.schema(table_name)
+        if schema is not None:
+            if len(values) != len(schema.types):
+                self.error(f"INSERT into '{table_name}' expects {len(schema.types)} values, but {len(values)} were provided.", node.line, node.col)
+            else:
+                for i, (accepts, val_node) in enumerate(zip(schema.accepts, values)):
+                    val_type = val_node.sql_type
+                    if val_type in accepts:
+                        continue
+                    if val_type is None:
+                        self.parameter_types[(val_node.line, val_node.col)] = schema.types[i]
                     else:
-                        val_type = "INT"
-                    values.append((val_type, val_node.line, val_node.col))
+                        self.error(f"Type mismatch: Column {i+1} of '{table_name}' expects {schema.types[i]}, but got {val_type}.", val_node.line, val_node.col)
 
-        if table_name in self.symbol_table:
-            expected_cols = self.symbol_table[table_name]
-            if len(values) != len(expected_cols):
-                self.error(f"INSERT into '{table_name}' expects {len(expected_cols)} values, but {len(values)} were provided.", node.line, node.col)
+    def analyze_batch(self, node):
+        """Check a run of single-row INSERTs with the errors analyze_insert gives for each."""
+        table_name = node.table
+        if table_name not in self.symbol_table:
+            for line, col in zip(node.table_lines, node.table_cols):
+                self.error(f"Table '{table_name}' does not exist.", line, col)
+            return
+        expected = len(self.schema(table_name).types)
+        width = len(node.rows.row(0))
+        if width != expected:
+            for _ in node.table_lines:
+                self.error(f"INSERT into '{table_name}' expects {expected} values, but {width} were provided.", None, None)
+            return
+        self.analyze_rows(table_name, node.rows)
+
+    def analyze_rows(self, table_name, rows):
+        """Check all rows of a multi-row INSERT against the table's columns.
+
+        When every row has one value per column, each column is checked as
+        a whole: kinds[j::width] is column j, and only a column holding a
+        literal kind its type does not accept is scanned value by value.
+        """
+        schema = self.schema(table_name)
+        col_types = schema.types
+        width = len(col_types)
+        ends = rows.row_ends
+        if ends == array('I', range(width, width * len(ends) + 1, width)):
+            mismatched = []
+            for j, expected_type in enumerate(col_types):
+                rejected = schema.rejected_kinds[j]
+                column = rows.kinds[j::width]
+                if any(kind in column for kind in rejected):
+                    mismatched.extend(j + r * width for r, kind in enumerate(column) if kind in rejected)
+                if PARAMETER_KIND in column:
+                    for r, kind in enumerate(column):
+                        if kind == PARAMETER_KIND:
+                            i = j + r * width
+                            self.parameter_types[(rows.lines[i], rows.cols[i])] = expected_type
+            mismatched.sort()
+            for i in mismatched:
+                self._row_type_error(table_name, rows, i, i % width, col_types)
+            return
+
+        start = 0
+        for r, end in enumerate(ends):
+            if end - start != width:
+                self.error(f"INSERT into '{table_name}' expects {width} values, but row {r+1} has {end - start}.", rows.lines[start], rows.cols[start])
             else:
-                col_types = list(expected_cols.values())
-                for i, (val_type, v_line, v_col) in enumerate(values):
-                    expected_type = col_types[i]
-                    if not self.is_compatible(expected_type, val_type):
-                        self.error(f"Type mismatch: Column {i+1} of '{table_name}' expects {expected_type}, but got {val_type}.", v_line, v_col)
+                for j, expected_type in enumerate(col_types):
+                    val_type = rows.sql_type(start + j)
+                    if val_type is None:
+                        self.parameter_types[(rows.lines[start + j], rows.cols[start + j])] = expected_type
+                    elif val_type not in schema.accepts[j]:
+                        self._row_type_error(table_name, rows, start + j, j, col_types)
+            start = end
+
+    def _row_type_error(self, table_name, rows, i, j, col_types):
+        self.error(f"Type mismatch: Column {j+1} of '{table_name}' expects {col_types[j]}, but got {rows.sql_type(i)}.", rows.lines[i], rows.cols[i])
 
     def analyze_select(self, node):
         table_name = None
 
         for child in node.children:
-            if child.rule.startswith("Table: "):
-                table_name = child.rule.split(": ")[1]
+            if isinstance(child, TableRef):
+                table_name = child.text
                 if table_name not in self.symbol_table:
                     self.error(f"Table '{table_name}' does not exist.", child.line, child.col)
                     return
 
         if table_name in self.symbol_table:
-            table_cols = self.symbol_table[table_name]
+            columns = self.schema(table_name).index
             for child in node.children:
-                if child.rule == "SelectList":
+                if isinstance(child, SelectList):
                     for col_node in child.children:
-                        if col_node.rule == "*":
+                        if isinstance(col_node, Star):
                             continue
-                        col_name = col_node.rule.split(": ")[1]
-                        if col_name not in table_cols:
+                        col_name = col_node.text
+                        if col_name not in columns:
                             self.error(f"Column '{col_name}' does not exist in table '{table_name}'.", col_node.line, col_node.col)
-                elif child.rule == "WhereClause":
+                elif isinstance(child, WhereClause):
                     self.analyze_where(child, table_name)
 
     def analyze_update(self, node):
         table_name = None
         for child in node.children:
-            if child.rule.startswith("Table: "):
-                table_name = child.rule.split(": ")[1]
+            if isinstance(child, TableRef):
+                table_name = child.text
                 if table_name not in self.symbol_table:
                     self.error(f"Table '{table_name}' does not exist.", child.line, child.col)
                     return
 
         if table_name in self.symbol_table:
-            table_cols = self.symbol_table[table_name]
+            schema = self.schema(table_name)
             for child in node.children:
-                if child.rule == "AssignmentList":
+                if isinstance(child, AssignmentList):
                     for assign in child.children:
                         col_node = assign.children[0]
                         val_node = assign.children[1]
-                        col_name = col_node.rule.split(": ")[1]
-                        val_text = val_node.rule.split(": ")[1]
+                        col_name = col_node.text
 
-                        if col_name not in table_cols:
+                        j = schema.index.get(col_name)
+                        if j is None:
                             self.error(f"Column '{col_name}' does not exist in table '{table_name}'.", col_node.line, col_node.col)
                         else:
-                            expected_type = table_cols[col_name]
-                            val_type = self.get_literal_type(val_text)
-                            if not self.is_compatible(expected_type, val_type):
+                            expected_type = schema.types[j]
+                            val_type = val_node.sql_type
+                            if val_type is None:
+                                self.parameter_types[(val_node.line, val_node.col)] = expected_type
+                            elif val_type not in schema.accepts[j]:
                                 self.error(f"Type mismatch in UPDATE: Column '{col_name}' ({expected_type}) cannot be assigned {val_type}.", val_node.line, val_node.col)
-                elif child.rule == "WhereClause":
+                elif isinstance(child, WhereClause):
                     self.analyze_where(child, table_name)
 
     def analyze_delete(self, node):
         table_name = None
         for child in node.children:
-            if child.rule.startswith("Table: "):
-                table_name = child.rule.split(": ")[1]
+            if isinstance(child, TableRef):
+                table_name = child.text
                 if table_name not in self.symbol_table:
                     self.error(f"Table '{table_name}' does not exist.", child.line, child.col)
                     return
 
         if table_name in self.symbol_table:
             for child in node.children:
-                if child.rule == "WhereClause":
+                if isinstance(child, WhereClause):
                     self.analyze_where(child, table_name)
 
     def analyze_where(self, node, table_name):
-        for child in node.children:
-            if child.rule in ["AND", "OR", "NOT"]:
-                self.analyze_where(child, table_name)
-            elif child.rule == "Comparison":
+        schema = self.schema(table_name)
+        # Comparisons in source order, found with an explicit stack
+        stack = list(reversed(node.children))
+        while stack:
+            child = stack.pop()
+            if isinstance(child, BoolOp):
+                stack.extend(reversed(child.children))
+            elif isinstance(child, Comparison):
                 col_node = child.children[0]
                 val_node = child.children[2]
-                col_name = col_node.rule.split(": ")[1]
-                val_text = val_node.rule.split(": ")[1]
+                col_name = col_node.text
 
-                table_cols = self.symbol_table[table_name]
-                if col_name not in table_cols:
+                j = schema.index.get(col_name)
+                if j is None:
                     self.error(f"Column '{col_name}' does not exist in table '{table_name}'.", col_node.line, col_node.col)
                 else:
-                    col_type = table_cols[col_name]
-                    val_type = self.get_literal_type(val_text)
-                    if not self.is_compatible(col_type, val_type):
+                    col_type = schema.types[j]
+                    val_type = val_node.sql_type
+                    if val_type is None:
+                        self.parameter_types[(val_node.line, val_node.col)] = col_type
+                    elif val_type not in schema.accepts[j]:
                         self.error(f"Type mismatch in WHERE: Cannot compare {col_type} column '{col_name}' with {val_type} literal.", val_node.line, val_node.col)
 
     def get_literal_type(self, text):
@@ -307,3 +654,277 @@ class SemanticAnalyzer:
         if type1 in ["INT", "FLOAT"] and type2 in ["INT", "FLOAT"]:
             return True
         return False
+
+    # Arena trees
+    #
+    # The same checks for trees built with Parser(tokens, arena=True), reading
+    # the arena's arrays instead of node objects; messages and their order
+    # match the methods above.
+
+    def _analyze_arena(self, arena):
+        handlers = {
+            CREATE_STMT: self._arena_create,
+            INSERT_STMT: self._arena_insert,
+            SELECT_STMT: self._arena_select,
+            UPDATE_STMT: self._arena_update,
+            DELETE_STMT: self._arena_delete,
+        }
+        kinds = arena.kinds
+        for stmt in arena.children(arena.root):
+            handler = handlers.get(kinds[stmt])
+            if handler:
+                handler(arena, stmt)
+
+    def get_arena_tree_string(self, arena):
+        """The annotated tree dump of an arena tree, built without recursion."""
+        return "\n".join(self.iter_arena_tree(arena))
+
+    def iter_arena_tree(self, arena):
+        """The lines of get_arena_tree_string."""
+        kinds, next_sibling = arena.kinds, arena.next_sibling
+        for n, depth in arena.walk():
+            kind = kinds[n]
+            node_info = arena.rule(n)
+            if depth:
+                node_info = ("└─ " if next_sibling[n] < 0 else "├─ ") + node_info
+            ann_parts = []
+            if kind == TYPE_NAME:
+                ann_parts.append(f"Type: {arena.text(n)}")
+            elif kind == COLUMN_DEF or kind == COLUMN_REF:
+                col_name = arena.text(n)
+                owners = self.column_tables(col_name)
+                if owners:
+                    ann_parts.append(f"Type: {self._searched_tables()[owners[0]][col_name]}")
+                    ann_parts.append(f"Ref: {owners[0]}.{col_name}")
+            elif kind == LITERAL or kind == VALUE:
+                ann_parts.append(f"Type: {arena.sql_type(n)}")
+            elif kind == PARAMETER:
+                position = (arena.line(n), arena.col(n))
+                if position in self.parameter_types:
+                    ann_parts.append(f"Type: {self.parameter_types[position]}")
+            elif kind == TABLE_REF:
+                table_name = arena.text(n)
+                if table_name in self.symbol_table:
+                    ann_parts.append(f"Ref: {table_name}")
+            if ann_parts:
+                node_info += f"  [{', '.join(ann_parts)}]"
+            yield "  " * depth + node_info
+
+    def _arena_table(self, arena, node):
+        """The table name of a statement, or None after reporting an unknown table."""
+        for child in arena.children(node):
+            if arena.kinds[child] == TABLE_REF:
+                table_name = arena.text(child)
+                if table_name not in self.symbol_table:
+                    self.error(f"Table '{table_name}' does not exist.", arena.line(child), arena.col(child))
+                    return None
+                return table_name
+        return None
+
+    def _arena_create(self, arena, node):
+        kinds = arena.kinds
+        table_name = None
+        columns = {}
+
+        for child in arena.children(node):
+            kind = kinds[child]
+            if kind == TABLE_REF:
+                table_name = arena.text(child)
+                if table_name in self.symbol_table:
+                    self.error(f"Table '{table_name}' already exists.", arena.line(child), arena.col(child))
+            elif kind == COLUMN_LIST:
+                for col_node in arena.children(child):
+                    col_name = arena.text(col_node)
+                    col_type = None
+                    for type_node in arena.children(col_node):
+                        if kinds[type_node] == TYPE_NAME:
+                            col_type = arena.text(type_node)
+
+                    if col_name in columns:
+                        self.error(f"Column '{col_name}' is redeclared in table '{table_name}'.", arena.line(col_node), arena.col(col_node))
+
+                    if col_type not in ["INT", "FLOAT", "TEXT"]:
+                        self.error(f"Invalid data type '{col_type}' for column '{col_name}'.", arena.line(col_node), arena.col(col_node))
+
+                    columns[col_name] = col_type
+
+        if table_name and table_name not in self.symbol_table:
+            self.symbol_table[table_name] = columns
+
+    def _arena_insert(self, arena, node):
+        table_name = self._arena_table(arena, node)
+        if table_name is None:
+            return
+        values = []
+        for child in arena.children(node):
+            if arena.kinds[child] == VALUE_LIST:
+                values.extend(arena.children(child))
+            elif arena.kinds[child] == VALUE_ROWS:
+                self.analyze_rows(table_name, arena.rows[arena.slots[child]])
+                return
+
+        schema = self.schema(table_name)
+        if len(values) != len(schema.types):
+            self.error(f"INSERT into '{table_name}' expects {len(schema.types)} values, but {len(values)} were provided.", arena.line(node), arena.col(node))
+        else:
+            for i, (expected_type, val_node) in enumerate(zip(schema.types, values)):
+                val_type = arena.sql_type(val_node)
+                if val_type in schema.accepts[i]:
+                    continue
+                if val_type is None:
+                    self.parameter_types[(arena.line(val_node), arena.col(val_node))] = expected_type
+                else:
+                    self.error(f"Type mismatch: Column {i+1} of '{table_name}' expects {expected_type}, but got {val_type}.", arena.line(val_node), arena.col(val_node))
+
+    def _arena_select(self, arena, node):
+        table_name = self._arena_table(arena, node)
+        if table_name is None:
+            return
+        kinds = arena.kinds
+        columns = self.schema(table_name).index
+        for child in arena.children(node):
+            kind = kinds[child]
+            if kind == SELECT_LIST:
+                for col_node in arena.children(child):
+                    if kinds[col_node] == STAR:
+                        continue
+                    col_name = arena.text(col_node)
+                    if col_name not in columns:
+                        self.error(f"Column '{col_name}' does not exist in table '{table_name}'.", arena.line(col_node), arena.col(col_node))
+            elif kind == WHERE_CLAUSE:
+                self._arena_where(arena, child, table_name)
+
+    def _arena_update(self, arena, node):
+        table_name = self._arena_table(arena, node)
+        if table_name is None:
+            return
+        kinds = arena.kinds
+        schema = self.schema(table_name)
+        for child in arena.children(node):
+            kind = kinds[child]
+            if kind == ASSIGNMENT_LIST:
+                for assign in arena.children(child):
+                    col_node = arena.first_child[assign]
+                    val_node = arena.next_sibling[col_node]
+                    col_name = arena.text(col_node)
+
+                    j = schema.index.get(col_name)
+                    if j is None:
+                        self.error(f"Column '{col_name}' does not exist in table '{table_name}'.", arena.line(col_node), arena.col(col_node))
+                    else:
+                        expected_type = schema.types[j]
+                        val_type = arena.sql_type(val_node)
+                        if val_type is None:
+                            self.parameter_types[(arena.line(val_node), arena.col(val_node))] = expected_type
+                        elif val_type not in schema.accepts[j]:
+                            self.error(f"Type mismatch in UPDATE: Column '{col_name}' ({expected_type}) cannot be assigned {val_type}.", arena.line(val_node), arena.col(val_node))
+            elif kind == WHERE_CLAUSE:
+                self._arena_where(arena, child, table_name)
+
+    def _arena_delete(self, arena, node):
+        table_name = self._arena_table(arena, node)
+        if table_name is None:
+            return
+        for child in arena.children(node):
+            if arena.kinds[child] == WHERE_CLAUSE:
+                self._arena_where(arena, child, table_name)
+
+    def _arena_where(self, arena, node, table_name):
+        # walk() reaches the comparisons in source order, without recursion
+        kinds = arena.kinds
+        schema = self.schema(table_name)
+        for n, _ in arena.walk(node):
+            if kinds[n] != COMPARISON:
+                continue
+            col_node = arena.first_child[n]
+            val_node = arena.child(n, 2)
+            col_name = arena.text(col_node)
+
+            j = schema.index.get(col_name)
+            if j is None:
+                self.error(f"Column '{col_name}' does not exist in table '{table_name}'.", arena.line(col_node), arena.col(col_node))
+            else:
+                col_type = schema.types[j]
+                val_type = arena.sql_type(val_node)
+                if val_type is None:
+                    self.parameter_types[(arena.line(val_node), arena.col(val_node))] = col_type
+                elif val_type not in schema.accepts[j]:
+                    self.error(f"Type mismatch in WHERE: Cannot compare {col_type} column '{col_name}' with {val_type} literal.", arena.line(val_node), arena.col(val_node))
+
+
+# Parallel analysis (see SemanticAnalyzer.analyze_parallel)
+
+_CHECKED_IN_WORKERS = frozenset((InsertStmt, SelectStmt, UpdateStmt, DeleteStmt, InsertBatch))
+
+
+def _statement_table(stmt):
+    """The name of the table a statement is on, or None."""
+    if isinstance(stmt, InsertBatch):
+        return stmt.table
+    for child in stmt.children:
+        if isinstance(child, TableRef):
+            return child.text
+    return None
+
+
+class _Statements(list):
+    """The statements of a tree, for starting worker processes.
+
+    Forked workers inherit them as they are; otherwise they are pickled,
+    with statements too deep for the pickler flattened.
+    """
+
+    def __reduce__(self):
+        return list, ([picklable(stmt) for stmt in self],)
+
+
+class _TablesBefore(dict):
+    """A snapshot of tables that hides those created at or after statement limit.
+
+    created maps a table to the index of the statement that created it;
+    tables not in it were known before the script.
+    """
+
+    def __init__(self, tables, created):
+        dict.__init__(self, tables)
+        self.created = created
+        self.limit = 0
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) and self.created.get(name, -1) < self.limit
+
+
+# The statements and analyzer of a worker process, set up by _init_worker
+_worker = None
+
+
+def _snapshot_analyzer(tables, created):
+    analyzer = SemanticAnalyzer()
+    analyzer.symbol_table = _TablesBefore(tables, created)
+    return analyzer
+
+
+def _init_worker(statements, tables, created):
+    global _worker
+    _worker = (statements, _snapshot_analyzer(tables, created))
+
+
+def _check_batch(indexes, statements=None, analyzer=None):
+    """Check the statements at indexes; returns their errors by index and the parameter types found.
+
+    statements and analyzer default to the worker's.
+    """
+    if analyzer is None:
+        statements, analyzer = _worker
+    analyzer.parameter_types = {}
+    visible = analyzer.symbol_table
+    handlers = analyzer._handlers()
+    errors = {}
+    for k in indexes:
+        stmt = statements[k]
+        visible.limit = k
+        analyzer.errors = []
+        handlers[stmt.__class__](stmt)
+        if analyzer.errors:
+            errors[k] = analyzer.errors
+    return errors, analyzer.parameter_types
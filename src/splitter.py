@@ -0,0 +1,192 @@
+# Statement Splitter
+#
+# A cheap pre-pass that finds the top-level ';' ending each statement without
+# tokenizing the script. Only string literals, comments and parentheses are
+# looked at, so a ';' inside '...', -- ..., /* ... */ or ( ... ) does not end
+# a statement.
+
+import re
+from bisect import bisect_right
+
+_BOUNDARY = re.compile(r"'[^'\n]*'?|--|/\*|[;()]")
+_BOUNDARY_BYTES = re.compile(rb"'[^'\n]*'?|--|/\*|[;()]")
+_START = re.compile(r"[^ \t\r\n]")
+_START_BYTES = re.compile(rb"[^ \t\r\n]")
+_CONTINUATION_BYTES = re.compile(rb"[\x80-\xbf]")
+
+# A whole statement free of comments and nested parentheses, matched in one
+# go; anything else falls back to the scan over _BOUNDARY matches
+_SIMPLE = r"""
+    [ \t\r\n]*
+    ( (?: [^'()\-/;] | '[^'\n]*' | -(?!-) | /(?!\*)
+        | \( (?: [^'()\-/;] | '[^'\n]*' | -(?!-) | /(?!\*) )* \)
+      )* ; )
+"""
+_SIMPLE_STATEMENT = re.compile(_SIMPLE, re.VERBOSE)
+_SIMPLE_STATEMENT_BYTES = re.compile(_SIMPLE.encode(), re.VERBOSE)
+
+
+class Statement:
+    """Where one statement sits in the script.
+
+    start and end are offsets into the script (bytes when it was split as
+    bytes): start is the first character of the statement's first token and
+    end is just past its ';', or the end of the script for an unterminated
+    last statement. line and col locate the first token, end_line and
+    end_col the last ';' (or the end of the script), using the lexer's line
+    and column numbering.
+    """
+
+    __slots__ = ("start", "end", "line", "col", "end_line", "end_col")
+
+    def __init__(self, start, end, line, col, end_line, end_col):
+        self.start = start
+        self.end = end
+        self.line = line
+        self.col = col
+        self.end_line = end_line
+        self.end_col = end_col
+
+    def contains(self, line, col):
+        """Whether the (line, col) position lies within the statement."""
+        return (self.line, self.col) <= (line, col) <= (self.end_line, self.end_col)
+
+    def __repr__(self):
+        return f"Statement({self.start}, {self.end}, line={self.line}, col={self.col})"
+
+
+def _advance(code, newline, synced, target, line, base):
+    """Line and column base at target, given them at synced."""
+    newlines = code.count(newline, synced, target)
+    if newlines:
+        return line + newlines, code.rfind(newline, synced, target)
+    return line, base
+
+
+def split_statements(code):
+    """Split a script into statements and return them as Statement objects.
+
+    code may be a str, or bytes or an mmap holding UTF-8; offsets then count
+    bytes while columns still count characters. The boundaries agree with
+    the lexer on well-formed input: each Statement covers exactly the tokens
+    from one statement's first token through its ';'. Statements are split
+    at every ';' outside parentheses, so ';;' gives a statement holding a
+    lone ';'. An unclosed comment or parenthesis runs to the end of the
+    script.
+    """
+    if isinstance(code, str):
+        boundary, start_re, simple, newline = _BOUNDARY, _START, _SIMPLE_STATEMENT, '\n'
+        comment, line_comment, comment_end = '/*', '--', '*/'
+    else:
+        boundary, start_re, simple, newline = _BOUNDARY_BYTES, _START_BYTES, _SIMPLE_STATEMENT_BYTES, b'\n'
+        comment, line_comment, comment_end = b'/*', b'--', b'*/'
+    length = len(code)
+    statements = []
+    # Column of offset i is i - base, as in the lexer's scan state
+    line, base, synced = 1, -1, 0
+    pos = 0
+
+    while True:
+        m = simple.match(code, pos)
+        if m is not None:
+            # Fast path: blanks, then a statement without comments or nesting
+            start, end = m.span(1)
+            line, base = _advance(code, newline, synced, start, line, base)
+            start_line, start_col = line, _column(code, start, base)
+            synced = end - 1
+            line, base = _advance(code, newline, start, synced, line, base)
+            statements.append(Statement(start, end, start_line, start_col, line, _column(code, synced, base)))
+            pos = end
+            continue
+
+        # Skip blanks and comments up to the next statement's first token
+        m = start_re.search(code, pos)
+        if m is None:
+            return statements
+        i = m.start()
+        if code[i:i + 2] == line_comment:
+            pos = code.find(newline, i)
+            if pos == -1:
+                return statements
+            continue
+        line, base = _advance(code, newline, synced, i, line, base)
+        synced = i
+        if code[i:i + 2] == comment:
+            close = code.find(comment_end, i + 2)
+            if close == -1:
+                return statements
+            line, base = _skip_comment(code, newline, i, close, line, base)
+            synced = pos = close + 2
+            continue
+
+        start, start_line, start_col = i, line, _column(code, i, base)
+        depth = 0
+        pos = i
+        while True:
+            m = boundary.search(code, pos)
+            if m is None:
+                end = length
+                line, base = _advance(code, newline, synced, end, line, base)
+                synced = end
+                end_col = _column(code, end, base)
+                break
+            token = m.group()
+            pos = m.end()
+            if token == comment:
+                j = m.start()
+                close = code.find(comment_end, pos)
+                line, base = _advance(code, newline, synced, j, line, base)
+                if close == -1:
+                    end = length
+                    line, base = _advance(code, newline, j, end, line, base)
+                    synced = end
+                    end_col = _column(code, end, base)
+                    break
+                line, base = _skip_comment(code, newline, j, close, line, base)
+                synced = pos = close + 2
+            elif token == line_comment:
+                pos = code.find(newline, pos)
+                if pos == -1:
+                    pos = length
+            elif len(token) > 1:
+                continue
+            elif token in (';', b';'):
+                if depth:
+                    continue
+                end = pos
+                line, base = _advance(code, newline, synced, m.start(), line, base)
+                synced = m.start()
+                end_col = _column(code, synced, base)
+                break
+            elif token in ('(', b'('):
+                depth += 1
+            elif token in (')', b')'):
+                if depth:
+                    depth -= 1
+        statements.append(Statement(start, end, start_line, start_col, line, end_col))
+        pos = end
+
+
+def _skip_comment(code, newline, start, close, line, base):
+    """Line and column base after the block comment from start to close."""
+    newlines = code.count(newline, start, close)
+    if newlines:
+        return line + newlines, code.rfind(newline, start, close) + 2
+    return line, base + 4
+
+
+def _column(code, i, base):
+    col = i - base
+    if not isinstance(code, str):
+        # A column counts characters, not the continuation bytes of UTF-8
+        col -= len(_CONTINUATION_BYTES.findall(code, code.rfind(b'\n', 0, i) + 1, i))
+    return col
+
+
+def statement_at(statements, line, col):
+    """The statement containing the (line, col) position, or None."""
+    ends = [(s.end_line, s.end_col) for s in statements]
+    k = bisect_right(ends, (line, col - 1))
+    if k < len(statements) and statements[k].contains(line, col):
+        return statements[k]
+    return None
@@ -0,0 +1,133 @@
+# Template Fast Path
+#
+# Dumps are mostly long runs of single-row INSERTs of one shape, such as
+# INSERT INTO t VALUES (1, 'a', 2.5); A statement of that form is recognized
+# straight from the text, and a pattern for its shape (table and number of
+# values) is compiled and then tried first on every statement that follows.
+# Matching statements only have their literals extracted, into an
+# InsertBatch; no tokens or nodes are made for them. Any other statement is
+# lexed and parsed normally.
+
+import re
+
+from lexer import _ScanState, KEYWORD_LIST, INTEGER_KIND, FLOAT_KIND, STRING_KIND
+from nodes import Query, InsertBatch
+from incremental import _lex_segments
+from splitter import _advance
+
+# The pieces of the lexer's master pattern a template is made of; together
+# they match exactly the statements the parser reads as a valid single-row
+# INSERT with no lexical errors
+_BLANKS = r"[ \t\r\n]*"
+_WORD_END = r"(?![A-Za-z0-9_]|[^\x00-\x7f])"
+_TABLE = (r"((?!(?i:" + "|".join(KEYWORD_LIST) + ")" + _WORD_END + r")[A-Za-z_][A-Za-z0-9_]{0,62})"
+          + _WORD_END)
+_LITERAL = r"'[^'\n]*'|[0-9]+(?:\.[0-9]*(?![0-9])|(?![.0-9]))(?![^\x00-\x7f])"
+
+
+def _head(table):
+    return (_BLANKS + "(?i:INSERT)" + _WORD_END + _BLANKS + "(?i:INTO)" + _WORD_END + _BLANKS
+            + table + _BLANKS + "(?i:VALUES)" + _WORD_END + _BLANKS + r"\(" + _BLANKS)
+
+
+_TAIL = _BLANKS + r"\)" + _BLANKS + ";"
+_SEPARATOR = _BLANKS + "," + _BLANKS
+
+# Any single-row INSERT; group 2 spans its values
+_ANY_INSERT = re.compile(_head(_TABLE) + "((?:" + _LITERAL + ")(?:" + _SEPARATOR + "(?:" + _LITERAL + "))*)"
+                         + _TAIL, re.ASCII)
+_LITERALS = re.compile(_LITERAL, re.ASCII)
+
+
+def _template(table, width):
+    """The pattern of an INSERT into table of width values, capturing the table and each value."""
+    values = _SEPARATOR.join(["(" + _LITERAL + ")"] * width)
+    return re.compile(_head("(" + re.escape(table) + ")" + _WORD_END) + values + _TAIL, re.ASCII)
+
+
+def _literal_kind(text):
+    if text[0] == "'":
+        return STRING_KIND
+    return FLOAT_KIND if "." in text else INTEGER_KIND
+
+
+def _stop(end, line, col):
+    return True
+
+
+def parse_dump(code, recover=False):
+    """Parse a script, taking runs of same-shaped single-row INSERTs through a fast path.
+
+    Returns (parse_tree, lex_errors, parse_errors) as compile_sql would
+    give them, except that each run of INSERTs matching one template is a
+    single InsertBatch in the tree and produces no tokens. Semantic analysis
+    of the tree reports the same errors, at the same lines and columns.
+    With recover set, lexing continues past errors as in tokenize_sql.
+    """
+    root = Query()
+    lex_errors = []
+    parse_errors = []
+    templates = {}
+    template = batch = None
+    line, base = 1, -1
+    pos = 0
+    length = len(code)
+
+    while pos < length:
+        m = template.match(code, pos) if template is not None else None
+        if m is None:
+            shape = _ANY_INSERT.match(code, pos)
+            if shape is not None:
+                table = shape.group(1)
+                key = (table, len(_LITERALS.findall(code, *shape.span(2))))
+                template = templates.get(key)
+                if template is None:
+                    template = templates[key] = _template(*key)
+                m = template.match(code, pos)
+                batch = InsertBatch(table)
+                root.children.append(batch)
+
+        if m is not None:
+            rows = batch.rows
+            end = m.end()
+            start = m.start(1)
+            line, base = _advance(code, '\n', pos, start, line, base)
+            if code.find('\n', start, end) == -1:
+                # The usual case: table and values on one line
+                batch.table_lines.append(line)
+                batch.table_cols.append(start - base)
+                for k in range(2, m.lastindex + 1):
+                    text = m.group(k)
+                    rows.add_value(_literal_kind(text), line, m.start(k) - base, text)
+            else:
+                batch.table_lines.append(line)
+                batch.table_cols.append(start - base)
+                synced = start
+                for k in range(2, m.lastindex + 1):
+                    i = m.start(k)
+                    line, base = _advance(code, '\n', synced, i, line, base)
+                    synced = i
+                    text = m.group(k)
+                    rows.add_value(_literal_kind(text), line, i - base, text)
+                start = synced
+            rows.end_row()
+            line, base = _advance(code, '\n', start, end, line, base)
+            pos = end
+            continue
+
+        # Lex and parse the next statement in full
+        template = batch = None
+        # A fresh state each time, as the last one lexed on past the ';'
+        state = _ScanState()
+        state.line, state.base, state.recover = line, base, recover
+        segments, stop = _lex_segments(code, pos, state, _stop, chunk_size=0)
+        for seg in segments:
+            seg.parse()
+            root.children.extend(seg.nodes)
+            parse_errors.extend(seg.errors)
+            lex_errors.extend(tok for tok in seg.tokens if tok[0] == 'ERROR')
+        if stop is None:
+            break
+        pos, line, col = stop
+        base = pos - 1 - col
+    return root, lex_errors, parse_errors
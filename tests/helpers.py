@@ -0,0 +1,60 @@
+# Script fuzzing and result comparison shared by the compile tests
+
+import random
+
+# Whole statements, valid or failing only semantic checks, and blanks
+PIECES = [
+    "CREATE TABLE t (a INT, b TEXT);\n", "CREATE TABLE t (a INT, a TEXT);", "CREATE TABLE u (x FLOAT, y BLOB);",
+    "INSERT INTO t VALUES (1, 'x;y');", "INSERT INTO u VALUES (?, 2);", "INSERT INTO t VALUES (?, 'a'), (2, 3);",
+    "SELECT a FROM t WHERE (a = 1 OR b = 'q');", "SELECT * FROM u;", "DELETE FROM t WHERE a > 2;",
+    "DELETE FROM t;", "UPDATE t SET a = 3;", "UPDATE u SET x = 'a' WHERE y = ?;", "/* c ; \n */", "-- x ;\n",
+    "\n", "  ",
+]
+# Fragments that leave lexical or syntax errors, unclosed comments and strings
+BROKEN = [
+    "SELECT ((a) FROM t;", "SELECT a FROM t WHERE a = 'unclosed\n", "SELECT # FROM t;", "/* /* nested */",
+    ";", "SELECT a) FROM u;", "SELECT é FROM t;", "/* open", "*/", "'", "(", ")", "x",
+]
+
+
+def scripts(seed, count, length=40):
+    """Yield count (rng, script) pairs, half of the scripts made of PIECES only."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        pieces = PIECES if rng.random() < 0.5 else PIECES + BROKEN
+        yield rng, "".join(rng.choice(pieces) for _ in range(rng.randint(0, length)))
+
+
+def random_edit(rng, code):
+    """A random (offset, removed, inserted) edit of code."""
+    offset = rng.randint(0, len(code))
+    removed = rng.randint(0, min(8, len(code) - offset))
+    inserted = "".join(rng.choice(PIECES + BROKEN)[:rng.randint(0, 12)] for _ in range(rng.randint(0, 2)))
+    return offset, removed, inserted
+
+
+def dump(root):
+    """Every node of the tree under root with its depth, rule and position, in preorder."""
+    lines = []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        lines.append((depth, node.rule, node.line, node.col, node.text))
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+    return lines
+
+
+def summary(result):
+    """What a CompileResult reports, in a form that compares by value."""
+    semantic = result.semantic_result
+    return {
+        "tokens": list(result.tokens),
+        "tree": dump(result.parse_tree),
+        "lex_errors": result.lex_errors,
+        "parse_errors": result.parse_errors,
+        "errors": semantic["errors"],
+        "symbol_table": semantic["symbol_table"],
+        "annotated_tree": semantic["annotated_tree"],
+        "segments": [(seg.start, seg.end, seg.line, seg.base, seg.parens, seg.tokens, seg.errors, seg.closed())
+                     for seg in result.segments],
+    }
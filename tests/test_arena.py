@@ -0,0 +1,65 @@
+# Arena trees must hold what the node-object trees hold
+
+import random
+
+import pytest
+
+from bench.workload import generate_workload
+from lexer import tokenize_sql, TokenBuffer
+from parser import Parser
+from semantic import SemanticAnalyzer
+
+PIECES = [
+    "CREATE TABLE t (a INT, b TEXT);", "CREATE TABLE t (a INT, a FLOAT);", "INSERT INTO t VALUES (1, 'x', 2.5);",
+    "INSERT INTO t VALUES (1, 'x');", "INSERT INTO t VALUES ('1', 2);", "INSERT INTO t VALUES (1, ?), (:p, 'y');",
+    " ", "\n", "SELECT a, b FROM t WHERE NOT (a > 1 AND b = 'q') OR a < 3;", "SELECT c FROM t WHERE c = 1 AND a = 'x';",
+    "#", "'", ";", "(", ")", "UPDATE t SET a = 2, b = 'z' WHERE a = 1;", "UPDATE t SET a = 'q', c = 1;", "x",
+    "DELETE FROM t;", "DELETE FROM t WHERE a = 1.5;", "SELECT * FROM u;", "VALUES", ",", "=", "INT", "FROM",
+    "99999999999999999999999", "1.5",
+]
+
+
+def dump(root):
+    lines = []
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        lines.append((depth, node.rule, node.line, node.col, node.text))
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+    return lines
+
+
+def arena_dump(arena):
+    return [(depth, arena.rule(n), arena.line(n), arena.col(n), arena.text(n)) for n, depth in arena.walk()]
+
+
+def check(code):
+    for tokens in (tokenize_sql(code, recover=True), TokenBuffer.from_source(code, recover=True)):
+        objects, arena = Parser(tokens), Parser(tokens, arena=True)
+        tree, flat = objects.parse_query(), arena.parse_query()
+        assert arena_dump(flat) == dump(tree), code
+        assert arena.error_messages == objects.error_messages, code
+        expected = SemanticAnalyzer().analyze(tree, render=True)
+        assert dict(SemanticAnalyzer().analyze(flat, render=True)) == dict(expected), code
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_scripts(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        check("".join(rng.choice(PIECES) for _ in range(rng.randint(0, 14))))
+
+
+def test_workload():
+    check(generate_workload(inserts=300, selects=50, updates=30, deletes=10, rows_per_insert=2))
+
+
+def test_cursor_walks_the_tree():
+    arena = Parser(tokenize_sql("SELECT a, b FROM t;"), arena=True).parse_query()
+    cursor = arena.cursor()
+    assert cursor.first_child() and cursor.rule == "SelectStmt"
+    assert cursor.first_child() and cursor.next_sibling() and cursor.rule == "SelectList"
+    assert cursor.first_child() and (cursor.text, cursor.line, cursor.col) == ("a", 1, 8)
+    assert cursor.next_sibling() and cursor.text == "b"
+    assert not cursor.next_sibling() and cursor.text == "b"
+    assert cursor.parent() and cursor.parent() and cursor.rule == "SelectStmt"
@@ -0,0 +1,106 @@
+# Saving and loading catalogs, and their version
+
+import pytest
+
+from catalog import Catalog
+from lexer import tokenize_sql
+from parser import Parser
+from semantic import SemanticAnalyzer
+
+TABLES = {
+    "t": {"a": "INT", "b": "TEXT"},
+    "u": {"x": "FLOAT", "y": None},
+    "naïve": {"é": "TEXT"},
+}
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "schema.cat"
+    Catalog(TABLES).save(path)
+    catalog = Catalog.load(path)
+    assert catalog.version == 1
+    assert len(catalog) == 3
+    assert catalog.loaded() == {}
+    assert catalog["u"] == TABLES["u"]
+    assert catalog.loaded() == {"u": TABLES["u"]}
+    assert dict(catalog) == TABLES
+    assert "v" not in catalog
+    with pytest.raises(KeyError):
+        catalog["v"]
+
+
+def test_version_counts_changing_saves(tmp_path):
+    path = tmp_path / "schema.cat"
+    catalog = Catalog(TABLES)
+    catalog.save(path)
+    catalog.save(path)
+    assert catalog.version == 1
+
+    catalog = Catalog.load(path)
+    catalog["t"]
+    catalog.save(path)
+    assert catalog.version == 1
+    catalog["v"] = {"z": "INT"}
+    catalog.save(path)
+    assert catalog.version == 2
+    del catalog["u"]
+    catalog.save(path)
+    assert catalog.version == 3
+
+    catalog = Catalog.load(path)
+    assert catalog.version == 3
+    assert dict(catalog) == {"t": TABLES["t"], "naïve": TABLES["naïve"], "v": {"z": "INT"}}
+
+
+@pytest.mark.parametrize("edit", [
+    lambda catalog: catalog["t"].__setitem__("c", "FLOAT"),
+    lambda catalog: catalog["t"].__setitem__("a", "TEXT"),
+    lambda catalog: catalog["t"].pop("b"),
+    lambda catalog: (catalog["u"], catalog.loaded()["u"].__setitem__("z", "INT")),
+], ids=["add column", "change type", "drop column", "through loaded()"])
+def test_in_place_edits_count(tmp_path, edit):
+    path = tmp_path / "schema.cat"
+    Catalog(TABLES).save(path)
+    catalog = Catalog.load(path)
+    edit(catalog)
+    expected = dict(catalog)
+    catalog.save(path)
+    assert catalog.version == 2
+    # Edits after a save count again
+    catalog.save(path)
+    assert catalog.version == 2
+    catalog["t"]["d"] = "INT"
+    catalog.save(path)
+    assert catalog.version == 3
+    expected["t"] = dict(expected["t"], d="INT")
+    assert dict(Catalog.load(path)) == expected
+
+
+def test_analyzer_adds_tables(tmp_path):
+    path = tmp_path / "schema.cat"
+    Catalog(TABLES).save(path)
+    catalog = Catalog.load(path)
+    tree = Parser(tokenize_sql("CREATE TABLE w (k INT); INSERT INTO t VALUES (1, 'x');")).parse_query()
+    result = SemanticAnalyzer().analyze(tree, catalog, render=True)
+    assert result["errors"] == []
+    catalog.save(path)
+    assert catalog.version == 2
+    assert Catalog.load(path)["w"] == {"k": "INT"}
+
+
+@pytest.mark.parametrize("content", [b"", b"SQLCAT", b"NOTCAT" + bytes(20)])
+def test_not_a_catalog_file(tmp_path, content):
+    path = tmp_path / "schema.cat"
+    path.write_bytes(content)
+    with pytest.raises(ValueError, match="is not a catalog file"):
+        Catalog.load(path)
+
+
+def test_unsupported_format(tmp_path):
+    path = tmp_path / "schema.cat"
+    Catalog(TABLES).save(path)
+    data = bytearray(path.read_bytes())
+    data[6] = 9
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="catalog format 9 .* is not supported"):
+        Catalog.load(path)
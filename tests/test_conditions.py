@@ -0,0 +1,59 @@
+# WHERE conditions: precedence, and nesting far past the recursion limit
+
+import sys
+
+import pytest
+
+from lexer import tokenize_sql
+from parser import Parser
+from semantic import SemanticAnalyzer
+
+DEPTH = 10000
+
+
+def condition_rules(code):
+    query = Parser(tokenize_sql(code)).parse_query()
+    where = query.children[-1].children[-1]
+    lines = []
+    stack = [(where.children[1], 0)]
+    while stack:
+        node, depth = stack.pop()
+        lines.append(" " * depth + node.rule)
+        stack.extend((child, depth + 1) for child in reversed(node.children))
+    return lines
+
+
+def test_precedence():
+    assert condition_rules("SELECT a FROM t WHERE a = 1 OR b = 2 AND NOT c = 3;") == [
+        "OR",
+        " Comparison", "  Col: a", "  Op: =", "  Val: 1",
+        " AND",
+        "  Comparison", "   Col: b", "   Op: =", "   Val: 2",
+        "  NOT",
+        "   Comparison", "    Col: c", "    Op: =", "    Val: 3",
+    ]
+
+
+CONDITIONS = {
+    # condition, whether a comparison has a type error, least number of tree lines
+    "not": ("NOT (" * DEPTH + "a = 1" + ")" * DEPTH, False, DEPTH),
+    "parens": ("(" * DEPTH + "a = 'x'" + ")" * DEPTH, True, 5),
+    "and": (" AND ".join(["NOT a = 1"] * DEPTH), False, 5 * DEPTH),
+    "or": (" OR ".join(f"(a = {i} AND b = 'x')" for i in range(DEPTH)), False, 9 * DEPTH),
+}
+
+
+@pytest.mark.parametrize("arena", [False, True])
+@pytest.mark.parametrize("name", list(CONDITIONS))
+def test_deep_conditions(arena, name):
+    condition, mismatch, least_lines = CONDITIONS[name]
+    assert DEPTH > sys.getrecursionlimit()
+    code = "CREATE TABLE t (a INT, b TEXT);\nSELECT a FROM t WHERE " + condition + ";\n"
+    parser = Parser(tokenize_sql(code), arena=arena)
+    tree = parser.parse_query()
+    assert parser.error_messages == []
+    analyzer = SemanticAnalyzer()
+    result = analyzer.analyze(tree)
+    lines = analyzer.iter_arena_tree(tree) if arena else analyzer.iter_annotated_tree(tree)
+    assert sum(1 for _ in lines) >= least_lines
+    assert len(result["errors"]) == mismatch
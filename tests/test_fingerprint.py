@@ -0,0 +1,117 @@
+# Statement shapes, fingerprints and workload profiles
+
+import io
+import random
+
+import pytest
+
+from lexer import tokenize_sql
+from fingerprint import normalize, shape_id, fingerprint, WorkloadStats, profile_workload
+
+
+def statements(code):
+    """The statements of code as token lists."""
+    out, statement = [], []
+    for token in tokenize_sql(code, recover=True):
+        statement.append(token)
+        if token[:2] == ("DELIMITER", ";"):
+            out.append(statement)
+            statement = []
+    if statement:
+        out.append(statement)
+    return out
+
+
+def shape(code):
+    return normalize(tokenize_sql(code, recover=True))
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("SELECT a FROM t WHERE a = 1;", "SELECT a FROM t WHERE a = ? ;"),
+    ("select a\n  from t -- note\n where a = 'x';", "SELECT a FROM t WHERE a = ? ;"),
+    ("UPDATE t SET a = 1.5, b = :b WHERE c = ?;", "UPDATE t SET a = ? , b = ? WHERE c = ? ;"),
+    ("INSERT INTO t VALUES (1, 'a'), (2, 'b'), (3, 'c');", "INSERT INTO t VALUES ( ? , ? ) ;"),
+    # Rows of different widths are kept apart
+    ("INSERT INTO t VALUES (1, 'a'), (2), (3);", "INSERT INTO t VALUES ( ? , ? ) , ( ? ) ;"),
+    # Errors are left out
+    ("SELECT a # FROM t;", "SELECT a FROM t ;"),
+])
+def test_normalize(code, expected):
+    assert shape(code) == expected
+
+
+def test_fingerprint_is_the_shape_hash():
+    tokens = tokenize_sql("DELETE FROM t WHERE a = 3;")
+    fp = fingerprint(tokens)
+    assert fp == shape_id("DELETE FROM t WHERE a = ? ;")
+    assert 0 <= fp < 1 << 64
+    # Stable across runs, unlike hash()
+    assert fp == 0xa526044d7ce8ec31
+    assert fingerprint(tokenize_sql("DELETE FROM t WHERE a = 'q';")) == fp
+    assert fingerprint(tokenize_sql("DELETE FROM t WHERE b = 3;")) != fp
+
+
+def test_counts_are_exact_within_capacity():
+    stats = WorkloadStats(capacity=10)
+    code = "SELECT a FROM t;" * 5 + "DELETE FROM t WHERE a = 1;" * 3 + "DELETE FROM t WHERE a = 2;"
+    for statement in statements(code):
+        stats.add(statement)
+    assert stats.statements == 9
+    assert stats.floor == 0
+    assert [(count, error, shape) for _, count, error, shape, _ in stats.top()] == [
+        (5, 0, "SELECT a FROM t ;"),
+        (4, 0, "DELETE FROM t WHERE a = ? ;"),
+    ]
+    assert stats.top()[1][4] == "DELETE FROM t WHERE a = 1 ;"
+
+
+def test_capacity_one_keeps_the_top_shape():
+    stats = WorkloadStats(capacity=1)
+    for statement in statements("SELECT a FROM t;" * 5 + "DELETE FROM t;"):
+        stats.add(statement)
+    assert [(count, shape) for _, count, _, shape, _ in stats.top(3)] == [(5, "SELECT a FROM t ;")]
+    assert stats.floor == 1
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        WorkloadStats(capacity=0)
+
+
+@pytest.mark.parametrize("capacity", [1, 2, 3, 8])
+def test_error_bounds_the_overcount(capacity):
+    rng = random.Random(capacity)
+    # A few heavy shapes among many rare ones
+    tables = [f"t{k}" for k in range(40)]
+    weights = [200, 100, 50] + [1] * 37
+    exact = {}
+    stats = WorkloadStats(capacity=capacity)
+    for table in rng.choices(tables, weights, k=2000):
+        tokens = tokenize_sql(f"SELECT a FROM {table} WHERE a = {rng.randint(0, 9)};")
+        exact[fingerprint(tokens)] = exact.get(fingerprint(tokens), 0) + 1
+        stats.add(tokens)
+    assert len(stats.counts) <= capacity
+    for fp, (count, error, _, _) in stats.counts.items():
+        assert count - error <= exact[fp] <= count
+        assert error <= stats.floor
+    heaviest = max(exact, key=exact.get)
+    assert stats.top(1)[0][0] == heaviest
+
+
+def test_profile_workload():
+    code = ("INSERT INTO t VALUES (1, 'a'), (2, 'b');\n" * 3
+            + "SELECT a FROM t WHERE a = 1;\n" * 2
+            + "SELECT # a FROM t;\n"
+            + "DELETE FROM t")
+    stats = profile_workload(io.StringIO(code), chunk_size=7)
+    assert stats.statements == 7
+    assert stats.errors == 1
+    assert [(count, shape) for _, count, _, shape, _ in stats.top()] == [
+        (3, "INSERT INTO t VALUES ( ? , ? ) ;"),
+        (2, "SELECT a FROM t WHERE a = ? ;"),
+        (1, "SELECT a FROM t ;"),
+        (1, "DELETE FROM t"),
+    ]
+    report = stats.report(2).splitlines()
+    assert report[0] == "7 statements, 4 shapes tracked"
+    assert len(report) == 5
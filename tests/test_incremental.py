@@ -0,0 +1,32 @@
+# recompile must give what compiling the edited script afresh gives
+
+import random
+
+import pytest
+
+from cache import ParseCache
+from helpers import scripts, random_edit, summary
+from incremental import compile_sql, recompile, edit_between
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("cached", [False, True])
+def test_recompile_matches_fresh_compile(seed, cached):
+    cache = ParseCache() if cached else None
+    for rng, code in scripts(seed, 150, length=12):
+        result = compile_sql(code, cache=cache)
+        for _ in range(4):
+            offset, removed, inserted = random_edit(rng, code)
+            new_code = code[:offset] + inserted + code[offset + removed:]
+            result = recompile(result, offset, removed, inserted, cache=cache)
+            assert summary(result) == summary(compile_sql(new_code)), (code, offset, removed, inserted)
+            code = new_code
+
+
+def test_edit_between():
+    rng = random.Random(0)
+    for _ in range(500):
+        old = "".join(rng.choice("ab;\n") for _ in range(rng.randint(0, 12)))
+        new = "".join(rng.choice("ab;\n") for _ in range(rng.randint(0, 12)))
+        offset, removed, inserted = edit_between(old, new)
+        assert old[:offset] + inserted + old[offset + removed:] == new
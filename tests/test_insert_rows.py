@@ -0,0 +1,86 @@
+# Multi-row INSERT ... VALUES (...), (...): grammar, columnar rows and per-row checks
+
+import random
+
+import pytest
+
+from lexer import tokenize_sql, INTEGER_KIND, FLOAT_KIND, STRING_KIND, PARAMETER_KIND
+from nodes import ValueRows, ValueList
+from parser import Parser
+from semantic import SemanticAnalyzer
+
+SCHEMA = "CREATE TABLE t (a INT, b TEXT);\n"
+
+
+def parse(code, arena=False):
+    parser = Parser(tokenize_sql(code), arena=arena)
+    return parser.parse_query(), parser.error_messages
+
+
+def test_rows_are_stored_column_wise():
+    tree, errors = parse("INSERT INTO t VALUES (1, 'x'),\n  (2.5, 'y'), (?, :b);")
+    assert errors == []
+    rows = tree.children[0].children[-1]
+    assert isinstance(rows, ValueRows)
+    assert rows.rule == "ValueRows: 3 rows"
+    assert len(rows) == 3
+    assert list(rows.kinds) == [INTEGER_KIND, STRING_KIND, FLOAT_KIND, STRING_KIND, PARAMETER_KIND, PARAMETER_KIND]
+    assert rows.texts == ["1", "'x'", "2.5", "'y'", "?", ":b"]
+    assert list(zip(rows.lines, rows.cols)) == [(1, 23), (1, 26), (2, 4), (2, 9), (2, 16), (2, 19)]
+    assert [list(rows.row(r)) for r in range(3)] == [[0, 1], [2, 3], [4, 5]]
+    assert [rows.sql_type(i) for i in rows.row(1)] == ["FLOAT", "TEXT"]
+
+
+def test_single_row_keeps_its_value_list():
+    tree, errors = parse("INSERT INTO t VALUES (1, 'x');")
+    assert errors == []
+    assert isinstance(tree.children[0].children[-1], ValueList)
+
+
+@pytest.mark.parametrize("code, error", [
+    ("INSERT INTO t VALUES (1,'x') , SELECT a FROM t;", "[Line 1, Col 32] Expected '('"),
+    ("INSERT INTO t VALUES (1,'x'), (2, 'y';", "[Line 1, Col 38] Expected ')'"),
+    ("INSERT INTO t VALUES (1,'x'), (2, FROM);", "[Line 1, Col 35] Expected value"),
+    ("INSERT INTO t VALUES (1,'x'), (2, 'y') x;", "[Line 1, Col 40] Expected ';'"),
+])
+def test_syntax_errors(code, error):
+    for arena in (False, True):
+        assert parse(code, arena)[1][:1] == [error]
+
+
+@pytest.mark.parametrize("values, errors, parameter_types", [
+    ("(1, 'x'),\n  (2.5, 'y'), (3, 4), (?, :b)",
+     ["[Semantic Error at Line 3, Col 19] Type mismatch: Column 2 of 't' expects TEXT, but got INT."],
+     {(3, 24): "INT", (3, 27): "TEXT"}),
+    # A row of the wrong length only gets the count error, as a single-row INSERT would
+    ("(1, 'x'), (2), ('a', 'b', 3)",
+     ["[Semantic Error at Line 2, Col 33] INSERT into 't' expects 2 values, but row 2 has 1.",
+      "[Semantic Error at Line 2, Col 38] INSERT into 't' expects 2 values, but row 3 has 3."],
+     {}),
+])
+def test_row_errors_and_positions(values, errors, parameter_types):
+    code = SCHEMA + "INSERT INTO t VALUES " + values + ";"
+    for arena in (False, True):
+        analyzer = SemanticAnalyzer()
+        assert analyzer.analyze(parse(code, arena)[0])["errors"] == errors
+        assert analyzer.parameter_types == parameter_types
+
+
+def test_missing_table_is_reported_once():
+    result = SemanticAnalyzer().analyze(parse("INSERT INTO u VALUES (1), (2);")[0])
+    assert result["errors"] == ["[Semantic Error at Line 1, Col 13] Table 'u' does not exist."]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rows_check_like_single_row_inserts(seed):
+    # Row k of the multi-row INSERT sits on line k + 2, at the columns its
+    # values have in the k-th single-row INSERT
+    rng = random.Random(seed)
+    for _ in range(50):
+        rows = ["(" + ", ".join(rng.choice(["1", "2.5", "'s'", "?", ":p"]) for _ in range(2)) + ")"
+                for _ in range(rng.randint(2, 6))]
+        multi = SCHEMA + "INSERT INTO t VALUES " + (",\n" + " " * 21).join(rows) + ";"
+        single = SCHEMA + "\n".join("INSERT INTO t VALUES " + row + ";" for row in rows)
+        expected, analyzer = SemanticAnalyzer(), SemanticAnalyzer()
+        assert analyzer.analyze(parse(multi)[0])["errors"] == expected.analyze(parse(single)[0])["errors"]
+        assert analyzer.parameter_types == expected.parameter_types
@@ -0,0 +1,114 @@
+# The lexer's engines and token stores must agree with tokenize_sql's loop engine
+
+import io
+import random
+
+import pytest
+
+from lexer import tokenize_sql, iter_tokens, TokenBuffer
+from parser import Parser
+
+PIECES = [
+    "SELECT", "select", " ", "\n", "\t", "\r", "'", "'abc'", "--x", "/*", "*/", "(", ")", ";", ",", ".",
+    "1", "2.5", "a", "_b", "é", "²", "<", ">", "=", "!", "-", "/", "*", "<>", "?", ":", ":a", ":é",
+    "ſelect", "x" * 70, "\f", "١",
+]
+
+
+def scripts(seed, count, pieces=PIECES, length=25):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(pieces) for _ in range(rng.randint(0, length)))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_regex_engine_matches_loop(seed):
+    for code in scripts(seed, 3000):
+        assert tokenize_sql(code, engine="regex") == tokenize_sql(code, engine="loop"), code
+
+
+@pytest.mark.parametrize("code, error", [
+    ("SELECT # FROM t;", ("ERROR", "invalid character '#'", 1, 8)),
+    ("SELECT 'ab", ("ERROR", "unclosed string", 1, 8)),
+    ("SELECT (a;", ("ERROR", "unmatched '('", 1, 8)),
+])
+def test_engines_stop_at_the_first_error(code, error):
+    for engine in ("loop", "regex"):
+        assert tokenize_sql(code, engine=engine)[-1] == error
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        tokenize_sql("SELECT 1;", engine="nope")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_token_buffer_matches_tokenize_sql(chunk_size):
+    for code in scripts(chunk_size, 2000, length=30):
+        expected = tokenize_sql(code)
+        buf = TokenBuffer.from_source(code, chunk_size=chunk_size)
+        assert len(buf) == len(expected)
+        assert list(buf) == expected, code
+        assert buf[-1:] == expected[-1:]
+
+
+def test_token_buffer_parses_like_a_token_list():
+    code = "CREATE TABLE t (a INT, b TEXT);\nINSERT INTO t VALUES (1, 'é');\nSELECT a FROM t WHERE NOT (a > 1);\n"
+    assert repr(Parser(TokenBuffer.from_source(code)).parse_query().children) == \
+        repr(Parser(tokenize_sql(code)).parse_query().children)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_recovery_reports_what_normal_mode_stops_at(seed):
+    for code in scripts(seed, 3000, length=30):
+        expected = tokenize_sql(code)
+        recovered = tokenize_sql(code, recover=True)
+        first = next((k for k, tok in enumerate(recovered) if tok[0] == "ERROR"), None)
+        if first is None:
+            assert recovered == expected, code
+        else:
+            # Up to the first error both modes agree; recovery carries on
+            assert recovered[:first + 1] == expected, code
+        assert list(TokenBuffer.from_source(code, chunk_size=3, recover=True)) == recovered, code
+        assert list(iter_tokens(io.StringIO(code), chunk_size=2, recover=True)) == recovered, code
+
+
+def test_recovery_reports_every_error():
+    tokens = tokenize_sql("SELECT 'ab\nFROM t $ x;\n( ) ) ((", recover=True)
+    assert [tok for tok in tokens if tok[0] == "ERROR"] == [
+        ("ERROR", "unclosed string", 1, 8),
+        ("ERROR", "invalid character '$'", 2, 8),
+        ("ERROR", "unmatched ')'", 3, 5),
+        ("ERROR", "unmatched '('", 3, 8),
+        ("ERROR", "unmatched '('", 3, 7),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 1 << 16])
+def test_bytes_source_matches_tokenize_sql(chunk_size):
+    for code in scripts(chunk_size + 10, 1500, length=30):
+        buf = TokenBuffer.from_source(code.encode("utf-8"), chunk_size=chunk_size)
+        assert list(buf) == tokenize_sql(code), code
+
+
+def test_from_file_across_block_boundaries(tmp_path):
+    # Comments and strings spanning many lines of multi-byte text are cut by
+    # every small block size
+    code = ("CREATE TABLE é (a TEXT);\n/* ééé\n" + "ü\n" * 20 + "*/ INSERT INTO é VALUES ('x\n"
+            + "ß" * 10 + "');\nSELECT a FROM é; -- ł\n")
+    path = tmp_path / "script.sql"
+    path.write_bytes(code.encode("utf-8"))
+    expected = tokenize_sql(code)
+    text = TokenBuffer.from_source(code)
+    for chunk_size in (1, 3, 8, 1 << 16):
+        buf = TokenBuffer.from_file(str(path), chunk_size=chunk_size)
+        assert list(buf) == expected
+        # Byte offsets into the file cover the same text as character offsets
+        assert [bytes(buf.raw(i)).decode("utf-8") for i in range(len(buf))] == \
+            [text.raw(i) for i in range(len(text))]
+
+
+def test_from_file_empty(tmp_path):
+    path = tmp_path / "empty.sql"
+    path.write_bytes(b"")
+    assert list(TokenBuffer.from_file(str(path))) == []
@@ -0,0 +1,129 @@
+# Parse tree nodes: rule labels, kinds and lazily parsed queries
+
+import pickle
+
+from lexer import tokenize_sql
+from nodes import NODE_CLASSES, SelectStmt, flatten, unflatten
+from parser import Parser
+
+SCRIPT = """CREATE TABLE t (a INT, b TEXT, c FLOAT);
+INSERT INTO t VALUES (1, 'x', 2.5);
+SELECT a, b FROM t WHERE NOT (a > 1 AND b = 'q') OR c <= 3;
+SELECT * FROM t;
+UPDATE t SET a = 2, b = 'z' WHERE a <> 1;
+DELETE FROM t WHERE c >= 1.5;
+"""
+
+# The labels of the string-based tree the node classes replaced
+RULES = """\
+Query
+ CreateStmt
+  CREATE
+  TABLE
+  Table: t
+  ColumnList
+   Col: a
+    Type: INT
+   Col: b
+    Type: TEXT
+   Col: c
+    Type: FLOAT
+ InsertStmt
+  INSERT
+  INTO
+  Table: t
+  VALUES
+  ValueList
+   Value: 1
+   Value: 'x'
+   Value: 2.5
+ SelectStmt
+  SELECT
+  SelectList
+   Col: a
+   Col: b
+  FROM
+  Table: t
+  WhereClause
+   WHERE
+   OR
+    NOT
+     AND
+      Comparison
+       Col: a
+       Op: >
+       Val: 1
+      Comparison
+       Col: b
+       Op: =
+       Val: 'q'
+    Comparison
+     Col: c
+     Op: <=
+     Val: 3
+ SelectStmt
+  SELECT
+  SelectList
+   *
+  FROM
+  Table: t
+ UpdateStmt
+  UPDATE
+  Table: t
+  SET
+  AssignmentList
+   Assignment
+    Col: a
+    Val: 2
+   Assignment
+    Col: b
+    Val: 'z'
+  WhereClause
+   WHERE
+   Comparison
+    Col: a
+    Op: <>
+    Val: 1
+ DeleteStmt
+  DELETE
+  FROM
+  Table: t
+  WhereClause
+   WHERE
+   Comparison
+    Col: c
+    Op: >=
+    Val: 1.5
+"""
+
+
+def rules(node, depth=0):
+    lines = [" " * depth + node.rule]
+    for child in node.children:
+        lines.extend(rules(child, depth + 1))
+    return lines
+
+
+def test_rules_match_the_string_tree():
+    query = Parser(tokenize_sql(SCRIPT)).parse_query()
+    assert "\n".join(rules(query)) + "\n" == RULES
+
+
+def test_kinds_index_node_classes():
+    for kind, cls in enumerate(NODE_CLASSES):
+        assert cls.kind == kind
+
+
+def test_trees_survive_pickling_and_flattening():
+    query = Parser(tokenize_sql(SCRIPT)).parse_query()
+    expected = rules(query)
+    assert rules(pickle.loads(pickle.dumps(query))) == expected
+    assert rules(unflatten(flatten([query]))[0]) == expected
+
+
+def test_add_child_to_lazily_parsed_query():
+    query = Parser(tokenize_sql("CREATE TABLE t (a INT); SELECT a FROM t;")).parse_query(lazy=True)
+    extra = SelectStmt()
+    query.add_child(extra)
+    assert [child.rule for child in query.children] == ["CreateStmt", "SelectStmt", "SelectStmt"]
+    assert query.children[-1] is extra
@@ -0,0 +1,32 @@
+# compile_parallel must give what compile_sql gives
+
+import pytest
+
+from helpers import scripts, random_edit, summary
+from incremental import compile_sql, recompile
+from pipeline import compile_parallel
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parallel_matches_serial(seed):
+    for rng, code in scripts(seed, 40):
+        result = compile_parallel(code, workers=2, batch_size=rng.randint(1, 4))
+        assert summary(result) == summary(compile_sql(code)), code
+
+
+def test_recompile_after_parallel_matches_fresh_compile():
+    for rng, code in scripts(10, 40):
+        result = compile_parallel(code, workers=2, batch_size=rng.randint(1, 4))
+        for _ in range(2):
+            offset, removed, inserted = random_edit(rng, code)
+            result = recompile(result, offset, removed, inserted)
+            code = code[:offset] + inserted + code[offset + removed:]
+            assert summary(result) == summary(compile_sql(code)), code
+
+
+def test_deep_conditions_and_late_errors():
+    code = "CREATE TABLE t (a INT, b TEXT);\n" + "INSERT INTO t VALUES (1, 'x');\n" * 50
+    code += "SELECT a FROM t WHERE " + " AND ".join(f"a = {i}" for i in range(3000)) + ";\n"
+    code += "SELECT nope FROM missing;\nINSERT INTO t VALUES ('x', 1);\nSELECT # FROM t;\n"
+    result = compile_parallel(code, workers=2, batch_size=8)
+    assert summary(result) == summary(compile_sql(code))
@@ -0,0 +1,83 @@
+# prepare() and PreparedStatement.bind()
+
+import pytest
+
+from prepared import prepare, PreparedStatement, PrepareError, BindError
+
+TABLES = {"t": {"a": "INT", "b": "TEXT", "c": "FLOAT"}}
+
+
+def test_parameters_take_their_column_types():
+    stmt = prepare("UPDATE t SET b = :name, c = ? WHERE a = ? AND b = :name;", TABLES)
+    assert stmt.parameters == [
+        ("name", "TEXT", 1, 18),
+        (None, "FLOAT", 1, 29),
+        (None, "INT", 1, 41),
+        ("name", "TEXT", 1, 51),
+    ]
+    assert stmt.positional == 2
+    assert stmt.names == {"name"}
+
+
+def test_insert_parameters_and_tables_created_by_the_statement():
+    stmt = prepare("CREATE TABLE u (x INT, y TEXT); INSERT INTO u VALUES (?, :y), (1, ?);")
+    assert [(name, sql_type) for name, sql_type, _, _ in stmt.parameters] == [
+        (None, "INT"), ("y", "TEXT"), (None, "TEXT")]
+
+
+def test_bind_returns_values_in_source_order():
+    stmt = prepare("UPDATE t SET b = :name, c = ? WHERE a = ? AND b = :name;", TABLES)
+    assert stmt.bind(2.5, 7, name="x") == ("x", 2.5, 7, "x")
+    # Numbers of either kind fit INT and FLOAT columns
+    assert stmt.bind(3, 7.0, name="x") == ("x", 3, 7.0, "x")
+
+
+def bind_errors(stmt, *args, **kwargs):
+    with pytest.raises(BindError) as info:
+        stmt.bind(*args, **kwargs)
+    assert str(info.value) == "\n".join(info.value.errors)
+    return info.value.errors
+
+
+def test_wrong_types():
+    stmt = prepare("SELECT a FROM t WHERE a = ? AND b = :b;", TABLES)
+    assert bind_errors(stmt, "1", b=2) == [
+        "[Bind Error at Line 1, Col 27] Parameter 1 (?) expects INT, but got str.",
+        "[Bind Error at Line 1, Col 37] Parameter ':b' expects TEXT, but got int.",
+    ]
+    # bool is not taken for a number
+    assert bind_errors(stmt, True, b="x") == [
+        "[Bind Error at Line 1, Col 27] Parameter 1 (?) expects INT, but got bool."]
+
+
+def test_missing_and_extra_values():
+    stmt = prepare("SELECT a FROM t WHERE a = ? AND b = :b;", TABLES)
+    assert bind_errors(stmt) == [
+        "[Bind Error] Statement expects 1 positional values, but 0 were given.",
+        "[Bind Error at Line 1, Col 37] No value for parameter ':b'.",
+    ]
+    assert bind_errors(stmt, 1, 2, b="x", c=3) == [
+        "[Bind Error] Statement expects 1 positional values, but 2 were given.",
+        "[Bind Error] Statement has no parameter ':c'.",
+    ]
+
+
+def test_parameter_of_unknown_type_takes_any_value():
+    stmt = PreparedStatement("", [], None, [(None, None, 1, 1), (None, None, 1, 4)])
+    assert stmt.bind(1, "x") == (1, "x")
+    assert bind_errors(stmt, 1, None) == [
+        "[Bind Error at Line 1, Col 4] Parameter 2 (?) expects INT, FLOAT or TEXT, but got NoneType."]
+
+
+@pytest.mark.parametrize("sql, errors", [
+    ("SELECT a FROM t WHERE a = #;", ["[Line 1, Col 27] invalid character '#'"]),
+    ("SELECT a FROM t WHERE a = 'x;", ["[Line 1, Col 27] unclosed string"]),
+    ("SELECT a t WHERE a = ?;", ["[Line 1, Col 10] Expected 'FROM'"]),
+    ("SELECT a FROM u WHERE a = ?;", ["[Semantic Error at Line 1, Col 15] Table 'u' does not exist."]),
+    ("UPDATE t SET a = 'x' WHERE b = ?;",
+     ["[Semantic Error at Line 1, Col 18] Type mismatch in UPDATE: Column 'a' (INT) cannot be assigned TEXT."]),
+])
+def test_prepare_errors(sql, errors):
+    with pytest.raises(PrepareError) as info:
+        prepare(sql, TABLES)
+    assert info.value.errors == errors
@@ -0,0 +1,180 @@
+# SemanticAnalyzer: compiled table schemas, statement checks, dumps and column resolution
+
+import io
+
+import pytest
+
+from catalog import Catalog
+from lexer import tokenize_sql, INTEGER_KIND, FLOAT_KIND, STRING_KIND
+from nodes import ColumnRef
+from parser import Parser
+from semantic import SemanticAnalyzer, TableSchema, ColumnIndex
+
+SCHEMA = "CREATE TABLE t (a INT, b TEXT, c FLOAT);"
+
+
+def parse(code, arena=False):
+    return Parser(tokenize_sql(code), arena=arena).parse_query()
+
+
+def analyze(code, **kwargs):
+    return SemanticAnalyzer().analyze(parse(code), **kwargs)
+
+
+def test_table_schema():
+    schema = TableSchema("t", {"a": "INT", "b": "TEXT", "c": "FLOAT"}, SemanticAnalyzer().is_compatible)
+    assert schema.name == "t"
+    assert schema.types == ("INT", "TEXT", "FLOAT")
+    assert schema.index == {"a": 0, "b": 1, "c": 2}
+    assert schema.accepts == (frozenset({"INT", "FLOAT"}), frozenset({"TEXT"}), frozenset({"INT", "FLOAT"}))
+    assert schema.rejected_kinds == ((STRING_KIND,), (INTEGER_KIND, FLOAT_KIND), (STRING_KIND,))
+
+
+def test_schema_is_compiled_once_per_analysis():
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(parse(SCHEMA))
+    schema = analyzer.schema("t")
+    assert schema.types == ("INT", "TEXT", "FLOAT")
+    assert analyzer.schema("t") is schema
+    assert analyzer.schema("u") is None
+    analyzer.analyze(parse("CREATE TABLE t (a TEXT);"))
+    assert analyzer.schema("t").types == ("TEXT",)
+
+
+# Every kind of statement goes to its handler
+@pytest.mark.parametrize("code, errors", [
+    ("INSERT INTO t VALUES (1, 'x', 2);", []),
+    ("INSERT INTO t VALUES (1.5, 2, 'x');", [
+        "[Semantic Error at Line 1, Col 69] Type mismatch: Column 2 of 't' expects TEXT, but got INT.",
+        "[Semantic Error at Line 1, Col 72] Type mismatch: Column 3 of 't' expects FLOAT, but got TEXT.",
+    ]),
+    ("INSERT INTO t VALUES (1, 'x');", [
+        "[Semantic Error] INSERT into 't' expects 3 values, but 2 were provided.",
+    ]),
+    ("SELECT a, d FROM t WHERE b = 1;", [
+        "[Semantic Error at Line 1, Col 52] Column 'd' does not exist in table 't'.",
+        "[Semantic Error at Line 1, Col 71] Type mismatch in WHERE: Cannot compare TEXT column 'b' with INT literal.",
+    ]),
+    ("UPDATE t SET b = 2 WHERE e = 1;", [
+        "[Semantic Error at Line 1, Col 59] Type mismatch in UPDATE: Column 'b' (TEXT) cannot be assigned INT.",
+        "[Semantic Error at Line 1, Col 67] Column 'e' does not exist in table 't'.",
+    ]),
+    ("DELETE FROM u WHERE a = 1;", ["[Semantic Error at Line 1, Col 54] Table 'u' does not exist."]),
+    ("CREATE TABLE t (x INT);", ["[Semantic Error at Line 1, Col 55] Table 't' already exists."]),
+])
+def test_statement_checks(code, errors):
+    code = SCHEMA + " " + code
+    assert analyze(code)["errors"] == errors
+    assert SemanticAnalyzer().analyze(parse(code, arena=True))["errors"] == errors
+
+
+def test_dumps_are_rendered_when_read():
+    code = SCHEMA + " SELECT a FROM t WHERE c > 1.5;"
+    result = analyze(code)
+    assert result["success"] is True
+    assert "symbol_table" not in result and "annotated_tree" not in result
+    assert result.get("missing") is None
+    annotated_tree = result.get("annotated_tree")
+    assert "annotated_tree" in result and "symbol_table" not in result
+    result.render()
+    assert "symbol_table" in result
+    assert result == analyze(code, render=True)
+    assert annotated_tree == result["annotated_tree"]
+    with pytest.raises(KeyError):
+        result["missing"]
+
+
+@pytest.mark.parametrize("arena", [False, True], ids=["nodes", "arena"])
+@pytest.mark.parametrize("code", [
+    SCHEMA + " INSERT INTO t VALUES (1, 'x', 2.5), (2, ?, :c); UPDATE t SET b = 'y' WHERE NOT (a = 1 OR c < 2);",
+    "SELECT a FROM u;",
+    "",
+], ids=["script", "errors", "empty"])
+def test_streamed_dumps_match_rendered_ones(code, arena):
+    tree = parse(code, arena)
+    result = SemanticAnalyzer().analyze(tree)
+    symbol_table, annotated_tree = io.StringIO(), io.StringIO()
+    result.write_symbol_table(symbol_table)
+    result.write_annotated_tree(annotated_tree)
+    assert "annotated_tree" not in result
+    rendered = SemanticAnalyzer().analyze(parse(code, arena), render=True)
+    # The empty symbol table dump already ends in a newline
+    assert symbol_table.getvalue() == rendered["symbol_table"].rstrip("\n") + "\n"
+    assert annotated_tree.getvalue() == rendered["annotated_tree"] + "\n"
+    assert result["annotated_tree"] == rendered["annotated_tree"]
+
+
+def test_streaming_a_deep_tree():
+    depth = 5000
+    code = SCHEMA + " SELECT a FROM t WHERE " + "NOT " * depth + "a = 1;"
+    out = io.StringIO()
+    analyze(code).write_annotated_tree(out)
+    lines = out.getvalue().splitlines()
+    assert len(lines) > depth
+    assert lines == analyze(code)["annotated_tree"].splitlines()
+
+
+TABLES = "CREATE TABLE t (a INT, b TEXT); CREATE TABLE u (c FLOAT, a TEXT); CREATE TABLE v (a FLOAT, b INT);"
+
+
+def test_column_index():
+    index = ColumnIndex()
+    tables = {"t": {"a": "INT", "b": "TEXT"}}
+    index.update(tables)
+    tables["u"] = {"c": "FLOAT", "a": "TEXT"}
+    index.update(tables)
+    index.update(tables)
+    assert index.owners == {"a": ["t", "u"], "b": ["t"], "c": ["u"]}
+    assert index.size == 2
+
+
+def test_column_tables_follow_creation_order():
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(parse(TABLES))
+    assert analyzer.column_tables("a") == ("t", "u", "v")
+    assert analyzer.column_tables("b") == ("t", "v")
+    assert analyzer.column_tables("c") == ("u",)
+    assert analyzer.column_tables("d") == ()
+    # Tables created in another order resolve differently, but always the same way
+    analyzer.analyze(parse("CREATE TABLE v (a FLOAT); CREATE TABLE t (a INT);"))
+    assert analyzer.column_tables("a") == ("v", "t")
+    analyzer.analyze(parse(TABLES), symbol_table={"w": {"a": "TEXT"}})
+    assert analyzer.column_tables("a") == ("w", "t", "u", "v")
+
+
+def column_refs(tree):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ColumnRef):
+            yield node
+        stack.extend(node.children)
+
+
+@pytest.mark.parametrize("arena", [False, True], ids=["nodes", "arena"])
+def test_column_without_table_resolves_to_the_first_owner(arena):
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(parse(TABLES, arena))
+    ref = next(column_refs(parse("SELECT a FROM x;")))
+    for _ in range(3):
+        assert analyzer.annotate_node(ref) == {"semantic_type": "INT", "symbol_ref": "t.a"}
+    ref = next(column_refs(parse("SELECT c FROM x;")))
+    assert analyzer.annotate_node(ref) == {"semantic_type": "FLOAT", "symbol_ref": "u.c"}
+    ref = next(column_refs(parse("SELECT d FROM x;")))
+    assert analyzer.annotate_node(ref) == {}
+    # A table context still wins
+    ref = next(column_refs(parse("SELECT a FROM x;")))
+    assert analyzer.annotate_node(ref, "u") == {"semantic_type": "TEXT", "symbol_ref": "u.a"}
+
+
+def test_catalog_columns_resolve_among_tables_read(tmp_path):
+    path = tmp_path / "schema.cat"
+    Catalog({"t": {"a": "INT"}, "u": {"a": "TEXT"}, "v": {"a": "FLOAT"}}).save(path)
+    catalog = Catalog.load(path)
+    analyzer = SemanticAnalyzer()
+    analyzer.analyze(parse("INSERT INTO v VALUES (1.5); DELETE FROM u WHERE a = 'x';"), catalog)
+    assert analyzer.column_tables("a") == ("v", "u")
+    ref = next(column_refs(parse("SELECT a FROM x;")))
+    assert analyzer.annotate_node(ref) == {"semantic_type": "FLOAT", "symbol_ref": "v.a"}
+    catalog["t"]
+    assert analyzer.column_tables("a") == ("v", "u", "t")
@@ -0,0 +1,98 @@
+# analyze_parallel must give exactly what analyze gives
+
+import multiprocessing
+import random
+
+import pytest
+
+import semantic
+from catalog import Catalog
+from lexer import tokenize_sql
+from parser import Parser
+from semantic import SemanticAnalyzer
+from template import parse_dump
+
+TABLES = ["t", "u", "v", "w"]
+TEXT = "'s'"
+
+
+def statement(rng):
+    table = rng.choice(TABLES + ["zz"])
+    r = rng.random()
+    if r < 0.12:
+        cols = ", ".join(f"{c} {rng.choice(['INT', 'TEXT', 'FLOAT', 'BLOB'])}"
+                         for c in rng.sample("abcd", rng.randint(1, 3)))
+        return f"CREATE TABLE {table} ({cols});"
+    if r < 0.4:
+        values = ", ".join(rng.choice(["1", "'x'", "2.5", "?", ":p"]) for _ in range(rng.randint(1, 3)))
+        return f"INSERT INTO {table} VALUES ({values});"
+    if r < 0.5:
+        rows = ", ".join("(" + ", ".join(rng.choice(["1", "'x'", "?"]) for _ in range(rng.randint(1, 3))) + ")"
+                         for _ in range(3))
+        return f"INSERT INTO {table} VALUES {rows};"
+    cond = " AND ".join(f"{rng.choice('abcdq')} {rng.choice(['=', '>'])} {rng.choice(['1', TEXT, '?'])}"
+                        for _ in range(rng.randint(1, 3)))
+    if r < 0.7:
+        return f"SELECT {rng.choice(['*', 'a', 'a, b', 'q'])} FROM {table} WHERE {cond};"
+    if r < 0.85:
+        return f"UPDATE {table} SET {rng.choice('abq')} = {rng.choice(['1', '2.5', TEXT, ':v'])} WHERE {cond};"
+    return f"DELETE FROM {table}" + (f" WHERE {cond};" if rng.random() < 0.5 else ";")
+
+
+def script(rng):
+    lines = [statement(rng) for _ in range(rng.randint(20, 120))]
+    lines.append("SELECT a FROM t WHERE " + " AND ".join(["a = 1"] * 300) + ";")
+    rng.shuffle(lines)
+    return "\n".join(lines)
+
+
+def parse(code):
+    return Parser(tokenize_sql(code)).parse_query()
+
+
+def dump_tree(code):
+    return parse_dump(code)[0]
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("make", [parse, dump_tree])
+@pytest.mark.parametrize("known", [None, {"v": {"a": "INT", "b": "TEXT"}}])
+def test_parallel_matches_serial(seed, make, known):
+    rng = random.Random(seed)
+    for _ in range(3):
+        code = script(rng)
+        serial, parallel = SemanticAnalyzer(), SemanticAnalyzer()
+        expected = serial.analyze(make(code), known, render=True)
+        result = parallel.analyze_parallel(make(code), known, render=True, workers=3,
+                                           batch_size=rng.choice([3, 7, 1000]))
+        assert dict(result) == dict(expected)
+        assert parallel.parameter_types == serial.parameter_types
+
+
+def test_catalog_decodes_the_same_tables(tmp_path):
+    path = str(tmp_path / "schema.cat")
+    tables = {"v": {"a": "INT"}, "w": {"b": "TEXT"}, "t": {"a": "FLOAT"}}
+    tables.update((f"x{i}", {"a": "INT"}) for i in range(50))
+    Catalog(tables).save(path)
+    rng = random.Random(5)
+    for _ in range(3):
+        code = script(rng)
+        serial, parallel = Catalog.load(path), Catalog.load(path)
+        expected = SemanticAnalyzer().analyze(parse(code), serial, render=True)
+        result = SemanticAnalyzer().analyze_parallel(parse(code), parallel, render=True, workers=2, batch_size=5)
+        assert dict(result) == dict(expected)
+        assert list(parallel.loaded()) == list(serial.loaded())
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_spawned_workers(monkeypatch, lazy):
+    # Spawned workers get the statements pickled, deep ones flattened
+    pool = semantic.ProcessPoolExecutor
+    context = multiprocessing.get_context("spawn")
+    monkeypatch.setattr(semantic, "ProcessPoolExecutor", lambda **kw: pool(mp_context=context, **kw))
+    code = ("CREATE TABLE t (a INT);\n" + "SELECT a FROM t WHERE " + " AND ".join(["a = 'x'"] * 2000) + ";\n"
+            + "INSERT INTO t VALUES ('q');\n" * 30 + "CREATE TABLE u (b TEXT);\nINSERT INTO u VALUES (1);\n" * 3)
+    tree = Parser(tokenize_sql(code)).parse_query(lazy=lazy)
+    expected = SemanticAnalyzer().analyze(tree, render=True)
+    result = SemanticAnalyzer().analyze_parallel(tree, render=True, workers=2, batch_size=4)
+    assert dict(result) == dict(expected)
@@ -0,0 +1,46 @@
+# parse_dump must report what compile_sql reports for the same script
+
+import random
+
+import pytest
+
+from incremental import compile_sql
+from nodes import InsertBatch
+from semantic import SemanticAnalyzer
+from template import parse_dump
+from bench.workload import generate_workload
+
+PIECES = [
+    "CREATE TABLE t (a INT, b TEXT);", "CREATE TABLE u (a FLOAT);", "INSERT INTO t VALUES (1, 'x');",
+    "insert into t values(2,'y');", "INSERT INTO t VALUES (1.5, 2);", "INSERT INTO u VALUES (1);",
+    "INSERT INTO u VALUES ('q');", "INSERT INTO v VALUES (1);", "INSERT INTO t VALUES (1);",
+    "INSERT\nINTO t\nVALUES (3,\n 'z');", "INSERT INTO t VALUES (1x, 'a');", "INSERT INTO values VALUES (1);",
+    " ", "\n", "\t", "/* c */", "-- c\n", "'", "(", ")", ";", "#", "é", "SELECT a FROM t WHERE a = 1;",
+    "INSERT INTO t VALUES (1, 'x'", "1.", ",", "INSERT INTO t VALUES (1., 'é');", "INSERT INTO té VALUES (1);",
+    "INSERT INTO t VALUES (1, 2), (3, 4);",
+]
+
+
+def check(code):
+    """Compare parse_dump with compile_sql on code; returns the number of InsertBatch nodes made."""
+    expected = compile_sql(code)
+    tree, lex_errors, parse_errors = parse_dump(code)
+    assert lex_errors == expected.lex_errors, code
+    assert parse_errors == expected.parse_errors, code
+    result = SemanticAnalyzer().analyze(tree)
+    assert result["errors"] == expected.semantic_result["errors"], code
+    assert result["symbol_table"] == expected.semantic_result["symbol_table"], code
+    return sum(isinstance(node, InsertBatch) for node in tree.children)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_scripts(seed):
+    rng = random.Random(seed)
+    for _ in range(1000):
+        check("".join(rng.choice(PIECES) for _ in range(rng.randint(0, 15))))
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_workloads(seed):
+    code = generate_workload(inserts=1000, selects=50, updates=20, deletes=10, comment_every=7 * seed, seed=seed)
+    assert check(code) > 0